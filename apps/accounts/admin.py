@@ -17,6 +17,7 @@ class UserAdmin(BaseUserAdmin):
         ('Personal Info', {'fields': ('first_name', 'last_name', 'avatar', 'bio')}),
         ('Permissions', {'fields': ('is_active', 'is_staff', 'is_superuser', 'groups', 'user_permissions')}),
         ('Important Dates', {'fields': ('created_at', 'updated_at', 'last_login', 'date_joined')}),
+        ('Statistics', {'fields': ('posts_count', 'published_posts_count', 'comments_count'), 'classes': ('collapse',)}),
     )
 
     add_fieldsets = (
@@ -26,4 +27,6 @@ class UserAdmin(BaseUserAdmin):
         })
     )
 
-    readonly_fields = ('created_at', 'updated_at', 'last_login', 'date_joined')
+    readonly_fields = (
+        'created_at', 'updated_at', 'last_login', 'date_joined', 'posts_count', 'published_posts_count', 'comments_count'
+    )
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apps.accounts.stats import reconcile_user_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute precomputed post and comment counters for all users'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        updated = reconcile_user_stats(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'{updated} users reconciled'))
@@ -1,17 +1,24 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 
+from apps.media.storage import ContentAddressedImageField, ContentAddressedPath
+
 
 class User(AbstractUser):
     email = models.EmailField(unique=True)
     first_name = models.CharField(max_length=50, blank=True)
     last_name = models.CharField(max_length=50, blank=True)
-    avatar = models.ImageField(upload_to='avatars/', blank=True, null=True)
+    avatar = ContentAddressedImageField(upload_to=ContentAddressedPath('avatars', 'avatar'), blank=True, null=True)
+    avatar_renditions = models.JSONField(default=dict, blank=True, editable=False)
     bio = models.TextField(max_length=500, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True)
 
+    posts_count = models.PositiveIntegerField(default=0, editable=False)
+    published_posts_count = models.PositiveIntegerField(default=0, editable=False)
+    comments_count = models.PositiveIntegerField(default=0, editable=False)
+
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username']
 
@@ -23,6 +30,13 @@ class User(AbstractUser):
     def __str__(self):
         return self.email
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'avatar' in instance.__dict__:
+            instance._loaded_avatar = instance.__dict__['avatar'] or None
+        return instance
+
     @property
     def full_name(self):
         return '{} {}'.format(self.first_name, self.last_name)
@@ -1,10 +1,12 @@
 from rest_framework import serializers
 from django.contrib.auth import authenticate
 from django.contrib.auth.password_validation import validate_password
+from apps.core.serialization import ModelSerializer, Serializer
+from apps.media.renditions import rendition_urls
 from .models import User
 
 
-class UserRegistrationSerializer(serializers.ModelSerializer):
+class UserRegistrationSerializer(ModelSerializer):
     password = serializers.CharField(
         write_only=True,
         validators=[validate_password],
@@ -32,7 +34,7 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         return user
 
 
-class UserLoginSerializer(serializers.Serializer):
+class UserLoginSerializer(Serializer):
     email = serializers.EmailField()
     password = serializers.CharField(write_only=True)
 
@@ -62,33 +64,38 @@ class UserLoginSerializer(serializers.Serializer):
             )
 
 
-class UserProfileSerializer(serializers.ModelSerializer):
+class UserProfileSerializer(ModelSerializer):
     full_name = serializers.ReadOnlyField()
-    posts_count = serializers.SerializerMethodField()
-    comments_count = serializers.SerializerMethodField()
+    avatar_renditions = serializers.SerializerMethodField()
 
     class Meta:
         model = User
         fields = (
-            'id', 'username', 'email', 'first_name', 'last_name', 'full_name', 'avatar', 'bio', 'created_at', 'updated_at',
-            'posts_count', 'comments_count'
+            'id', 'username', 'email', 'first_name', 'last_name', 'full_name', 'avatar', 'avatar_renditions', 'bio', 'created_at', 'updated_at',
+            'posts_count', 'published_posts_count', 'comments_count'
         )
-        read_only_fields = ('created_at', 'updated_at')
+        read_only_fields = ('created_at', 'updated_at', 'posts_count', 'published_posts_count', 'comments_count')
 
-    def get_posts_count(self, obj):
-        try:
-            return obj.posts.count()
-        except AttributeError:
-            return 0
+    def get_avatar_renditions(self, obj):
+        return rendition_urls(obj.avatar_renditions, request=self.context.get('request'))
 
-    def get_comments_count(self, obj):
-        try:
-            return obj.comments.count()
-        except AttributeError:
-            return 0
+
+class AuthorProfileSerializer(ModelSerializer):
+    full_name = serializers.ReadOnlyField()
+    avatar_renditions = serializers.SerializerMethodField()
+
+    class Meta:
+        model = User
+        fields = (
+            'id', 'username', 'full_name', 'avatar', 'avatar_renditions', 'bio', 'created_at', 'published_posts_count', 'comments_count'
+        )
+        read_only_fields = fields
+
+    def get_avatar_renditions(self, obj):
+        return rendition_urls(obj.avatar_renditions, request=self.context.get('request'))
 
 
-class UserUpdateSerializer(serializers.ModelSerializer):
+class UserUpdateSerializer(ModelSerializer):
     class Meta:
         model = User
         fields = (
@@ -99,9 +106,10 @@ class UserUpdateSerializer(serializers.ModelSerializer):
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
         instance.save()
+        return instance
 
 
-class ChangePasswordSerializer(serializers.Serializer):
+class ChangePasswordSerializer(Serializer):
     old_password = serializers.CharField(required=True)
     new_password = serializers.CharField(required=True, validators=[validate_password])
     new_password2 = serializers.CharField(required=True)
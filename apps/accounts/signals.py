@@ -0,0 +1,51 @@
+from django.db.models import Count
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+
+from apps.main.models import Post, deleting_posts
+from apps.comments.models import Comment
+from .stats import adjust_user_stats, subtract_user_stats
+
+
+@receiver(post_save, sender=Post)
+def post_post_save(sender, instance, created, **kwargs):
+    is_published = instance.status == 'published'
+    if created:
+        adjust_user_stats(instance.author_id, posts_count=1, published_posts_count=int(is_published))
+    else:
+        if instance.loaded_status is not None and (instance.loaded_status == 'published') != is_published:
+            adjust_user_stats(instance.author_id, published_posts_count=1 if is_published else -1)
+    instance.loaded_status = instance.status
+
+
+@receiver(pre_delete, sender=Post)
+def post_pre_delete(sender, instance, **kwargs):
+    # the comments cascading with the post are taken off their authors' counters here, all at once
+    counts = Comment.objects.filter(post=instance, is_active=True).order_by().values_list('author').annotate(Count('pk'))
+    subtract_user_stats('comments_count', dict(counts))
+
+
+@receiver(post_delete, sender=Post)
+def post_post_delete(sender, instance, **kwargs):
+    adjust_user_stats(
+        instance.author_id,
+        posts_count=-1,
+        published_posts_count=-1 if instance.status == 'published' else 0,
+    )
+
+
+@receiver(post_save, sender=Comment)
+def comment_post_save(sender, instance, created, **kwargs):
+    if created:
+        if instance.is_active:
+            adjust_user_stats(instance.author_id, comments_count=1)
+    else:
+        if instance.loaded_status is not None and instance.loaded_status != instance.is_active:
+            adjust_user_stats(instance.author_id, comments_count=1 if instance.is_active else -1)
+    instance.loaded_status = instance.is_active
+
+
+@receiver(post_delete, sender=Comment)
+def comment_post_delete(sender, instance, origin=None, **kwargs):
+    if instance.is_active and not deleting_posts(origin):
+        adjust_user_stats(instance.author_id, comments_count=-1)
@@ -0,0 +1,80 @@
+from django.db.models import Case, Count, F, IntegerField, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import User
+
+STAT_FIELDS = ('posts_count', 'published_posts_count', 'comments_count')
+
+
+def adjust_user_stats(user_id, **deltas):
+    changes = {
+        field: Greatest(F(field) + delta, 0)
+        for field, delta in deltas.items() if delta
+    }
+    if changes:
+        User.objects.filter(pk=user_id).update(**changes)
+
+
+def subtract_user_stats(field, counts):
+    """Subtract ``counts`` ({user id: amount}) from ``field`` of several users in one UPDATE."""
+    if not counts:
+        return
+    amount = Case(*(When(pk=user_id, then=Value(count)) for user_id, count in counts.items()), default=Value(0))
+    User.objects.filter(pk__in=counts).update(**{field: Greatest(F(field) - amount, 0)})
+
+
+def _count_by_author(queryset):
+    counts = queryset.filter(author=OuterRef('pk')).order_by().values('author').annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def actual_stats_annotations():
+    from apps.main.models import Post
+    from apps.comments.models import Comment
+
+    return {
+        'actual_posts_count': _count_by_author(Post.objects.all()),
+        'actual_published_posts_count': _count_by_author(Post.objects.filter(status='published')),
+        'actual_comments_count': _count_by_author(Comment.objects.filter(is_active=True)),
+    }
+
+
+def refresh_user_stats(user_ids, *fields):
+    """Recompute ``fields`` (all counters by default) of ``user_ids`` with a single UPDATE."""
+    annotations = actual_stats_annotations()
+    return User.objects.filter(pk__in=user_ids).update(**{
+        field: annotations[f'actual_{field}'] for field in fields or STAT_FIELDS
+    })
+
+
+def reconcile_user_stats(queryset=None, batch_size=1000):
+    """Recompute counters in primary key batches and write back only the rows that drifted."""
+    if queryset is None:
+        queryset = User.objects.all()
+
+    queryset = queryset.order_by('pk').only('pk', *STAT_FIELDS).annotate(**actual_stats_annotations())
+    last_pk = 0
+    updated = 0
+
+    while True:
+        users = list(queryset.filter(pk__gt=last_pk)[:batch_size])
+        if not users:
+            break
+
+        stale = []
+        for user in users:
+            changed = False
+            for field in STAT_FIELDS:
+                actual = getattr(user, f'actual_{field}')
+                if getattr(user, field) != actual:
+                    setattr(user, field, actual)
+                    changed = True
+            if changed:
+                stale.append(user)
+
+        if stale:
+            User.objects.bulk_update(stale, STAT_FIELDS, batch_size=batch_size)
+            updated += len(stale)
+        last_pk = users[-1].pk
+
+    return updated
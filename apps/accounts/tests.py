@@ -1,3 +1,44 @@
-from django.test import TestCase
+from apps.core.testing import PASSWORD, QueryBudgetTestCase, make_posts
+from rest_framework_simplejwt.tokens import RefreshToken
 
-# Create your tests here.
+QUERY_BUDGETS = {
+    'register': {'post': 5},
+    'login': {'post': 11},
+    'logout': {'post': 2},
+    'profile': {'get': 0, 'patch': 3},
+    'author-profile': {'get': 1},
+    'change_password': {'put': 3},
+    'token_refresh': {'post': 3},
+}
+
+
+class AccountQueryBudgetTests(QueryBudgetTestCase):
+    budgets = QUERY_BUDGETS
+
+    def test_register(self):
+        data = {'username': 'newbie', 'email': 'newbie@example.com', 'password': PASSWORD, 'password2': PASSWORD}
+        self.assertWithinBudget('post', 'register', data=data, status=201)
+
+    def test_login(self):
+        self.assertWithinBudget('post', 'login', data={'email': self.data.reader.email, 'password': PASSWORD})
+
+    def test_logout(self):
+        # The token blacklist app is not installed, so logging out reports the token as invalid.
+        refresh = RefreshToken.for_user(self.data.reader)
+        self.assertWithinBudget('post', 'logout', user=self.data.reader, data={'refresh_token': str(refresh)}, status=400)
+
+    def test_token_refresh(self):
+        refresh = RefreshToken.for_user(self.data.reader)
+        self.assertWithinBudget('post', 'token_refresh', data={'refresh': str(refresh)})
+
+    def test_profile(self):
+        self.assertWithinBudget('get', 'profile', user=self.data.author)
+        self.assertWithinBudget('patch', 'profile', user=self.data.author, data={'bio': 'Writes about databases'})
+
+    def test_author_profile(self):
+        author = self.data.author
+        self.assertQueriesConstant('get', 'author-profile', lambda: make_posts(author, 25), args=[author.username])
+
+    def test_change_password(self):
+        data = {'old_password': PASSWORD, 'new_password': 'another-pass-456', 'new_password2': 'another-pass-456'}
+        self.assertWithinBudget('put', 'change_password', user=self.data.reader, data=data)
@@ -4,8 +4,16 @@ from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import login
+from apps.core.db import NonAtomicReadsMixin
 from .models import User
-from .serializers import UserRegistrationSerializer, UserLoginSerializer, UserProfileSerializer, UserUpdateSerializer, ChangePasswordSerializer
+from .serializers import (
+    UserRegistrationSerializer,
+    UserLoginSerializer,
+    UserProfileSerializer,
+    UserUpdateSerializer,
+    ChangePasswordSerializer,
+    AuthorProfileSerializer
+)
 
 
 class RegisterView(generics.CreateAPIView):
@@ -49,7 +57,7 @@ class LoginView(generics.CreateAPIView):
         )
 
 
-class ProfileView(generics.RetrieveUpdateAPIView):
+class ProfileView(NonAtomicReadsMixin, generics.RetrieveUpdateAPIView):
     serializer_class = UserProfileSerializer
     permission_classes = [permissions.IsAuthenticated]
 
@@ -62,6 +70,15 @@ class ProfileView(generics.RetrieveUpdateAPIView):
         return UserProfileSerializer
 
 
+class AuthorProfileView(NonAtomicReadsMixin, generics.RetrieveAPIView):
+    queryset = User.objects.filter(is_active=True).only(
+        'id', 'username', 'first_name', 'last_name', 'avatar', 'avatar_renditions', 'bio', 'created_at', 'published_posts_count', 'comments_count'
+    )
+    serializer_class = AuthorProfileSerializer
+    permission_classes = [permissions.AllowAny]
+    lookup_field = 'username'
+
+
 class ChangePasswordView(generics.UpdateAPIView):
     serializer_class = ChangePasswordSerializer
     permission_classes = [permissions.IsAuthenticated]
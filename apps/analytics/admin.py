@@ -0,0 +1,33 @@
+from django.contrib import admin
+
+from .models import DailyRevenue, DailySubscriptionStats, RollupWatermark
+
+
+class RollupAdmin(admin.ModelAdmin):
+    """Rollups are only written by the refresh task."""
+    date_hierarchy = 'day'
+    list_select_related = ('plan',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(DailyRevenue)
+class DailyRevenueAdmin(RollupAdmin):
+    list_display = ('day', 'plan', 'currency', 'payments', 'gross', 'refunds', 'refunded', 'net')
+    list_filter = ('currency', 'plan')
+
+
+@admin.register(DailySubscriptionStats)
+class DailySubscriptionStatsAdmin(RollupAdmin):
+    list_display = ('day', 'plan', 'new', 'renewed', 'canceled', 'expired', 'active', 'mrr')
+    list_filter = ('plan',)
+
+
+@admin.register(RollupWatermark)
+class RollupWatermarkAdmin(admin.ModelAdmin):
+    list_display = ('name', 'value', 'updated_at')
+    readonly_fields = ('name', 'updated_at')
@@ -0,0 +1,136 @@
+import hashlib
+import io
+import logging
+import threading
+import time
+
+from celery.signals import task_postrun
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils import timezone
+
+from .models import PostEvent
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ('post_id', 'kind', 'viewer', 'created_at')
+
+
+def _hash(source):
+    return int.from_bytes(hashlib.blake2b(source.encode(), digest_size=8).digest(), 'big', signed=True)
+
+
+def user_key(user_id):
+    return _hash(f'user:{user_id}')
+
+
+def viewer_key(request):
+    """The user, or for anonymous requests the client address and user agent, as a 64-bit hash."""
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return user_key(user.pk)
+    return _hash(f'anon:{request.META.get("REMOTE_ADDR", "")}|{request.META.get("HTTP_USER_AGENT", "")}')
+
+
+class EventBuffer:
+    """
+    Events of this process waiting to be written. Adding one is a list append, safe from async
+    views; the rows are written in one batch by ``flush()`` once ANALYTICS_EVENT_BUFFER_SIZE of them
+    piled up or the oldest waited ANALYTICS_EVENT_FLUSH_SECONDS.
+    """
+
+    def __init__(self):
+        self._rows = []
+        self._oldest = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._rows)
+
+    def add(self, rows):
+        if not rows:
+            return
+        with self._lock:
+            if not self._rows:
+                self._oldest = time.monotonic()
+            self._rows.extend(rows)
+
+    def due(self):
+        with self._lock:
+            if not self._rows:
+                return False
+            return (
+                len(self._rows) >= settings.ANALYTICS_EVENT_BUFFER_SIZE
+                or time.monotonic() - self._oldest >= settings.ANALYTICS_EVENT_FLUSH_SECONDS
+            )
+
+    def drain(self):
+        with self._lock:
+            rows, self._rows, self._oldest = self._rows, [], None
+        return rows
+
+
+buffer = EventBuffer()
+
+
+def record(kind, post_ids, viewer=None):
+    now = timezone.now()
+    buffer.add([(post_id, kind, viewer, now) for post_id in post_ids])
+
+
+def record_pin_impressions(posts):
+    """A pin impression for every pinned post among serialized list ``posts``."""
+    record('pin_impression', [post['id'] for post in posts if post.get('is_pinned')])
+
+
+def _copy_value(value):
+    if value is None:
+        return r'\N'
+    return value.isoformat() if hasattr(value, 'isoformat') else str(value)
+
+
+def _copy(connection, rows):
+    sql = f'COPY {PostEvent._meta.db_table} ({", ".join(COLUMNS)}) FROM STDIN'
+    with connection.cursor() as cursor:
+        raw = cursor.cursor
+        if hasattr(raw, 'copy_expert'):  # psycopg2
+            data = ''.join('\t'.join(_copy_value(value) for value in row) + '\n' for row in rows)
+            raw.copy_expert(sql, io.StringIO(data))
+        else:  # psycopg 3
+            with raw.copy(sql) as copy:
+                for row in rows:
+                    copy.write_row(row)
+
+
+def write(rows):
+    connection = connections[DEFAULT_DB_ALIAS]
+    if connection.vendor == 'postgresql':
+        _copy(connection, rows)
+    else:
+        PostEvent.objects.bulk_create(PostEvent(**dict(zip(COLUMNS, row))) for row in rows)
+
+
+def flush():
+    rows = buffer.drain()
+    if not rows:
+        return 0
+    try:
+        write(rows)
+    except Exception:
+        # analytics never fail a request; the batch is lost
+        logger.exception(f'Could not write {len(rows)} post events')
+        return 0
+    return len(rows)
+
+
+def flush_if_due(**kwargs):
+    if buffer.due():
+        flush()
+
+
+def flush_after_task(**kwargs):
+    # a worker may not run another task for a while, so events recorded by a task are written with it
+    flush()
+
+
+task_postrun.connect(flush_after_task, dispatch_uid='analytics_flush_task_events')
@@ -0,0 +1,79 @@
+"""
+HyperLogLog sketches of the 64-bit viewer hashes from ``events.viewer_key()``.
+
+A sketch estimates how many distinct viewers were added to it from 4096 one-byte registers,
+whatever that number is, with a standard error of about 1.6%. Two sketches merge into the sketch
+of the union of their viewers, so daily sketches add up to the unique viewers of any range of days.
+Adding a viewer twice changes nothing, which makes rebuilding from the same events harmless.
+"""
+import math
+
+PRECISION = 12
+REGISTERS = 1 << PRECISION
+# bits left after the register index; a register holds the position of their first 1 bit
+SUFFIX_BITS = 64 - PRECISION
+ALPHA = 0.7213 / (1 + 1.079 / REGISTERS)
+_POWERS = [2.0 ** -rank for rank in range(SUFFIX_BITS + 2)]
+
+# stored sketches are a format byte followed by either (index, rank) pairs of the registers
+# that are set, 3 bytes each, or all the registers when that is smaller
+SPARSE = b'\x00'
+DENSE = b'\x01'
+
+
+class HyperLogLog:
+    __slots__ = ('registers',)
+
+    def __init__(self, registers=None):
+        self.registers = bytearray(REGISTERS) if registers is None else registers
+
+    def add(self, value):
+        value &= 0xFFFFFFFFFFFFFFFF
+        index = value >> SUFFIX_BITS
+        rank = SUFFIX_BITS - (value & ((1 << SUFFIX_BITS) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def update(self, values):
+        for value in values:
+            self.add(value)
+        return self
+
+    def merge(self, other):
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def count(self):
+        registers = self.registers
+        estimate = ALPHA * REGISTERS * REGISTERS / sum(map(_POWERS.__getitem__, registers))
+        zeros = registers.count(0)
+        if zeros and estimate <= 2.5 * REGISTERS:
+            # linear counting is the better estimate while many registers are still empty
+            estimate = REGISTERS * math.log(REGISTERS / zeros)
+        return round(estimate)
+
+    def to_bytes(self):
+        filled = [(index, rank) for index, rank in enumerate(self.registers) if rank]
+        if 3 * len(filled) >= REGISTERS:
+            return DENSE + bytes(self.registers)
+        return SPARSE + b''.join(index.to_bytes(2, 'big') + bytes((rank,)) for index, rank in filled)
+
+    @classmethod
+    def from_bytes(cls, data):
+        if not data:
+            return cls()
+        data = bytes(data)
+        if data[:1] == DENSE:
+            return cls(bytearray(data[1:]))
+        registers = bytearray(REGISTERS)
+        for offset in range(1, len(data), 3):
+            registers[int.from_bytes(data[offset:offset + 2], 'big')] = data[offset + 2]
+        return cls(registers)
+
+
+def merged(sketches):
+    """One sketch of the union of ``sketches``, stored ones as read from the database."""
+    union = HyperLogLog()
+    for sketch in sketches:
+        union.merge(HyperLogLog.from_bytes(sketch))
+    return union
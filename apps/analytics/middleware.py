@@ -0,0 +1,26 @@
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.utils.decorators import sync_and_async_middleware
+
+from . import events
+
+
+@sync_and_async_middleware
+def event_flush_middleware(get_response):
+    """
+    Writes the buffered post events once they are due, before the response is handed back, so the
+    write uses the connection of the request and is closed with it. Events still waiting when a
+    worker stops are lost.
+    """
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            response = await get_response(request)
+            if events.buffer.due():
+                await sync_to_async(events.flush)()
+            return response
+    else:
+        def middleware(request):
+            response = get_response(request)
+            events.flush_if_due()
+            return response
+
+    return middleware
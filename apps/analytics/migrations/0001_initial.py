@@ -0,0 +1,69 @@
+# Generated by Django 5.2.7 on 2026-10-19 00:25
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('subscribe', '0002_subscriptionhistory_created_at_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('value', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'analytics_watermarks',
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyRevenue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('currency', models.CharField(max_length=3)),
+                ('payments', models.PositiveIntegerField(default=0)),
+                ('gross', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('refunds', models.PositiveIntegerField(default=0)),
+                ('refunded', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('plan', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='subscribe.subscriptionplan')),
+            ],
+            options={
+                'verbose_name': 'Daily Revenue',
+                'verbose_name_plural': 'Daily Revenue',
+                'db_table': 'analytics_daily_revenue',
+                'ordering': ['-day'],
+                'indexes': [models.Index(fields=['day'], name='analytics_d_day_d48518_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailySubscriptionStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('new', models.PositiveIntegerField(default=0)),
+                ('renewed', models.PositiveIntegerField(default=0)),
+                ('canceled', models.PositiveIntegerField(default=0)),
+                ('expired', models.PositiveIntegerField(default=0)),
+                ('active', models.PositiveIntegerField(blank=True, null=True)),
+                ('mrr', models.DecimalField(blank=True, decimal_places=2, max_digits=14, null=True)),
+                ('plan', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='subscribe.subscriptionplan')),
+            ],
+            options={
+                'verbose_name': 'Daily Subscription Stats',
+                'verbose_name_plural': 'Daily Subscription Stats',
+                'db_table': 'analytics_daily_subscriptions',
+                'ordering': ['-day'],
+                'constraints': [models.UniqueConstraint(fields=('day', 'plan'), name='daily_subscriptions_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 5.2.7 on 2026-10-19 00:30
+
+import django.db.models.deletion
+import django.db.models.functions.datetime
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0001_initial'),
+        ('main', '0005_post_excerpt'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('unique_viewers', models.PositiveIntegerField(default=0)),
+                ('comments', models.PositiveIntegerField(default=0)),
+                ('pin_impressions', models.PositiveIntegerField(default=0)),
+                ('day', models.DateField()),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='main.category')),
+            ],
+            options={
+                'db_table': 'analytics_category_daily',
+                'indexes': [models.Index(fields=['day'], name='analytics_c_day_be80de_idx')],
+                'constraints': [models.UniqueConstraint(fields=('category', 'day'), name='category_daily_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='PostDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('unique_viewers', models.PositiveIntegerField(default=0)),
+                ('comments', models.PositiveIntegerField(default=0)),
+                ('pin_impressions', models.PositiveIntegerField(default=0)),
+                ('day', models.DateField()),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='main.post')),
+            ],
+            options={
+                'db_table': 'analytics_post_daily',
+                'indexes': [models.Index(fields=['day'], name='analytics_p_day_54aa51_idx')],
+                'constraints': [models.UniqueConstraint(fields=('post', 'day'), name='post_daily_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='PostEvent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('view', 'View'), ('comment', 'Comment'), ('pin_impression', 'Pin Impression')], max_length=20)),
+                ('viewer', models.BigIntegerField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('recorded_at', models.DateTimeField(db_default=django.db.models.functions.datetime.Now())),
+                ('post', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='main.post')),
+            ],
+            options={
+                'db_table': 'analytics_post_events',
+                'indexes': [models.Index(fields=['created_at'], name='analytics_p_created_9a52e0_idx'), models.Index(fields=['recorded_at'], name='analytics_p_recorde_726e57_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='PostHourlyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('unique_viewers', models.PositiveIntegerField(default=0)),
+                ('comments', models.PositiveIntegerField(default=0)),
+                ('pin_impressions', models.PositiveIntegerField(default=0)),
+                ('hour', models.DateTimeField()),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='main.post')),
+            ],
+            options={
+                'db_table': 'analytics_post_hourly',
+                'indexes': [models.Index(fields=['hour'], name='analytics_p_hour_9c4fd8_idx')],
+                'constraints': [models.UniqueConstraint(fields=('post', 'hour'), name='post_hourly_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.7 on 2026-10-19 00:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0002_post_events'),
+        ('main', '0005_post_excerpt'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostViewers',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='viewers', serialize=False, to='main.post')),
+                ('sketch', models.BinaryField()),
+                ('unique_viewers', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Post Viewers',
+                'db_table': 'analytics_post_viewers',
+            },
+        ),
+        migrations.CreateModel(
+            name='PostViewerSketch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('sketch', models.BinaryField()),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='main.post')),
+            ],
+            options={
+                'db_table': 'analytics_post_viewer_sketches',
+                'constraints': [models.UniqueConstraint(fields=('post', 'day'), name='post_viewer_sketch_unique')],
+            },
+        ),
+    ]
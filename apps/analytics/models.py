@@ -0,0 +1,191 @@
+from decimal import Decimal
+
+from django.db import models
+from django.db.models.functions import Now
+from django.utils import timezone
+
+
+class RollupWatermark(models.Model):
+    """How far a rollup has read its source rows; everything up to ``value`` is aggregated."""
+    name = models.CharField(max_length=50, primary_key=True)
+    value = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'analytics_watermarks'
+
+    def __str__(self):
+        return f'{self.name} @ {self.value}'
+
+
+class DailyRevenue(models.Model):
+    """Payments and refunds processed on ``day``, per plan and currency."""
+    day = models.DateField()
+    plan = models.ForeignKey('subscribe.SubscriptionPlan', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    currency = models.CharField(max_length=3)
+
+    payments = models.PositiveIntegerField(default=0)
+    gross = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    refunds = models.PositiveIntegerField(default=0)
+    refunded = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+
+    class Meta:
+        db_table = 'analytics_daily_revenue'
+        verbose_name = 'Daily Revenue'
+        verbose_name_plural = 'Daily Revenue'
+        ordering = ['-day']
+        # rows are replaced a whole day at a time, so (day, plan, currency) needs no constraint; the
+        # plan is empty for payments without a subscription
+        indexes = [
+            models.Index(fields=['day']),
+        ]
+
+    def __str__(self):
+        return f'{self.day} {self.plan_id} {self.currency}: {self.gross - self.refunded}'
+
+    @property
+    def net(self):
+        return self.gross - self.refunded
+
+
+class DailySubscriptionStats(models.Model):
+    """
+    Subscription events of ``day`` per plan. ``active`` and ``mrr`` are a snapshot taken by the last
+    rollup run of the day, so they stay empty for days before rollups were running.
+    """
+    day = models.DateField()
+    plan = models.ForeignKey('subscribe.SubscriptionPlan', on_delete=models.CASCADE, related_name='+')
+
+    new = models.PositiveIntegerField(default=0)
+    renewed = models.PositiveIntegerField(default=0)
+    canceled = models.PositiveIntegerField(default=0)
+    expired = models.PositiveIntegerField(default=0)
+    active = models.PositiveIntegerField(null=True, blank=True)
+    mrr = models.DecimalField(max_digits=14, decimal_places=2, null=True, blank=True)
+
+    class Meta:
+        db_table = 'analytics_daily_subscriptions'
+        verbose_name = 'Daily Subscription Stats'
+        verbose_name_plural = 'Daily Subscription Stats'
+        ordering = ['-day']
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'plan'], name='daily_subscriptions_unique'),
+        ]
+
+    def __str__(self):
+        return f'{self.day} {self.plan_id}: +{self.new} -{self.canceled + self.expired}'
+
+
+class PostEvent(models.Model):
+    """
+    Append-only log of post activity, written in batches by ``apps.analytics.events``. It has no
+    foreign key constraint, so bulk loads don't check ``posts`` and deleting a post leaves its events
+    for the retention cleanup.
+    """
+    KIND_CHOICES = [
+        ('view', 'View'),
+        ('comment', 'Comment'),
+        ('pin_impression', 'Pin Impression'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    post = models.ForeignKey('main.Post', on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    # 64-bit hash of the user or anonymous client, see events.viewer_key()
+    viewer = models.BigIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    # set by the database on insert; rollups use it as their watermark
+    recorded_at = models.DateTimeField(db_default=Now())
+
+    class Meta:
+        db_table = 'analytics_post_events'
+        indexes = [
+            models.Index(fields=['created_at']),
+            models.Index(fields=['recorded_at']),
+        ]
+
+    def __str__(self):
+        return f'{self.kind} of post {self.post_id} at {self.created_at}'
+
+
+class PostActivity(models.Model):
+    views = models.PositiveIntegerField(default=0)
+    unique_viewers = models.PositiveIntegerField(default=0)
+    comments = models.PositiveIntegerField(default=0)
+    pin_impressions = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+
+class PostHourlyStats(PostActivity):
+    hour = models.DateTimeField()
+    post = models.ForeignKey('main.Post', on_delete=models.CASCADE, related_name='+')
+
+    class Meta:
+        db_table = 'analytics_post_hourly'
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'hour'], name='post_hourly_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['hour']),
+        ]
+
+
+class PostDailyStats(PostActivity):
+    day = models.DateField()
+    post = models.ForeignKey('main.Post', on_delete=models.CASCADE, related_name='+')
+
+    class Meta:
+        db_table = 'analytics_post_daily'
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'day'], name='post_daily_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['day']),
+        ]
+
+
+class CategoryDailyStats(PostActivity):
+    day = models.DateField()
+    category = models.ForeignKey('main.Category', on_delete=models.CASCADE, related_name='+')
+
+    class Meta:
+        db_table = 'analytics_category_daily'
+        constraints = [
+            models.UniqueConstraint(fields=['category', 'day'], name='category_daily_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['day']),
+        ]
+
+
+class PostViewerSketch(models.Model):
+    """HyperLogLog sketch (``apps.analytics.hll``) of the viewers of a post on a day."""
+    day = models.DateField()
+    post = models.ForeignKey('main.Post', on_delete=models.CASCADE, related_name='+')
+    sketch = models.BinaryField()
+
+    class Meta:
+        db_table = 'analytics_post_viewer_sketches'
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'day'], name='post_viewer_sketch_unique'),
+        ]
+
+    def __str__(self):
+        return f'Viewers of post {self.post_id} on {self.day}'
+
+
+class PostViewers(models.Model):
+    """All-time viewer sketch of a post and the unique viewers it estimates."""
+    post = models.OneToOneField('main.Post', on_delete=models.CASCADE, primary_key=True, related_name='viewers')
+    sketch = models.BinaryField()
+    unique_viewers = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'analytics_post_viewers'
+        verbose_name_plural = 'Post Viewers'
+
+    def __str__(self):
+        return f'{self.unique_viewers} viewers of post {self.post_id}'
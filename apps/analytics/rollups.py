@@ -0,0 +1,299 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate, TruncHour
+from django.utils import timezone
+
+from apps.main.models import Post
+from apps.payment.models import Payment, Refund
+from apps.subscribe.models import Subscription, SubscriptionHistory, SubscriptionPlan
+
+from .models import (
+    CategoryDailyStats, DailyRevenue, DailySubscriptionStats, PostDailyStats, PostEvent, PostHourlyStats, PostViewers,
+    PostViewerSketch, RollupWatermark,
+)
+from .hll import HyperLogLog
+
+# payments that were paid, including those refunded since; refunds are subtracted on their own day
+REVENUE_STATUSES = ('succeeded', 'refunded')
+# SubscriptionHistory actions and the DailySubscriptionStats column each is counted in
+SUBSCRIPTION_EVENTS = {'activated': 'new', 'renewed': 'renewed', 'canceled': 'canceled', 'expired': 'expired'}
+CENTS = Decimal('0.01')
+# posts whose sketches are updated together, bounding the sketches held in memory
+SKETCH_BATCH_SIZE = 500
+
+
+def _day_bounds(day):
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, start + timedelta(days=1)
+
+
+def _touched_days(queryset, field, since, until, bucket=None):
+    """
+    The days (in the current time zone) of rows whose ``field`` is past the watermark, or the
+    values of ``bucket`` for those rows.
+    """
+    queryset = queryset.filter(**{f'{field}__lte': until})
+    if since is not None:
+        queryset = queryset.filter(**{f'{field}__gt': since})
+    bucket = bucket or TruncDate(field)
+    return set(queryset.annotate(bucket=bucket).order_by().values_list('bucket', flat=True).distinct())
+
+
+def _in_ranges(field, ranges):
+    # index range scans over the touched days or hours only
+    condition = Q()
+    for start, end in ranges:
+        condition |= Q(**{f'{field}__gte': start, f'{field}__lt': end})
+    return condition
+
+
+def _on_days(field, days, since, until):
+    condition = Q(**{f'{field}__lte': until})
+    if since is None:
+        return condition
+    return condition & _in_ranges(field, map(_day_bounds, days))
+
+
+def _locked_watermark(name):
+    RollupWatermark.objects.get_or_create(name=name)
+    # one run per rollup at a time: an overlapping run waits here, then starts from this one's watermark
+    return RollupWatermark.objects.select_for_update().get(name=name)
+
+
+def refresh_revenue(until):
+    """
+    Recompute the DailyRevenue rows of every day with payments or refunds processed since the
+    watermark, then move the watermark to ``until``. Returns the number of days recomputed.
+    """
+    with transaction.atomic():
+        watermark = _locked_watermark('revenue')
+        since = watermark.value
+        payments = Payment.objects.filter(status__in=REVENUE_STATUSES)
+        refunds = Refund.objects.filter(status='succeeded')
+        days = _touched_days(payments, 'processed_at', since, until) | _touched_days(refunds, 'processed_at', since, until)
+
+        if days:
+            rows = {}
+
+            def row(day, plan_id, currency):
+                key = day, plan_id, currency
+                if key not in rows:
+                    rows[key] = DailyRevenue(day=day, plan_id=plan_id, currency=currency)
+                return rows[key]
+
+            paid = (
+                payments.filter(_on_days('processed_at', days, since, until))
+                .annotate(day=TruncDate('processed_at')).order_by()
+                .values_list('day', 'subscription__plan', 'currency')
+                .annotate(number=Count('pk'), total=Sum('amount'))
+            )
+            for day, plan_id, currency, number, total in paid:
+                stats = row(day, plan_id, currency)
+                stats.payments, stats.gross = number, total
+
+            refunded = (
+                refunds.filter(_on_days('processed_at', days, since, until))
+                .annotate(day=TruncDate('processed_at')).order_by()
+                .values_list('day', 'payment__subscription__plan', 'payment__currency')
+                .annotate(number=Count('pk'), total=Sum('amount'))
+            )
+            for day, plan_id, currency, number, total in refunded:
+                stats = row(day, plan_id, currency)
+                stats.refunds, stats.refunded = number, total
+
+            stale = DailyRevenue.objects.all() if since is None else DailyRevenue.objects.filter(day__in=days)
+            stale.delete()
+            DailyRevenue.objects.bulk_create(rows.values())
+
+        watermark.value = until
+        watermark.save()
+    return len(days)
+
+
+def refresh_subscription_events(until):
+    """
+    Recount the subscription events of every day with history recorded since the watermark, then
+    move the watermark to ``until``. Returns the number of days recomputed.
+    """
+    with transaction.atomic():
+        watermark = _locked_watermark('subscriptions')
+        since = watermark.value
+        history = SubscriptionHistory.objects.filter(action__in=SUBSCRIPTION_EVENTS)
+        days = _touched_days(history, 'created_at', since, until)
+
+        if days:
+            rows = {}
+            events = (
+                history.filter(_on_days('created_at', days, since, until))
+                .annotate(day=TruncDate('created_at')).order_by()
+                .values_list('day', 'subscription__plan', 'action')
+                .annotate(number=Count('pk'))
+            )
+            for day, plan_id, action, number in events:
+                if (day, plan_id) not in rows:
+                    rows[day, plan_id] = DailySubscriptionStats(day=day, plan_id=plan_id)
+                setattr(rows[day, plan_id], SUBSCRIPTION_EVENTS[action], number)
+
+            # an upsert, so the active/mrr snapshot already stored for the day is kept
+            DailySubscriptionStats.objects.bulk_create(
+                rows.values(), update_conflicts=True, unique_fields=['day', 'plan'],
+                update_fields=list(SUBSCRIPTION_EVENTS.values()),
+            )
+
+        watermark.value = until
+        watermark.save()
+    return len(days)
+
+
+def monthly_price(plan):
+    return plan.price * 30 / max(plan.duration_days, 1)
+
+
+def snapshot_subscriptions(now):
+    """Store today's active subscriptions and MRR per plan; the day keeps the last snapshot taken."""
+    active = dict(
+        Subscription.objects.filter(status='active', end_date__gt=now)
+        .order_by().values_list('plan').annotate(number=Count('pk'))
+    )
+    today = timezone.localdate(now)
+    rows = [
+        DailySubscriptionStats(
+            day=today, plan=plan, active=active.get(plan.pk, 0),
+            mrr=(monthly_price(plan) * active.get(plan.pk, 0)).quantize(CENTS),
+        )
+        for plan in SubscriptionPlan.objects.all()
+    ]
+    DailySubscriptionStats.objects.bulk_create(
+        rows, update_conflicts=True, unique_fields=['day', 'plan'], update_fields=['active', 'mrr'],
+    )
+    return len(rows)
+
+
+def _activity(events, bucket, *group):
+    return (
+        events.annotate(bucket=bucket).order_by()
+        .values_list('bucket', *group)
+        .annotate(
+            views=Count('pk', filter=Q(kind='view')),
+            unique_viewers=Count('viewer', distinct=True, filter=Q(kind='view')),
+            comments=Count('pk', filter=Q(kind='comment')),
+            pin_impressions=Count('pk', filter=Q(kind='pin_impression')),
+        )
+    )
+
+
+def _replace(model, stale, rows, key_fields):
+    stale.delete()
+    model.objects.bulk_create(
+        model(**dict(zip(key_fields, key)), views=views, unique_viewers=unique_viewers, comments=comments, pin_impressions=pin_impressions)
+        for *key, views, unique_viewers, comments, pin_impressions in rows
+    )
+
+
+def _add_viewers(views):
+    """
+    Add the viewers of ``views`` to the daily and all-time sketches of their posts. Viewers are
+    only ever added, so views seen again by a later run leave the sketches as they were.
+    """
+    post_ids = sorted(set(views.order_by().values_list('post', flat=True).distinct()))
+    for start in range(0, len(post_ids), SKETCH_BATCH_SIZE):
+        batch = post_ids[start:start + SKETCH_BATCH_SIZE]
+        viewers = (
+            views.filter(post__in=batch).annotate(day=TruncDate('created_at')).order_by()
+            .values_list('post', 'day', 'viewer').distinct()
+        )
+        new = defaultdict(HyperLogLog)
+        for post_id, day, viewer in viewers.iterator():
+            new[post_id, day].add(viewer)
+            new[post_id, None].add(viewer)
+
+        days = {day for _, day in new if day is not None}
+        sketches = defaultdict(HyperLogLog)
+        for post_id, day, sketch in PostViewerSketch.objects.filter(post__in=batch, day__in=days).values_list('post', 'day', 'sketch'):
+            if (post_id, day) in new:
+                sketches[post_id, day] = HyperLogLog.from_bytes(sketch)
+        for post_id, sketch in PostViewers.objects.filter(post__in=batch).values_list('post', 'sketch'):
+            sketches[post_id, None] = HyperLogLog.from_bytes(sketch)
+        for key, sketch in new.items():
+            sketches[key].merge(sketch)
+
+        PostViewerSketch.objects.bulk_create(
+            [PostViewerSketch(post_id=post_id, day=day, sketch=sketch.to_bytes()) for (post_id, day), sketch in sketches.items() if day is not None],
+            update_conflicts=True, unique_fields=['post', 'day'], update_fields=['sketch'],
+        )
+        PostViewers.objects.bulk_create(
+            [
+                PostViewers(post_id=post_id, sketch=sketch.to_bytes(), unique_viewers=sketch.count())
+                for (post_id, day), sketch in sketches.items() if day is None
+            ],
+            update_conflicts=True, unique_fields=['post'], update_fields=['sketch', 'unique_viewers', 'updated_at'],
+        )
+    return len(post_ids)
+
+
+def refresh_post_stats(until):
+    """
+    Recompute the hourly and daily post stats and the daily category stats of every hour with
+    events recorded since the watermark, add the viewers recorded since to the viewer sketches,
+    then move the watermark to ``until``. Events are bucketed by when they happened, so a batch
+    written late still lands in its hour. Returns the number of hours recomputed.
+    """
+    with transaction.atomic():
+        watermark = _locked_watermark('post_events')
+        since = watermark.value
+        hours = _touched_days(PostEvent.objects.all(), 'recorded_at', since, until, bucket=TruncHour('created_at'))
+
+        if hours:
+            days = {timezone.localdate(hour) for hour in hours}
+            # events of deleted posts are left out
+            events = PostEvent.objects.filter(post__in=Post.objects.all())
+            hourly = events if since is None else events.filter(_in_ranges('created_at', ((hour, hour + timedelta(hours=1)) for hour in hours)))
+            daily = events if since is None else events.filter(_in_ranges('created_at', map(_day_bounds, days)))
+
+            _replace(
+                PostHourlyStats, PostHourlyStats.objects.filter(hour__in=hours),
+                _activity(hourly, TruncHour('created_at'), 'post'), ('hour', 'post_id'),
+            )
+            _replace(
+                PostDailyStats, PostDailyStats.objects.filter(day__in=days),
+                _activity(daily, TruncDate('created_at'), 'post'), ('day', 'post_id'),
+            )
+            _replace(
+                CategoryDailyStats, CategoryDailyStats.objects.filter(day__in=days),
+                _activity(daily.filter(post__category__isnull=False), TruncDate('created_at'), 'post__category'), ('day', 'category_id'),
+            )
+
+            views = events.filter(kind='view', viewer__isnull=False, recorded_at__lte=until)
+            _add_viewers(views if since is None else views.filter(recorded_at__gt=since))
+
+        watermark.value = until
+        watermark.save()
+    return len(hours)
+
+
+def prune_post_events(now=None):
+    """Delete raw events past ANALYTICS_EVENT_RETENTION_DAYS, oldest first and a chunk at a time."""
+    cutoff = (now or timezone.now()) - timedelta(days=settings.ANALYTICS_EVENT_RETENTION_DAYS)
+    deleted = 0
+    while True:
+        ids = list(PostEvent.objects.filter(created_at__lt=cutoff).order_by('pk').values_list('pk', flat=True)[:10000])
+        if not ids:
+            return deleted
+        deleted += PostEvent.objects.filter(pk__in=ids).delete()[0]
+
+
+def refresh_rollups(now=None):
+    now = now or timezone.now()
+    # rows committed late by a slow transaction still carry a timestamp inside this margin
+    until = now - timedelta(seconds=settings.ANALYTICS_ROLLUP_LAG_SECONDS)
+    return {
+        'revenue_days': refresh_revenue(until),
+        'subscription_days': refresh_subscription_events(until),
+        'plans': snapshot_subscriptions(now),
+        'post_hours': refresh_post_stats(until),
+    }
@@ -0,0 +1,59 @@
+from datetime import timedelta
+
+from django.utils import timezone
+from rest_framework import serializers
+
+from apps.core.serialization import Serializer
+
+
+class SeriesQuerySerializer(Serializer):
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+    interval = serializers.ChoiceField(choices=['day', 'week', 'month'], default='day')
+    plan = serializers.IntegerField(required=False)
+
+    def validate(self, attrs):
+        attrs.setdefault('date_to', timezone.localdate())
+        attrs.setdefault('date_from', attrs['date_to'] - timedelta(days=89))
+        if attrs['date_from'] > attrs['date_to']:
+            raise serializers.ValidationError('date_from must not be after date_to')
+        return attrs
+
+
+class RevenuePointSerializer(Serializer):
+    period = serializers.DateField()
+    currency = serializers.CharField()
+    payments = serializers.IntegerField()
+    gross = serializers.DecimalField(max_digits=14, decimal_places=2)
+    refunds = serializers.IntegerField()
+    refunded = serializers.DecimalField(max_digits=14, decimal_places=2)
+    net = serializers.DecimalField(max_digits=14, decimal_places=2)
+
+
+class SubscriptionPointSerializer(Serializer):
+    period = serializers.DateField()
+    new = serializers.IntegerField()
+    renewed = serializers.IntegerField()
+    canceled = serializers.IntegerField()
+    expired = serializers.IntegerField()
+    active = serializers.IntegerField(allow_null=True)
+    mrr = serializers.DecimalField(max_digits=14, decimal_places=2, allow_null=True)
+    churn_rate = serializers.FloatField(allow_null=True)
+
+
+class PostStatsQuerySerializer(Serializer):
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+    interval = serializers.ChoiceField(choices=['hour', 'day'], default='day')
+    post = serializers.IntegerField(required=False)
+
+    def validate(self, attrs):
+        attrs.setdefault('date_to', timezone.localdate())
+        attrs.setdefault('date_from', attrs['date_to'] - timedelta(days=6 if attrs['interval'] == 'hour' else 29))
+        if attrs['date_from'] > attrs['date_to']:
+            raise serializers.ValidationError('date_from must not be after date_to')
+        if attrs['interval'] == 'hour' and (attrs['date_to'] - attrs['date_from']).days >= 7:
+            raise serializers.ValidationError('Hourly stats cover at most 7 days')
+        if (attrs['date_to'] - attrs['date_from']).days >= 366:
+            raise serializers.ValidationError('Stats cover at most 366 days')
+        return attrs
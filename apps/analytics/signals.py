@@ -0,0 +1,15 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from apps.comments.models import Comment
+
+from . import events
+
+
+@receiver(post_save, sender=Comment)
+def comment_post_save(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(partial(events.record, 'comment', [instance.post_id], events.user_key(instance.author_id)))
@@ -0,0 +1,13 @@
+from celery import shared_task
+
+from . import rollups
+
+
+@shared_task
+def refresh_rollups():
+    return rollups.refresh_rollups()
+
+
+@shared_task
+def prune_post_events():
+    return {'deleted_events': rollups.prune_post_events()}
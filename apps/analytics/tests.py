@@ -0,0 +1,207 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from apps.comments.models import Comment
+from apps.core.testing import (
+    QueryBudgetTestCase, make_category, make_payments, make_plan, make_posts, make_subscriber, make_user,
+)
+from apps.payment.models import Payment, Refund
+from apps.subscribe.models import SubscriptionHistory
+
+from . import events
+from .hll import HyperLogLog, merged
+from .models import (
+    CategoryDailyStats, DailyRevenue, DailySubscriptionStats, PostDailyStats, PostEvent, PostHourlyStats, PostViewers, PostViewerSketch,
+    RollupWatermark,
+)
+from .rollups import refresh_rollups
+from .tasks import prune_post_events
+
+QUERY_BUDGETS = {
+    'analytics:revenue': {'get': 1},
+    'analytics:subscriptions': {'get': 2},
+}
+
+
+def processed(payments, when, **fields):
+    Payment.objects.filter(pk__in=[payment.pk for payment in payments]).update(processed_at=when, **fields)
+
+
+class AnalyticsQueryBudgetTests(QueryBudgetTestCase):
+    budgets = QUERY_BUDGETS
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.admin = make_user(is_staff=True)
+        processed(cls.data.author.payments.all(), timezone.now() - timedelta(days=3))
+        refresh_rollups()
+
+    def test_revenue(self):
+        response = self.assertWithinBudget('get', 'analytics:revenue', user=self.admin)
+        self.assertEqual(response.data['results'][0]['payments'], self.size)
+
+    def test_subscriptions(self):
+        self.assertWithinBudget('get', 'analytics:subscriptions', user=self.admin, data={'interval': 'month'})
+
+    def test_admin_only(self):
+        self.assertEqual(self.client_for(self.data.author).get('/api/v1/analytics/revenue/').status_code, 403)
+
+
+@override_settings(ANALYTICS_ROLLUP_LAG_SECONDS=0)
+class RollupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.plan = make_plan(price=Decimal('30.00'), duration_days=30)
+        cls.user = make_subscriber(cls.plan, history=0)
+
+    def test_revenue_is_maintained_incrementally(self):
+        now = timezone.now()
+        yesterday = make_payments(self.user, 2, subscription=self.user.subscription)
+        processed(yesterday, now - timedelta(days=1))
+        failed = make_payments(self.user, 1)
+        processed(failed, now - timedelta(days=1), status='failed')
+        refresh_rollups(now)
+
+        day = timezone.localdate(now - timedelta(days=1))
+        stats = DailyRevenue.objects.get(day=day)
+        self.assertEqual((stats.plan_id, stats.payments, stats.gross), (self.plan.pk, 2, Decimal('19.98')))
+
+        later = now + timedelta(minutes=5)
+        processed(make_payments(self.user, 1, subscription=self.user.subscription), later)
+        Refund.objects.create(payment=yesterday[0], amount=Decimal('9.99'), status='succeeded', processed_at=later)
+        self.assertEqual(refresh_rollups(later + timedelta(minutes=1))['revenue_days'], 1)
+        # an empty run changes nothing
+        self.assertEqual(refresh_rollups(later + timedelta(minutes=2))['revenue_days'], 0)
+
+        today = DailyRevenue.objects.get(day=timezone.localdate(later))
+        self.assertEqual((today.payments, today.refunds, today.net), (1, 1, Decimal('0.00')))
+        self.assertEqual(DailyRevenue.objects.get(day=day).gross, Decimal('19.98'))
+
+    def test_subscription_events_and_snapshot(self):
+        subscription = self.user.subscription
+        SubscriptionHistory.objects.bulk_create(
+            SubscriptionHistory(subscription=subscription, action=action) for action in ('activated', 'created', 'renewed', 'renewed')
+        )
+        make_subscriber(self.plan)
+        now = timezone.now()
+        refresh_rollups(now)
+
+        stats = DailySubscriptionStats.objects.get(day=timezone.localdate(now), plan=self.plan)
+        self.assertEqual((stats.new, stats.renewed, stats.canceled), (1, 2, 0))
+        self.assertEqual((stats.active, stats.mrr), (2, Decimal('60.00')))
+
+        SubscriptionHistory.objects.create(subscription=subscription, action='canceled')
+        SubscriptionHistory.objects.filter(action='canceled').update(created_at=now + timedelta(seconds=1))
+        refresh_rollups(now + timedelta(seconds=2))
+        stats.refresh_from_db()
+        self.assertEqual((stats.new, stats.canceled, stats.active), (1, 1, 2))
+
+
+@override_settings(ANALYTICS_ROLLUP_LAG_SECONDS=0, ANALYTICS_EVENT_FLUSH_SECONDS=float('inf'))
+class PostEventTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = make_user()
+        cls.category = make_category()
+        cls.post, cls.other = make_posts(cls.author, 2, category=cls.category)
+
+    def setUp(self):
+        events.buffer.drain()
+
+    def test_views_and_comments_are_buffered_until_flushed(self):
+        self.client.get(f'/api/v1/posts/{self.post.slug}/')
+        self.client.get(f'/api/v1/posts/{self.post.slug}/', headers={'user-agent': 'other browser'})
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.create(post=self.post, author=self.author, content='First')
+        self.assertEqual(PostEvent.objects.count(), 0)
+
+        self.assertEqual(events.flush(), 3)
+        self.assertEqual(
+            sorted(PostEvent.objects.values_list('kind', flat=True)), ['comment', 'view', 'view'],
+        )
+        self.assertEqual(PostEvent.objects.filter(kind='view').values('viewer').distinct().count(), 2)
+
+    @override_settings(ANALYTICS_EVENT_BUFFER_SIZE=2)
+    def test_due_events_are_written_by_the_request(self):
+        self.client.get(f'/api/v1/posts/{self.post.slug}/')
+        self.assertEqual((PostEvent.objects.count(), len(events.buffer)), (0, 1))
+
+        self.client.get(f'/api/v1/posts/{self.other.slug}/')
+        self.assertEqual((PostEvent.objects.count(), len(events.buffer)), (2, 0))
+
+    def test_events_recorded_by_a_task_are_written_when_it_ends(self):
+        events.record('view', [self.post.pk], viewer=1)
+        prune_post_events.apply()
+        self.assertEqual((PostEvent.objects.count(), len(events.buffer)), (1, 0))
+
+    def test_rollups_by_hour_day_and_category(self):
+        now = timezone.now()
+        noon = (now - timedelta(days=1)).replace(hour=12, minute=30)
+        events.record('view', [self.post.pk, self.post.pk, self.other.pk], viewer=1)
+        events.record('view', [self.post.pk], viewer=2)
+        events.record('pin_impression', [self.post.pk])
+        events.flush()
+        PostEvent.objects.update(created_at=noon)
+        PostEvent.objects.filter(viewer=2).update(created_at=noon - timedelta(hours=1))
+        refresh_rollups(now + timedelta(seconds=1))
+
+        hourly = dict(PostHourlyStats.objects.filter(post=self.post).values_list('hour', 'views'))
+        self.assertEqual(sorted(hourly.values()), [1, 2])
+        daily = PostDailyStats.objects.get(post=self.post, day=noon.date())
+        self.assertEqual((daily.views, daily.unique_viewers, daily.pin_impressions), (3, 2, 1))
+        category = CategoryDailyStats.objects.get(category=self.category, day=noon.date())
+        self.assertEqual((category.views, category.unique_viewers), (4, 2))
+
+        # a batch written late lands in the hour its events happened
+        events.record('view', [self.post.pk], viewer=3)
+        events.flush()
+        PostEvent.objects.filter(viewer=3).update(created_at=noon - timedelta(hours=1), recorded_at=now + timedelta(seconds=2))
+        self.assertEqual(refresh_rollups(now + timedelta(seconds=3))['post_hours'], 1)
+        self.assertEqual(PostHourlyStats.objects.get(post=self.post, hour=min(hourly)).views, 2)
+        self.assertEqual(PostDailyStats.objects.get(post=self.post, day=noon.date()).unique_viewers, 3)
+
+    def test_viewer_sketches_by_day_and_all_time(self):
+        now = timezone.now()
+        events.record('view', [self.post.pk], viewer=events.user_key(1))
+        events.record('view', [self.post.pk], viewer=events.user_key(2))
+        events.flush()
+        PostEvent.objects.update(created_at=now - timedelta(days=1))
+        events.record('view', [self.post.pk, self.post.pk], viewer=events.user_key(1))
+        events.record('view', [self.post.pk], viewer=events.user_key(3))
+        events.flush()
+        refresh_rollups(now + timedelta(seconds=1))
+
+        days = PostViewerSketch.objects.filter(post=self.post)
+        self.assertEqual(sorted(HyperLogLog.from_bytes(day.sketch).count() for day in days), [2, 2])
+        self.assertEqual(merged(day.sketch for day in days).count(), 3)
+        self.assertEqual(PostViewers.objects.get(post=self.post).unique_viewers, 3)
+
+        # seeing the same viewers again, e.g. after the watermark was reset, counts nothing twice
+        RollupWatermark.objects.filter(name='post_events').update(value=None)
+        refresh_rollups(now + timedelta(seconds=2))
+        self.assertEqual(PostViewers.objects.get(post=self.post).unique_viewers, 3)
+
+
+class HyperLogLogTests(SimpleTestCase):
+    def sketch(self, viewers):
+        return HyperLogLog().update(events.user_key(viewer) for viewer in viewers)
+
+    def test_estimates_within_a_few_percent(self):
+        for number in (10, 1000, 50000):
+            estimate = self.sketch(range(number)).count()
+            self.assertAlmostEqual(estimate, number, delta=max(1, number * 0.05))
+
+    def test_merge_is_the_union(self):
+        union = self.sketch(range(0, 6000)).merge(self.sketch(range(4000, 10000)))
+        self.assertEqual(union.registers, self.sketch(range(10000)).registers)
+
+    def test_stored_sketches_stay_small(self):
+        few, many = self.sketch(range(50)), self.sketch(range(100000))
+        self.assertLess(len(few.to_bytes()), 200)
+        self.assertLessEqual(len(many.to_bytes()), 4097)
+        for sketch in (few, many):
+            self.assertEqual(HyperLogLog.from_bytes(sketch.to_bytes()).registers, sketch.registers)
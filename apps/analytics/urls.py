@@ -0,0 +1,9 @@
+from django.urls import path
+from . import views
+
+app_name = 'analytics'
+
+urlpatterns = [
+    path('revenue/', views.revenue, name='revenue'),
+    path('subscriptions/', views.subscriptions, name='subscriptions'),
+]
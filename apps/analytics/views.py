@@ -0,0 +1,112 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import Sum
+from rest_framework import permissions
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+
+from apps.core.db import non_atomic_reads
+
+from .models import DailyRevenue, DailySubscriptionStats
+from .serializers import RevenuePointSerializer, SeriesQuerySerializer, SubscriptionPointSerializer
+
+
+def _period(day, interval):
+    if interval == 'week':
+        return day - timedelta(days=day.weekday())
+    if interval == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def _series_query(request):
+    query = SeriesQuerySerializer(data=request.query_params)
+    query.is_valid(raise_exception=True)
+    return query.validated_data
+
+
+def _rollups(model, query, **filters):
+    queryset = model.objects.filter(**filters)
+    if 'plan' in query:
+        queryset = queryset.filter(plan_id=query['plan'])
+    return queryset
+
+
+def _series_response(query, results):
+    return Response({
+        'interval': query['interval'],
+        'date_from': query['date_from'],
+        'date_to': query['date_to'],
+        'results': results,
+    })
+
+
+@non_atomic_reads
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def revenue(request):
+    """Payments, refunds and net revenue per day, week or month and currency, from the daily rollups."""
+    query = _series_query(request)
+    daily = (
+        _rollups(DailyRevenue, query, day__range=(query['date_from'], query['date_to']))
+        .order_by('day', 'currency').values_list('day', 'currency')
+        .annotate(Sum('payments'), Sum('gross'), Sum('refunds'), Sum('refunded'))
+    )
+
+    points = {}
+    for day, currency, payments, gross, refunds, refunded in daily:
+        period = _period(day, query['interval'])
+        point = points.setdefault((period, currency), {
+            'period': period, 'currency': currency, 'payments': 0, 'gross': Decimal('0'), 'refunds': 0, 'refunded': Decimal('0'),
+        })
+        point['payments'] += payments
+        point['gross'] += gross
+        point['refunds'] += refunds
+        point['refunded'] += refunded
+    for point in points.values():
+        point['net'] = point['gross'] - point['refunded']
+
+    return _series_response(query, RevenuePointSerializer(points.values(), many=True).data)
+
+
+@non_atomic_reads
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def subscriptions(request):
+    """
+    Subscription events per day, week or month with the active subscriptions and MRR at the end of
+    each period. Churn is the period's cancellations and expiries over the subscriptions active
+    when it started.
+    """
+    query = _series_query(request)
+    daily = (
+        _rollups(DailySubscriptionStats, query, day__range=(query['date_from'], query['date_to']))
+        .order_by('day').values_list('day')
+        .annotate(Sum('new'), Sum('renewed'), Sum('canceled'), Sum('expired'), Sum('active'), Sum('mrr'))
+    )
+    before = (
+        _rollups(DailySubscriptionStats, query, day__lt=query['date_from'], active__isnull=False)
+        .order_by('-day').values_list('day').annotate(Sum('active')).first()
+    )
+
+    points = {}
+    for day, new, renewed, canceled, expired, active, mrr in daily:
+        period = _period(day, query['interval'])
+        point = points.setdefault(period, {
+            'period': period, 'new': 0, 'renewed': 0, 'canceled': 0, 'expired': 0, 'active': None, 'mrr': None,
+        })
+        point['new'] += new
+        point['renewed'] += renewed
+        point['canceled'] += canceled
+        point['expired'] += expired
+        if active is not None:
+            point['active'], point['mrr'] = active, mrr
+
+    opening = before[1] if before else None
+    for point in points.values():
+        point['churn_rate'] = round((point['canceled'] + point['expired']) / opening, 4) if opening else None
+        if point['active'] is not None:
+            opening = point['active']
+
+    return _series_response(query, SubscriptionPointSerializer(points.values(), many=True).data)
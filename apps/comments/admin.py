@@ -1,13 +1,19 @@
 from django.contrib import admin
 from django.utils.html import format_html
+
+from apps.core.admin import LargeTableAdmin
+from apps.core.bulk import bulk_action
+
+from . import bulk
 from .models import Comment
 
 
 @admin.register(Comment)
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(LargeTableAdmin):
     list_display = ('id', 'post_title', 'author', 'content_preview', 'parent_comment', 'is_active', 'created_at')
-    list_filter = ('is_active', 'created_at', 'updated_at')
-    search_fields = ('content', 'author__username', 'post_title')
+    list_filter = ('is_active', 'created_at')
+    date_hierarchy = 'created_at'
+    search_fields = ('content', 'author__username', 'post__title')
     readonly_fields = ('created_at', 'updated_at')
     raw_id_fields = ('author', 'post', 'parent')
     list_editable = ('is_active',)
@@ -43,18 +49,11 @@ class CommentAdmin(admin.ModelAdmin):
     parent_comment.short_description = 'Parent'
 
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related('author', 'post', 'parent')
-
-    actions = ['make_active', 'make_inactive']
-
-    def make_active(self, request, queryset):
-        updated = queryset.update(is_active=True)
-        self.message_user(request, f'{updated} comments marked active')
-
-    make_active.short_description = 'Make Active'
-
-    def make_inactive(self, request, queryset):
-        updated = queryset.update(is_active=False)
-        self.message_user(request, f'{updated} comments marked inactive')
-
-    make_inactive.short_description = 'Make Inactive'
+        return super().get_queryset(request).select_related('author', 'post', 'parent').defer(
+            'post__content', 'post__excerpt', 'post__image_renditions',
+        )
+
+    actions = [
+        bulk_action(bulk.make_active, 'Make Active'),
+        bulk_action(bulk.make_inactive, 'Make Inactive'),
+    ]
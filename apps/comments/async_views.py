@@ -0,0 +1,34 @@
+from django.shortcuts import aget_object_or_404
+
+from apps.core.async_views import json_response, public_async_view
+from apps.core.conditional import conditional_get
+from apps.core.concurrency import gather_reads
+from apps.main.models import Post
+
+from .models import Comment
+from .serializers import CommentsDetailValuesSerializer
+from .views import _post_comments_validators
+
+
+@public_async_view
+@conditional_get(_post_comments_validators, 'comments')
+async def post_comments(request, post_id):
+    post = await aget_object_or_404(Post.objects.only('id', 'title', 'slug'), id=post_id, status='published')
+    comments = Comment.objects.filter(post=post, parent=None, is_active=True).order_by('-created_at')
+    replies = Comment.objects.filter(parent__in=comments, is_active=True).order_by('created_at')
+
+    comment_rows, reply_rows, comments_count = await gather_reads(
+        lambda: list(CommentsDetailValuesSerializer.prepare(comments)),
+        lambda: list(CommentsDetailValuesSerializer.prepare(replies)),
+        Comment.objects.filter(post=post, is_active=True).count,
+    )
+    serializer = CommentsDetailValuesSerializer(comment_rows, many=True, context={'request': request}, replies=reply_rows)
+    return json_response({
+        'post': {
+            'id': post.id,
+            'title': post.title,
+            'slug': post.slug,
+        },
+        'comments': serializer.data,
+        'comments_count': comments_count,
+    })
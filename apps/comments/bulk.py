@@ -0,0 +1,31 @@
+from django.db.models import F
+from django.utils import timezone
+
+from apps.accounts.stats import refresh_user_stats
+from apps.core.bulk import bulk_operation
+from apps.main.models import Post
+
+from .models import Comment
+
+
+def set_comments_active(queryset, is_active):
+    rows = list(queryset.exclude(is_active=is_active).values_list('pk', 'author_id', 'post_id'))
+    if not rows:
+        return 0
+
+    pks, author_ids, post_ids = zip(*rows)
+    Comment.objects.filter(pk__in=pks).update(is_active=is_active, updated_at=timezone.now())
+    # what the per-comment signals would do, once per chunk
+    refresh_user_stats(set(author_ids), 'comments_count')
+    Post.objects.filter(pk__in=set(post_ids)).update(comments_version=F('comments_version') + 1)
+    return len(rows)
+
+
+@bulk_operation
+def make_active(queryset):
+    return set_comments_active(queryset, True)
+
+
+@bulk_operation
+def make_inactive(queryset):
+    return set_comments_active(queryset, False)
@@ -1,10 +1,20 @@
 from django.db import models
 from django.conf import settings
 
+from apps.core.models import TracksStatusMixin
+from apps.core.serialization import subquery_count
 from apps.main.models import Post
 
 
-class Comment(models.Model):
+class CommentQuerySet(models.QuerySet):
+    def with_list_info(self):
+        """Load everything CommentSerializer reads per comment along with the comments."""
+        return self.select_related('author').annotate(
+            active_replies_count=subquery_count(self.model.objects.filter(is_active=True), 'parent'),
+        )
+
+
+class Comment(TracksStatusMixin, models.Model):
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='comments')
     author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='comments')
     parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='replies')
@@ -13,6 +23,9 @@ class Comment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = CommentQuerySet.as_manager()
+    status_field = 'is_active'
+
     class Meta:
         db_table = 'comments'
         verbose_name = 'Comment'
@@ -22,6 +35,7 @@ class Comment(models.Model):
             models.Index(fields=['post', '-created_at']),
             models.Index(fields=['author', '-created_at']),
             models.Index(fields=['parent', '-created_at']),
+            models.Index(fields=['-created_at']),
         ]
 
     def __str__(self):
@@ -29,8 +43,10 @@ class Comment(models.Model):
 
     @property
     def replies_count(self):
+        if hasattr(self, 'active_replies_count'):
+            return self.active_replies_count
         return self.replies.filter(is_active=True).count()
 
     @property
     def is_reply(self):
-        return self.parent is not None
+        return self.parent_id is not None
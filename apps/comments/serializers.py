@@ -1,9 +1,12 @@
 from rest_framework import serializers
 from .models import Comment
+from apps.accounts.models import User
+from apps.core.serialization import ModelSerializer, ValuesSerializer, field_representation, subquery_count
 from apps.main.models import Post
+from apps.media.renditions import rendition_urls
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(ModelSerializer):
     author_info = serializers.SerializerMethodField()
     replies_count = serializers.ReadOnlyField()
     is_reply = serializers.ReadOnlyField()
@@ -23,10 +26,50 @@ class CommentSerializer(serializers.ModelSerializer):
             'username': obj.author.username,
             'full_name': obj.author.full_name,
             'avatar': obj.author.avatar.url if obj.author.avatar else None,
+            'avatar_renditions': rendition_urls(obj.author.avatar_renditions),
         }
 
 
-class CommentCreateSerializer(serializers.ModelSerializer):
+class CommentValuesSerializer(ValuesSerializer):
+    model_serializer_class = CommentSerializer
+    values = (
+        'id', 'content', 'author', 'author__username', 'author__first_name', 'author__last_name', 'author__avatar',
+        'author__avatar_renditions', 'parent', 'is_active', 'created_at', 'updated_at',
+    )
+
+    @classmethod
+    def get_annotations(cls):
+        return {'active_replies_count': subquery_count(Comment.objects.filter(is_active=True), 'parent')}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.avatar_storage = User._meta.get_field('avatar').storage
+        self.format_datetime = field_representation(CommentSerializer, 'created_at')
+
+    def to_representation(self, row):
+        avatar = row['author__avatar']
+        return {
+            'id': row['id'],
+            'content': row['content'],
+            'author': row['author'],
+            'author_info': {
+                'id': row['author'],
+                'username': row['author__username'],
+                'full_name': '{} {}'.format(row['author__first_name'], row['author__last_name']),
+                # the model serializer reports the relative url here, without the request host
+                'avatar': self.avatar_storage.url(avatar) if avatar else None,
+                'avatar_renditions': rendition_urls(row['author__avatar_renditions']),
+            },
+            'parent': row['parent'],
+            'is_active': row['is_active'],
+            'replies_count': row['active_replies_count'],
+            'is_reply': row['parent'] is not None,
+            'created_at': self.format_datetime(row['created_at']),
+            'updated_at': self.format_datetime(row['updated_at']),
+        }
+
+
+class CommentCreateSerializer(ModelSerializer):
     class Meta:
         model = Comment
         fields = ['post', 'parent', 'content']
@@ -53,20 +96,54 @@ class CommentCreateSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
-class CommentUpdateSerializer(serializers.ModelSerializer):
+class CommentUpdateSerializer(ModelSerializer):
     class Meta:
         model = Comment
         fields = ['content']
 
 
-class CommentsDetailSerializer(serializers.ModelSerializer):
+class CommentsDetailSerializer(CommentSerializer):
     replies = serializers.SerializerMethodField()
 
     class Meta(CommentSerializer.Meta):
         fields = CommentSerializer.Meta.fields + ['replies']
 
     def get_replies(self, obj):
-        if obj.parent is None:
-            replies = obj.replies.filter(is_active=True).order_by('created_at')
+        if obj.parent_id is None:
+            replies = getattr(obj, 'active_replies', None)
+            if replies is None:
+                replies = obj.replies.filter(is_active=True).with_list_info().order_by('created_at')
             return CommentSerializer(replies, many=True, context=self.context).data
         return []
+
+
+class CommentsDetailValuesSerializer(CommentValuesSerializer):
+    """
+    Loads the active replies of a whole page of top-level comments with one query, or takes them
+    from ``replies`` when the caller has already read them.
+    """
+    model_serializer_class = CommentsDetailSerializer
+
+    def __init__(self, *args, replies=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.replies = replies
+
+    def to_representation_list(self, rows):
+        rows = list(rows)
+        reply_rows = self.replies
+        if reply_rows is None:
+            parent_ids = [row['id'] for row in rows if row['parent'] is None]
+            reply_rows = []
+            if parent_ids:
+                reply_rows = self.prepare(Comment.objects.filter(parent__in=parent_ids, is_active=True).order_by('created_at'))
+
+        replies = {}
+        for reply in reply_rows:
+            replies.setdefault(reply['parent'], []).append(self.to_representation(reply))
+
+        data = []
+        for row in rows:
+            item = self.to_representation(row)
+            item['replies'] = replies.get(row['id'], []) if row['parent'] is None else []
+            data.append(item)
+        return data
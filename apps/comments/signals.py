@@ -0,0 +1,22 @@
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from apps.main.models import Post, deleting_posts
+from .models import Comment
+
+
+def bump_comments_version(post_id):
+    Post.objects.filter(pk=post_id).update(comments_version=F('comments_version') + 1)
+
+
+@receiver(post_save, sender=Comment)
+def comment_post_save(sender, instance, **kwargs):
+    bump_comments_version(instance.post_id)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_post_delete(sender, instance, origin=None, **kwargs):
+    # no version to bump on a post that is being deleted
+    if not deleting_posts(origin):
+        bump_comments_version(instance.post_id)
@@ -1,3 +1,102 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.urls import reverse
 
-# Create your tests here.
+from apps.core.testing import QueryBudgetTestCase, admin_action, make_comments, make_posts, make_user
+from apps.main.models import Post
+
+from .models import Comment
+
+QUERY_BUDGETS = {
+    'comment-list': {'get': 2, 'post': 9},
+    'comment-detail': {'get': 2, 'patch': 5, 'delete': 6},
+    'my-comments': {'get': 2},
+    'post-comments': {'get': 5},
+    'comments-replies': {'get': 4},
+}
+
+
+class CommentQueryBudgetTests(QueryBudgetTestCase):
+    budgets = QUERY_BUDGETS
+
+    def grow(self):
+        for post in make_posts(make_user(), 3):
+            make_comments(post, [self.data.author, self.data.reader, make_user()], 10, replies=1)
+
+    def test_comment_list(self):
+        self.assertQueriesConstant('get', 'comment-list', self.grow)
+
+    @override_settings(API_VALUES_SERIALIZERS=False)
+    def test_comment_list_model_serializer(self):
+        self.assertQueriesConstant('get', 'comment-list', self.grow)
+
+    def test_values_and_model_serializers_agree(self):
+        self.grow()
+        comment, post = self.data.comment, self.data.post
+        Comment.objects.create(post=post, parent=comment, author=self.data.reader, content='Reply')
+        client = self.client_for(self.data.reader)
+        urls = (
+            reverse('comment-list'), reverse('my-comments'), reverse('post-comments', args=[post.pk]),
+            reverse('comment-detail', args=[comment.pk]), reverse('comments-replies', args=[comment.pk]),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                values = client.get(url).json()
+                with override_settings(API_VALUES_SERIALIZERS=False):
+                    model = client.get(url).json()
+                self.assertEqual(values, model)
+
+    def test_comment_create(self):
+        data = {'post': self.data.post.pk, 'parent': self.data.comment.pk, 'content': 'Agreed'}
+        self.assertWithinBudget('post', 'comment-list', user=self.data.reader, data=data, status=201)
+
+    def test_comment_detail(self):
+        comment = self.data.comment
+
+        def grow():
+            for _ in range(10):
+                Comment.objects.create(post=comment.post, parent=comment, author=make_user(), content='More')
+
+        self.assertQueriesConstant('get', 'comment-detail', grow, args=[comment.pk])
+
+    def test_comment_update_and_delete(self):
+        comment = self.data.comment
+        self.assertWithinBudget('patch', 'comment-detail', args=[comment.pk], user=comment.author, data={'content': 'Edited'})
+        self.assertWithinBudget('delete', 'comment-detail', args=[comment.pk], user=comment.author, status=204)
+
+    def test_my_comments(self):
+        reader = self.data.reader
+        self.assertQueriesConstant('get', 'my-comments', lambda: make_comments(self.data.post, [reader], 25), user=reader)
+
+    def test_post_comments(self):
+        post = self.data.post
+        self.assertQueriesConstant(
+            'get', 'post-comments', lambda: make_comments(post, [make_user(), make_user()], 25, replies=2), args=[post.pk],
+        )
+
+    def test_comment_replies(self):
+        comment = self.data.comment
+
+        def grow():
+            for _ in range(25):
+                Comment.objects.create(post=comment.post, parent=comment, author=make_user(), content='Reply')
+
+        self.assertQueriesConstant('get', 'comments-replies', grow, args=[comment.pk])
+
+
+@override_settings(BULK_ACTION_CHUNK_SIZE=4)
+class CommentBulkActionTests(TestCase):
+    def test_deactivate_all_matching_keeps_counters(self):
+        admin = make_user(is_staff=True, is_superuser=True)
+        authors = [make_user(), make_user()]
+        post = make_posts(authors[0], 1)[0]
+        make_comments(post, authors, 5, replies=1)
+        version = Post.objects.get(pk=post.pk).comments_version
+
+        admin_action(self, admin, Comment, 'make_inactive', select_across=True)
+
+        self.assertFalse(Comment.objects.filter(is_active=True).exists())
+        for author in authors:
+            author.refresh_from_db()
+            self.assertEqual(author.comments_count, 0)
+        # ten comments in chunks of four
+        self.assertEqual(Post.objects.get(pk=post.pk).comments_version, version + 3)
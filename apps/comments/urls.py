@@ -1,10 +1,13 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
+
+reads = async_views if settings.ASYNC_READ_VIEWS else views
 
 urlpatterns = [
     path('', views.CommentListCreateView.as_view(), name='comment-list'),
     path('<int:pk>/', views.CommentDetailView.as_view(), name='comment-detail'),
     path('my-comments/', views.MyCommentsView.as_view(), name='my-comments'),
-    path('post/<int:post_id>/', views.post_comments, name='post-comments'),
+    path('post/<int:post_id>/', reads.post_comments, name='post-comments'),
     path('<int:comment_id>/replies/', views.comments_replies, name='comments-replies'),
 ]
@@ -2,20 +2,29 @@ from rest_framework import generics, permissions, filters
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes
 from django_filters.rest_framework import DjangoFilterBackend
+from django.db.models import Prefetch
 from django.shortcuts import get_object_or_404
 
+from apps.core.concurrency import run_concurrently
+from apps.core.conditional import conditional_get, make_etag
+from apps.core.db import NonAtomicReadsMixin, non_atomic_reads
+from apps.core.serialization import ValuesListMixin
+
 from .models import Comment
 from .serializers import (
     CommentSerializer,
+    CommentValuesSerializer,
     CommentCreateSerializer,
     CommentUpdateSerializer,
-    CommentsDetailSerializer
+    CommentsDetailSerializer,
+    CommentsDetailValuesSerializer
 )
 from apps.main.models import Post
 from .permissions import IsAutOrReadOnly
 
 
-class CommentListCreateView(generics.ListCreateAPIView):
+class CommentListCreateView(NonAtomicReadsMixin, ValuesListMixin, generics.ListCreateAPIView):
+    values_serializer_class = CommentValuesSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['author', 'post', 'parent']
@@ -24,7 +33,7 @@ class CommentListCreateView(generics.ListCreateAPIView):
     ordering = ['-created_at']
 
     def get_queryset(self):
-        return Comment.objects.filter(is_active=True).select_related('author', 'post', 'parent')
+        return Comment.objects.filter(is_active=True).with_list_info()
 
     def get_serializer_class(self):
         if self.request.method == 'POST':
@@ -32,8 +41,8 @@ class CommentListCreateView(generics.ListCreateAPIView):
         return CommentSerializer
 
 
-class CommentDetailView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Comment.objects.filter(is_active=True).select_related('author', 'post')
+class CommentDetailView(NonAtomicReadsMixin, generics.RetrieveUpdateDestroyAPIView):
+    queryset = Comment.objects.filter(is_active=True).with_list_info()
     serializer_class = CommentsDetailSerializer
     permission_classes = [IsAutOrReadOnly]
 
@@ -47,8 +56,9 @@ class CommentDetailView(generics.RetrieveUpdateDestroyAPIView):
         instance.save()
 
 
-class MyCommentsView(generics.ListAPIView):
+class MyCommentsView(NonAtomicReadsMixin, ValuesListMixin, generics.ListAPIView):
     serializer_class = CommentSerializer
+    values_serializer_class = CommentValuesSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['post', 'parent', 'is_active']
@@ -57,38 +67,63 @@ class MyCommentsView(generics.ListAPIView):
     ordering = ['-created_at']
 
     def get_queryset(self):
-        return Comment.objects.filter(author=self.request.user).select_related('post', 'parent')
+        return Comment.objects.filter(author=self.request.user).with_list_info()
+
+
+def _post_comments_validators(request, post_id):
+    row = Post.objects.filter(id=post_id, status='published').values_list('title', 'slug', 'comments_version').first()
+    if row is None:
+        return None
+    return make_etag('post-comments', post_id, *row), None
 
 
+@non_atomic_reads
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
+@conditional_get(_post_comments_validators, 'comments')
 def post_comments(request, post_id):
     post = get_object_or_404(Post, id=post_id, status='published')
-    comments = Comment.objects.filter(post=post, parent=None, is_active=True).select_related('author').prefetch_related('replies__author').order_by(
-        '-created_at')
-
-    serializer = CommentsDetailSerializer(comments, many=True, context={'request': request})
+    comments = Comment.objects.filter(post=post, parent=None, is_active=True).with_list_info().prefetch_related(
+        Prefetch('replies', Comment.objects.filter(is_active=True).with_list_info().order_by('created_at'), to_attr='active_replies'),
+    ).order_by('-created_at')
+
+    serializer = CommentsDetailValuesSerializer.select()(comments, many=True, context={'request': request})
+    comments_data, comments_count = run_concurrently(
+        lambda: serializer.data,
+        post.comments.filter(is_active=True).count,
+    )
     return Response({
         'post': {
             'id': post.id,
             'title': post.title,
             'slug': post.slug,
         },
-        'comments': serializer.data,
-        'comments_count': post.comments.filter(is_active=True).count()
+        'comments': comments_data,
+        'comments_count': comments_count
     })
 
 
+def _comments_replies_validators(request, comment_id):
+    row = Comment.objects.filter(pk=comment_id, parent=None, is_active=True).values_list(
+        'post_id', 'post__comments_version', 'author__username', 'author__first_name', 'author__last_name', 'author__avatar'
+    ).first()
+    if row is None:
+        return None
+    return make_etag('comment-replies', comment_id, *row), None
+
+
+@non_atomic_reads
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
+@conditional_get(_comments_replies_validators, 'comments')
 def comments_replies(request, comment_id):
-    parent_comment = get_object_or_404(Comment, pk=comment_id, parent=None, is_active=True)
+    parent_comment = get_object_or_404(Comment.objects.with_list_info(), pk=comment_id, parent=None, is_active=True)
 
-    replies = Comment.objects.filter(parent=parent_comment, is_active=True).select_related('author').order_by('created_at')
+    replies = Comment.objects.filter(parent=parent_comment, is_active=True).with_list_info().order_by('created_at')
 
-    serializer = CommentSerializer(replies, many=True, context={'request': request})
+    serializer = CommentValuesSerializer.select()(replies, many=True, context={'request': request})
     return Response({
         'parent_comment': CommentSerializer(parent_comment, context={'request': request}).data,
         'replies': serializer.data,
-        'replies_count': replies.count()
+        'replies_count': len(serializer.data)
     })
@@ -0,0 +1,180 @@
+import json
+
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.admin.views.main import ORDER_VAR, PAGE_VAR
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.core.paginator import Paginator
+from django.db import connections, transaction
+from django.http import HttpResponseBadRequest
+from django.urls import path
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from .exports import CONTENT_TYPES, filter_export, streaming_export
+from .models import BulkJob, OutboxEvent
+from .routers import use_replicas
+
+
+def estimated_count(queryset):
+    """
+    The PostgreSQL planner's row estimate for ``queryset``: ``pg_class.reltuples`` when it is
+    unfiltered, the EXPLAIN estimate otherwise. None on other databases or before the table is analyzed.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+
+    with connection.cursor() as cursor:
+        if not queryset.query.where:
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [queryset.model._meta.db_table])
+            row = cursor.fetchone()
+            return row[0] if row and row[0] >= 0 else None
+
+        sql, params = queryset.order_by().values('pk').query.sql_with_params()
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Counts exactly up to ADMIN_EXACT_COUNT_LIMIT rows; past that the changelist shows the planner's
+    estimate instead of running COUNT(*) over the whole table.
+    """
+
+    @cached_property
+    def count(self):
+        limit = settings.ADMIN_EXACT_COUNT_LIMIT
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_count(queryset)
+            if estimate is not None and estimate > limit:
+                return estimate
+
+        exact = queryset.order_by()[:limit + 1].count()
+        if exact <= limit:
+            return exact
+        return max(exact, estimated_count(queryset) or 0)
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Changelists for tables with millions of rows: estimated counts, newest first by primary key,
+    a date hierarchy built from the MIN/MAX of the field rather than DISTINCT scans, and "Older"
+    links that continue from the last row shown (``<pk>__lt``) instead of ever larger OFFSETs.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    ordering = ('-pk',)
+    change_list_template = 'admin/large_table_change_list.html'
+
+    def changelist_view(self, request, extra_context=None):
+        response = super().changelist_view(request, extra_context)
+        cl = getattr(response, 'context_data', {}).get('cl')
+        if cl is None or ORDER_VAR in cl.params:
+            return response
+
+        keyset_param = f'{self.model._meta.pk.name}__lt'
+        if keyset_param in cl.params or PAGE_VAR in cl.params:
+            response.context_data['keyset_newest'] = cl.get_query_string(remove=[keyset_param, PAGE_VAR])
+        if len(cl.result_list) == cl.list_per_page:
+            response.context_data['keyset_older'] = cl.get_query_string(
+                {keyset_param: cl.result_list[len(cl.result_list) - 1].pk}, [PAGE_VAR],
+            )
+        return response
+
+
+class ExportAdminMixin:
+    """
+    Streaming CSV/JSONL downloads of ``export_fields``: "Export selected" actions on the changelist,
+    and ``<changelist>/export/?format=csv|jsonl&date_from=&date_to=&status=&gzip=1`` for whole
+    date ranges, read from a replica when there is one.
+    """
+    export_fields = ()
+    export_date_field = 'created_at'
+    export_status_field = 'status'
+
+    def get_urls(self):
+        info = self.model._meta.app_label, self.model._meta.model_name
+        # not atomic: the rows are streamed after the view returns, and reads may use a replica
+        view = transaction.non_atomic_requests(self.admin_site.admin_view(self.export_view))
+        return [path('export/', view, name='%s_%s_export' % info)] + super().get_urls()
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        if self.actions is not None and self.has_view_permission(request):
+            for format in CONTENT_TYPES:
+                actions[f'export_{format}'] = (self._export_action(format), f'export_{format}', f'Export selected as {format.upper()}')
+        return actions
+
+    def _export_action(self, format):
+        def action(modeladmin, request, queryset):
+            return self.export_response(queryset, format)
+
+        return action
+
+    def export_view(self, request):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        format = request.GET.get('format', 'csv')
+        if format not in CONTENT_TYPES:
+            return HttpResponseBadRequest(f'format must be one of: {", ".join(CONTENT_TYPES)}')
+
+        with use_replicas():
+            queryset = self.model._default_manager.all()
+            queryset = queryset.using(queryset.db)
+        try:
+            queryset = filter_export(queryset, request.GET, self.export_date_field, self.export_status_field)
+        except ValidationError as e:
+            return HttpResponseBadRequest(e.message)
+        return self.export_response(queryset, format, compress=request.GET.get('gzip') in ('1', 'true'))
+
+    def export_response(self, queryset, format, compress=False):
+        return streaming_export(queryset, self.export_fields, self.model._meta.db_table, format, compress)
+
+
+@admin.register(BulkJob)
+class BulkJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'description', 'model', 'status', 'progress_display', 'changed', 'created_by', 'created_at', 'finished_at')
+    list_filter = ('status', 'created_at')
+    readonly_fields = (
+        'operation', 'description', 'model', 'status', 'progress_display', 'total', 'processed', 'changed', 'last_pk',
+        'error', 'created_by', 'created_at', 'started_at', 'finished_at',
+    )
+    exclude = ('filters',)
+
+    def progress_display(self, obj):
+        return f'{obj.progress}% ({obj.processed} of ~{obj.total})'
+
+    progress_display.short_description = 'Progress'
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('created_by').defer('filters')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(admin.ModelAdmin):
+    list_display = ('id', 'topic', 'status', 'attempts', 'created_at', 'available_at', 'processed_at')
+    list_filter = ('status', 'topic')
+    readonly_fields = ('topic', 'payload', 'status', 'attempts', 'last_error', 'created_at', 'available_at', 'processed_at')
+    actions = ['retry_events']
+
+    @admin.action(description='Retry selected events')
+    def retry_events(self, request, queryset):
+        retried = queryset.exclude(status='processed').update(status='pending', attempts=0, available_at=timezone.now())
+        self.message_user(request, f'{retried} events queued again')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,27 @@
+from functools import wraps
+
+from django.db import transaction
+from django.http import Http404, HttpResponse
+from django.views.decorators.http import require_safe
+
+from .renderers import ORJSONRenderer
+
+
+def json_response(data, status=200):
+    return HttpResponse(ORJSONRenderer().render(data), status=status, content_type='application/json')
+
+
+def public_async_view(view_func):
+    """
+    Plain Django async view serving anonymous GETs with DRF-style JSON bodies. These views run
+    outside ATOMIC_REQUESTS, which Django does not support for coroutines.
+    """
+
+    @wraps(view_func)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            return await view_func(request, *args, **kwargs)
+        except Http404 as exc:
+            return json_response({'detail': str(exc) or 'Not found.'}, status=404)
+
+    return transaction.non_atomic_requests(require_safe(wrapper))
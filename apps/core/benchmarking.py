@@ -0,0 +1,84 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import URLError
+from urllib.request import Request, urlopen
+
+from django.core.management.base import CommandError
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, round(fraction * (len(sorted_values) - 1)))]
+
+
+def summarize(results, elapsed):
+    """``results`` are ``(seconds, ok)`` pairs; latencies are reported in milliseconds."""
+    latencies = sorted(seconds * 1000 for seconds, _ in results)
+    return {
+        'requests': len(results),
+        'errors': sum(1 for _, ok in results if not ok),
+        'elapsed_s': round(elapsed, 3),
+        'rps': round(len(results) / elapsed, 1) if elapsed else 0.0,
+        'p50_ms': round(percentile(latencies, 0.50), 2),
+        'p95_ms': round(percentile(latencies, 0.95), 2),
+        'p99_ms': round(percentile(latencies, 0.99), 2),
+    }
+
+
+def check_errors(runs):
+    """Fail when any request of ``runs`` (name to stats) failed, as the latencies then time error responses."""
+    failed = {name: stats['errors'] for name, stats in runs.items() if stats['errors']}
+    if failed:
+        raise CommandError(
+            'Requests failed, so the figures above do not measure the endpoints: '
+            + ', '.join(f'{name} {errors}' for name, errors in failed.items())
+        )
+
+
+def run_threaded(fetch, requests, concurrency):
+    """Call ``fetch()`` (returning True on success) ``requests`` times from ``concurrency`` threads."""
+
+    def timed(_):
+        started = time.perf_counter()
+        ok = fetch()
+        return time.perf_counter() - started, ok
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        started = time.perf_counter()
+        results = list(pool.map(timed, range(requests)))
+        elapsed = time.perf_counter() - started
+    return summarize(results, elapsed)
+
+
+async def run_async(fetch, requests, concurrency):
+    """``run_threaded`` for coroutine functions: at most ``concurrency`` requests in flight."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def timed():
+        async with semaphore:
+            started = time.perf_counter()
+            ok = await fetch()
+            return time.perf_counter() - started, ok
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(timed() for _ in range(requests)))
+    return summarize(results, time.perf_counter() - started)
+
+
+def http_send(url, data=None, headers=None, method=None, timeout=30):
+    """Send one request and report whether it succeeded; ``data`` bytes make it a POST by default."""
+    try:
+        with urlopen(Request(url, data=data, headers=headers or {}, method=method), timeout=timeout) as response:
+            response.read()
+            return response.status < 400
+    except (URLError, OSError):
+        return False
+
+
+def http_fetcher(url, headers=None, timeout=30):
+    def fetch():
+        return http_send(url, headers=headers, timeout=timeout)
+
+    return fetch
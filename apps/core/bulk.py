@@ -0,0 +1,90 @@
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME
+from django.contrib.admin.views.main import PAGE_VAR
+from django.db import transaction
+from django.http import HttpRequest, QueryDict
+from django.urls import reverse
+from django.utils.html import format_html
+
+_operations = {}
+
+
+def bulk_operation(func):
+    """
+    Register ``func(queryset) -> number of rows changed`` for bulk jobs. It is called once per chunk
+    of at most BULK_ACTION_CHUNK_SIZE rows, inside a transaction, and should work set-based:
+    UPDATEs over the chunk and bulk_create for the rows it records.
+    """
+    _operations[f'{func.__module__}.{func.__name__}'] = func
+    return func
+
+
+def get_operation(name):
+    import_module(name.rpartition('.')[0])
+    return _operations[name]
+
+
+def selection_queryset(job):
+    """
+    The rows of ``job``, rebuilt as its model admin's changelist filtered by ``job.filters``, the
+    way the admin itself restores a changelist from its query string. Filters and search apply as
+    its creator saw them.
+    """
+    request = HttpRequest()
+    request.method = 'GET'
+    request.GET = QueryDict(job.filters)
+    request.user = job.created_by
+    model = job.get_model()
+    return admin.site.get_model_admin(model).get_changelist_instance(request).queryset
+
+
+def bulk_action(operation, description):
+    """
+    A ModelAdmin action running ``operation`` over the selection. Selections of up to one chunk
+    run right away; "select all" and larger selections become a BulkJob for the Celery worker.
+    """
+    from .admin import estimated_count
+    from .models import BulkJob
+    from .tasks import run_bulk_job
+
+    name = f'{operation.__module__}.{operation.__name__}'
+
+    def action(modeladmin, request, queryset):
+        select_across = request.POST.get('select_across') == '1'
+        # the changelist's filters and search; the selection is walked by primary key, never loaded whole
+        filters = request.GET.copy()
+        filters.pop(PAGE_VAR, None)
+        if select_across:
+            total = estimated_count(queryset)
+            if total is None:
+                total = queryset.count()
+        else:
+            selected = request.POST.getlist(ACTION_CHECKBOX_NAME)
+            filters['pk__in'] = ','.join(selected)
+            total = len(selected)
+
+        job = BulkJob.objects.create(
+            operation=name, description=description, model=queryset.model._meta.label, filters=filters.urlencode(),
+            total=total, created_by=request.user,
+        )
+
+        if not select_across and total <= settings.BULK_ACTION_CHUNK_SIZE:
+            run_bulk_job(job.pk)
+            job.refresh_from_db()
+            modeladmin.message_user(request, f'{description}: {job.changed} of {job.processed} {queryset.model._meta.verbose_name_plural} changed')
+            return
+
+        transaction.on_commit(lambda: run_bulk_job.delay(job.pk))
+        url = reverse('admin:core_bulkjob_change', args=[job.pk])
+        modeladmin.message_user(
+            request,
+            format_html('{}: <a href="{}">job #{}</a> queued for about {} {}', description, url, job.pk, total, queryset.model._meta.verbose_name_plural),
+            messages.INFO,
+        )
+
+    action.__name__ = operation.__name__
+    action.short_description = description
+    return action
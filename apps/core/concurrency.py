@@ -0,0 +1,63 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _with_own_connection(func):
+    # a pool thread keeps its connection between calls for CONN_MAX_AGE, like a request thread does
+    def run():
+        close_old_connections()
+        try:
+            return func()
+        finally:
+            close_old_connections()
+
+    return run
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.CONCURRENT_QUERIES_MAX_WORKERS, thread_name_prefix='concurrent-queries')
+    return _executor
+
+
+def run_concurrently(*funcs):
+    """
+    Call independent read-only ORM callables on a shared thread pool, each thread with its own
+    connection, and return their results in order. Latency becomes that of the slowest call.
+
+    The pool connections only see committed data, so callables must not depend on writes made
+    earlier in the same transaction. With CONCURRENT_QUERIES off (e.g. in tests, where fixtures
+    are never committed) the callables simply run one after another.
+    """
+    if not settings.CONCURRENT_QUERIES or len(funcs) < 2:
+        return [func() for func in funcs]
+
+    # copy_context() carries request-scoped state such as the replica routing into the pool threads
+    futures = [_get_executor().submit(copy_context().run, _with_own_connection(func)) for func in funcs]
+    return [future.result() for future in futures]
+
+
+async def gather_reads(*funcs):
+    """
+    ``run_concurrently`` for async views, under the same CONCURRENT_QUERIES switch and on the same
+    bounded pool, awaiting the pool threads instead of blocking on them. The async ORM queues every
+    query on a single thread, so gathering its coroutines does not overlap the queries themselves.
+    """
+    if not settings.CONCURRENT_QUERIES or len(funcs) < 2:
+        return await sync_to_async(lambda: [func() for func in funcs])()
+
+    loop = asyncio.get_running_loop()
+    return await asyncio.gather(*(
+        loop.run_in_executor(_get_executor(), copy_context().run, _with_own_connection(func)) for func in funcs
+    ))
@@ -0,0 +1,122 @@
+import hashlib
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+
+def make_etag(*parts):
+    digest = hashlib.md5('|'.join(str(part) for part in parts).encode(), usedforsecurity=False).hexdigest()
+    # Weak: derived from the data a response renders, not from its bytes.
+    return f'W/"{digest}"'
+
+
+def apply_cache_policy(request, response, policy, etag=None, last_modified=None):
+    if etag:
+        response.headers.setdefault('ETag', etag)
+    if last_modified:
+        response.headers.setdefault('Last-Modified', http_date(last_modified.timestamp()))
+
+    rules = settings.API_CACHE_POLICIES[policy]
+    if 'HTTP_AUTHORIZATION' in request.META:
+        patch_cache_control(response, private=True, max_age=0, must_revalidate=True)
+    else:
+        patch_cache_control(response, public=True, max_age=rules['max_age'], s_maxage=rules['s_maxage'])
+    patch_vary_headers(response, ('Authorization',))
+    return response
+
+
+def _not_modified_response(request, validators):
+    etag, last_modified = validators
+    last_modified_timestamp = int(last_modified.timestamp()) if last_modified else None
+    return get_conditional_response(request, etag=etag, last_modified=last_modified_timestamp)
+
+
+def _finalize(request, response, policy, validators):
+    if response.status_code in (200, 304):
+        apply_cache_policy(request, response, policy, *validators)
+    return response
+
+
+def conditional_response(request, policy, validators, render, on_not_modified=None):
+    """
+    Answer a GET from ``validators`` (an ``(etag, last_modified)`` pair) before ``render`` runs.
+
+    When the client's copy is current a 304 is returned and ``render`` - serialization and most
+    of the queries - is skipped. ``validators`` of None means the resource does not exist and the
+    view is left to produce its own 404.
+    """
+    if request.method not in ('GET', 'HEAD') or validators is None:
+        return render()
+
+    response = _not_modified_response(request, validators)
+    if response is not None:
+        if response.status_code == 304 and on_not_modified is not None:
+            on_not_modified()
+    else:
+        response = render()
+    return _finalize(request, response, policy, validators)
+
+
+async def aconditional_response(request, policy, validators, render):
+    """``conditional_response`` for async views; ``render`` is a coroutine function."""
+    if request.method not in ('GET', 'HEAD') or validators is None:
+        return await render()
+
+    response = _not_modified_response(request, validators)
+    if response is None:
+        response = await render()
+    return _finalize(request, response, policy, validators)
+
+
+def conditional_get(validators_func, policy):
+    """
+    Decorator for ``@api_view`` functions; apply it below ``@api_view``/``@permission_classes``.
+    Async views are supported too, with ``validators_func`` run in a worker thread.
+    """
+
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def async_wrapper(request, *args, **kwargs):
+                validators = None
+                if request.method in ('GET', 'HEAD'):
+                    validators = await sync_to_async(validators_func)(request, *args, **kwargs)
+                return await aconditional_response(
+                    request, policy, validators, lambda: view_func(request, *args, **kwargs)
+                )
+
+            return async_wrapper
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            validators = validators_func(request, *args, **kwargs) if request.method in ('GET', 'HEAD') else None
+            return conditional_response(
+                request, policy, validators, lambda: view_func(request, *args, **kwargs)
+            )
+
+        return wrapper
+
+    return decorator
+
+
+class ConditionalGetMixin:
+    cache_policy = None
+
+    def get_conditional_validators(self):
+        return None
+
+    def on_not_modified(self, validators):
+        pass
+
+    def get(self, request, *args, **kwargs):
+        validators = self.get_conditional_validators()
+        return conditional_response(
+            request,
+            self.cache_policy,
+            validators,
+            lambda: super(ConditionalGetMixin, self).get(request, *args, **kwargs),
+            on_not_modified=lambda: self.on_not_modified(validators),
+        )
@@ -0,0 +1,28 @@
+from functools import wraps
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from rest_framework.permissions import SAFE_METHODS
+
+
+def non_atomic_reads(view_func):
+    """
+    Keep GET/HEAD/OPTIONS requests out of the ATOMIC_REQUESTS transaction while still running
+    unsafe methods atomically. Apply it outermost, above ``@api_view``.
+    """
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if request.method in SAFE_METHODS or not connections[DEFAULT_DB_ALIAS].settings_dict['ATOMIC_REQUESTS']:
+            return view_func(request, *args, **kwargs)
+        with transaction.atomic():
+            return view_func(request, *args, **kwargs)
+
+    return transaction.non_atomic_requests(wrapper)
+
+
+class NonAtomicReadsMixin:
+    """``non_atomic_reads`` for class-based views."""
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        return non_atomic_reads(super().as_view(**initkwargs))
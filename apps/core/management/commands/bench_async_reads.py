@@ -0,0 +1,100 @@
+import asyncio
+import threading
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+from django.urls import path
+
+from apps.comments import async_views as comment_async_views, views as comment_views
+from apps.core.benchmarking import check_errors, http_fetcher, run_async, run_threaded
+from apps.main import async_views as post_async_views, views as post_views
+from apps.main.models import Category, Post
+
+
+class _URLConf:
+    def __init__(self, urlpatterns):
+        self.urlpatterns = urlpatterns
+
+
+def _urlconf(posts, comments):
+    return _URLConf([
+        path('api/v1/posts/categories/<slug:slug>/posts/', posts.post_by_category),
+        path('api/v1/posts/popular/', posts.popular_posts),
+        path('api/v1/posts/recent/', posts.recent_posts),
+        path('api/v1/posts/featured/', posts.featured_posts),
+        path('api/v1/comments/post/<int:post_id>/', comments.post_comments),
+    ])
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the public read endpoints served as sync views under WSGI, sync views under ASGI and '
+        'async views under ASGI. Runs in-process by default; pass --wsgi-url/--asgi-url to load running servers.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint and mode')
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument('--wsgi-url', help='Base URL of a server running lessoner.wsgi')
+        parser.add_argument('--asgi-url', help='Base URL of a server running lessoner.asgi with ASYNC_READ_VIEWS=True')
+
+    def handle(self, *args, **options):
+        category = Category.objects.filter(posts__status='published').values_list('slug', flat=True).first()
+        post_id = Post.objects.filter(status='published').values_list('pk', flat=True).first()
+        if category is None or post_id is None:
+            raise CommandError('Needs at least one published post in a category')
+
+        paths = [
+            f'/api/v1/posts/categories/{category}/posts/',
+            '/api/v1/posts/popular/',
+            '/api/v1/posts/recent/',
+            '/api/v1/posts/featured/',
+            f'/api/v1/comments/post/{post_id}/',
+        ]
+        requests, concurrency = options['requests'], options['concurrency']
+
+        self.stdout.write(f'{"endpoint":<44}{"mode":<14}{"rps":>9}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}{"errors":>8}')
+        results = {}
+        for url_path in paths:
+            if options['wsgi_url'] or options['asgi_url']:
+                runs = [
+                    (mode, run_threaded(http_fetcher(base.rstrip('/') + url_path), requests, concurrency))
+                    for mode, base in (('wsgi', options['wsgi_url']), ('asgi', options['asgi_url'])) if base
+                ]
+            else:
+                runs = self.run_in_process(url_path, requests, concurrency)
+            for mode, stats in runs:
+                results[f'{url_path} {mode}'] = stats
+                self.stdout.write(
+                    f'{url_path:<44}{mode:<14}{stats["rps"]:>9}{stats["p50_ms"]:>9}{stats["p95_ms"]:>9}'
+                    f'{stats["p99_ms"]:>9}{stats["errors"]:>8}'
+                )
+        check_errors(results)
+
+    def run_in_process(self, url_path, requests, concurrency):
+        sync_urls = _urlconf(post_views, comment_views)
+        async_urls = _urlconf(post_async_views, comment_async_views)
+        local = threading.local()
+
+        def wsgi_fetch():
+            if not hasattr(local, 'client'):
+                local.client = Client()
+            return local.client.get(url_path).status_code == 200
+
+        async def asgi_fetch(client):
+            return (await client.get(url_path)).status_code == 200
+
+        async def asgi_run():
+            client = AsyncClient()
+            return await run_async(lambda: asgi_fetch(client), requests, concurrency)
+
+        # the test clients send Host: testserver
+        allowed_hosts = [*settings.ALLOWED_HOSTS, 'testserver']
+        runs = []
+        with override_settings(ROOT_URLCONF=sync_urls, ALLOWED_HOSTS=allowed_hosts):
+            runs.append(('wsgi sync', run_threaded(wsgi_fetch, requests, concurrency)))
+            runs.append(('asgi sync', asyncio.run(asgi_run())))
+        with override_settings(ROOT_URLCONF=async_urls, ALLOWED_HOSTS=allowed_hosts):
+            runs.append(('asgi async', asyncio.run(asgi_run())))
+        return runs
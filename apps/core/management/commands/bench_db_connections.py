@@ -0,0 +1,70 @@
+import copy
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connections, transaction
+
+from apps.core.benchmarking import summarize
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure per-request database overhead: a fresh connection per request (CONN_MAX_AGE=0, no pool) '
+        'versus the configured connection strategy, with and without the ATOMIC_REQUESTS transaction.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+
+    def handle(self, *args, **options):
+        default = connections[DEFAULT_DB_ALIAS]
+        fresh = copy.deepcopy(default.settings_dict)
+        fresh['CONN_MAX_AGE'] = 0
+        fresh.get('OPTIONS', {}).pop('pool', None)
+
+        scenarios = [
+            ('new connection, atomic', fresh, True),
+            ('configured, atomic', default.settings_dict, True),
+            ('configured, non-atomic read', default.settings_dict, False),
+        ]
+        pool = default.settings_dict.get('OPTIONS', {}).get('pool')
+        self.stdout.write(
+            f'configured: CONN_MAX_AGE={default.settings_dict["CONN_MAX_AGE"]}, '
+            f'CONN_HEALTH_CHECKS={default.settings_dict["CONN_HEALTH_CHECKS"]}, pool={pool or "off"}'
+        )
+        self.stdout.write(f'{"scenario":<30}{"mean ms":>10}{"p50 ms":>10}{"p95 ms":>10}')
+        for name, settings_dict, atomic in scenarios:
+            stats = self.measure(settings_dict, atomic, options['requests'])
+            self.stdout.write(f'{name:<30}{stats["mean_ms"]:>10}{stats["p50_ms"]:>10}{stats["p95_ms"]:>10}')
+
+    def measure(self, settings_dict, atomic, requests):
+        original = connections[DEFAULT_DB_ALIAS]
+        connection = original.__class__(settings_dict, DEFAULT_DB_ALIAS)
+        connections[DEFAULT_DB_ALIAS] = connection
+        results = []
+        try:
+            for _ in range(requests):
+                started = time.perf_counter()
+                # What the request_started / request_finished handlers and ATOMIC_REQUESTS do around a view.
+                close_old_connections()
+                if atomic:
+                    with transaction.atomic():
+                        self.query(connection)
+                else:
+                    self.query(connection)
+                close_old_connections()
+                results.append((time.perf_counter() - started, True))
+        finally:
+            connection.close()
+            if settings_dict.get('OPTIONS', {}).get('pool'):
+                connection.close_pool()
+            connections[DEFAULT_DB_ALIAS] = original
+
+        stats = summarize(results, sum(seconds for seconds, _ in results))
+        stats['mean_ms'] = round(stats['elapsed_s'] * 1000 / requests, 3)
+        return stats
+
+    def query(self, connection):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
@@ -0,0 +1,113 @@
+import timeit
+import uuid
+from io import BytesIO
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.serializer_helpers import ReturnDict, ReturnList
+
+from apps.core.parsers import ORJSONParser
+from apps.core.renderers import ORJSONRenderer, orjson_enabled
+
+
+def _renditions(stem):
+    return {
+        size: {fmt: f'/media/posts/renditions/{stem}/{size}.{fmt}' for fmt in ('webp', 'jpeg')}
+        for size in ('full', 'card', 'thumbnail')
+    }
+
+
+def _author(i):
+    return {
+        'id': i, 'username': f'author{i}', 'full_name': f'Author Number {i}', 'avatar': None,
+        'avatar_renditions': None,
+    }
+
+
+def post_list_payload(count):
+    now = timezone.now()
+    results = ReturnList([
+        ReturnDict({
+            'id': i, 'title': f'Post title number {i} — «unicode»', 'slug': f'post-title-number-{i}',
+            'content': 'Lorem ipsum dolor sit amet, consectetur adipiscing elit. ' * 3 + '...',
+            'image': f'/media/posts/ab/cd/{uuid.uuid4().hex}.jpg', 'image_renditions': _renditions(i),
+            'categories': 'Python', 'author': f'author{i % 50}', 'status': 'published',
+            'created_at': (now - timedelta(hours=i)).isoformat().replace('+00:00', 'Z'),
+            'updated_at': (now - timedelta(minutes=i)).isoformat().replace('+00:00', 'Z'),
+            'views_count': i * 17, 'comments_count': i % 40, 'is_pinned': i % 10 == 0,
+            'pinned_info': {'pinned_at': now, 'subscription_end_date': now} if i % 10 == 0 else None,
+        }, serializer=None)
+        for i in range(count)
+    ], serializer=None)
+    return {'count': count * 10, 'next': 'http://testserver/api/posts/?page=2', 'previous': None, 'results': results}
+
+
+def comment_tree_payload(count, replies=3):
+    now = timezone.now()
+
+    def comment(i, parent=None, children=()):
+        return {
+            'id': i, 'post': 1, 'parent': parent, 'content': f'Comment body {i} ' * 8, 'author': i % 50,
+            'author_info': _author(i % 50), 'is_active': True, 'replies_count': len(children),
+            'created_at': now, 'updated_at': now, 'replies': list(children),
+        }
+
+    return [
+        comment(i, children=[comment(i * 100 + j, parent=i) for j in range(replies)])
+        for i in range(count)
+    ]
+
+
+def payment_payload(count):
+    now = timezone.now()
+    return [
+        {
+            'id': i, 'amount': Decimal('19.99'), 'currency': 'USD', 'status': 'succeeded',
+            'stripe_payment_intent_id': f'pi_{uuid.uuid4().hex}', 'created_at': now,
+            'metadata': {'plan_id': i % 3, 'checkout_url': 'https://checkout.stripe.com/c/pay/cs_test'},
+        }
+        for i in range(count)
+    ]
+
+
+class Command(BaseCommand):
+    help = 'Compare render/parse throughput of the stdlib and orjson JSON backends on API-shaped payloads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=100, help='Items per payload')
+        parser.add_argument('--number', type=int, default=200, help='Iterations per measurement')
+
+    def handle(self, *args, **options):
+        if not orjson_enabled():
+            self.stdout.write(self.style.WARNING('orjson is not installed or disabled; both columns use the stdlib'))
+
+        size, number = options['size'], options['number']
+        payloads = {
+            'post list': post_list_payload(size),
+            'comment tree': comment_tree_payload(size),
+            'payments': payment_payload(size),
+        }
+        stdlib_renderer, fast_renderer = JSONRenderer(), ORJSONRenderer()
+        stdlib_parser, fast_parser = JSONParser(), ORJSONParser()
+
+        self.stdout.write(f'{"payload":<14}{"op":<8}{"bytes":>10}{"stdlib ms":>12}{"orjson ms":>12}{"speedup":>10}')
+        for name, data in payloads.items():
+            body = stdlib_renderer.render(data)
+            if fast_renderer.render(data) != body:
+                self.stdout.write(self.style.ERROR(f'{name}: orjson output differs from stdlib output'))
+
+            rows = [
+                ('render', lambda: stdlib_renderer.render(data), lambda: fast_renderer.render(data)),
+                ('parse', lambda: stdlib_parser.parse(BytesIO(body)), lambda: fast_parser.parse(BytesIO(body))),
+            ]
+            for op, slow, fast in rows:
+                slow_ms = min(timeit.repeat(slow, number=number, repeat=3)) / number * 1000
+                fast_ms = min(timeit.repeat(fast, number=number, repeat=3)) / number * 1000
+                self.stdout.write(
+                    f'{name:<14}{op:<8}{len(body):>10}{slow_ms:>12.3f}{fast_ms:>12.3f}{slow_ms / fast_ms:>9.1f}x'
+                )
+
@@ -0,0 +1,201 @@
+import json
+import random
+import subprocess
+import threading
+import time
+from contextlib import ExitStack
+from itertools import count
+from types import SimpleNamespace
+from unittest import mock
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Q
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+
+from apps.accounts.models import User
+from apps.core.benchmarking import check_errors, http_send, run_threaded
+from apps.core.testing import stripe_signature
+from apps.main.models import Post
+from apps.payment.models import Payment
+from apps.subscribe.models import SubscriptionPlan
+
+SCENARIOS = ('feed', 'post_detail', 'comment_thread', 'checkout', 'webhook')
+
+BENCH_WEBHOOK_SECRET = 'whsec_bench'
+
+
+class Command(BaseCommand):
+    help = (
+        'Load-test the feed, post detail, comment thread, checkout and Stripe webhook flows against the '
+        'current database (see seed_synthetic_data) and report throughput and p50/p95/p99 latency. Runs '
+        'in-process with Stripe stubbed by default; pass --base-url to load a running server instead. '
+        'checkout consumes users without a subscription and webhook completes pending payments.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='Comma separated subset of ' + ', '.join(SCENARIOS))
+        parser.add_argument('--requests', type=int, default=500, help='Requests per scenario')
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument('--base-url', help='Base URL of a running server')
+        parser.add_argument('--webhook-secret', help='Signing secret of the server at --base-url')
+        parser.add_argument('--stripe-latency', type=float, default=0.0, help='Seconds each stubbed Stripe call takes in-process')
+        parser.add_argument('--label', help='Name of this run in the report, the git revision by default')
+        parser.add_argument('--output', help='Write the report as JSON to this file')
+        parser.add_argument('--seed', type=int)
+
+    def handle(self, *args, **options):
+        scenarios = [name.strip() for name in options['scenarios'].split(',') if name.strip()]
+        unknown = set(scenarios) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f'Unknown scenarios: {", ".join(sorted(unknown))}')
+
+        self.random = random.Random(options['seed'])
+        self.base_url = (options['base_url'] or '').rstrip('/')
+        self.secret = options['webhook_secret'] or settings.STRIPE_WEBHOOK_SECRET or BENCH_WEBHOOK_SECRET
+        self.stripe_latency = options['stripe_latency']
+        self.local = threading.local()
+        requests, concurrency = options['requests'], options['concurrency']
+
+        report = {
+            'label': options['label'] or git_revision(),
+            'created_at': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'target': self.base_url or 'in-process',
+            'requests': requests,
+            'concurrency': concurrency,
+            'scenarios': {},
+        }
+
+        self.stdout.write(f'{"scenario":<16}{"requests":>9}{"rps":>9}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}{"errors":>8}')
+        with ExitStack() as stack:
+            if not self.base_url:
+                # the test client sends Host: testserver
+                stack.enter_context(override_settings(
+                    STRIPE_WEBHOOK_SECRET=self.secret, ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+                ))
+                for target, stub in self.stripe_stubs().items():
+                    stack.enter_context(mock.patch(target, stub))
+            for name in scenarios:
+                fetch, planned = getattr(self, f'prepare_{name}')(requests)
+                if not planned:
+                    self.stdout.write(self.style.WARNING(f'{name:<16}no data, skipped'))
+                    continue
+                stats = run_threaded(fetch, planned, concurrency)
+                report['scenarios'][name] = stats
+                self.stdout.write(
+                    f'{name:<16}{stats["requests"]:>9}{stats["rps"]:>9}{stats["p50_ms"]:>9}{stats["p95_ms"]:>9}'
+                    f'{stats["p99_ms"]:>9}{stats["errors"]:>8}'
+                )
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
+            self.stdout.write(f'Report written to {options["output"]}')
+        check_errors(report['scenarios'])
+
+    def send(self, method, path, data=None, headers=None, ok=(200,)):
+        if self.base_url:
+            body = data.encode() if isinstance(data, str) else data
+            return http_send(self.base_url + path, data=body, headers=headers, method=method.upper())
+
+        if not hasattr(self.local, 'client'):
+            self.local.client = Client()
+        extra = {f'HTTP_{key.upper().replace("-", "_")}': value for key, value in (headers or {}).items()}
+        response = getattr(self.local.client, method)(path, data, content_type='application/json', **extra) if data \
+            else getattr(self.local.client, method)(path, **extra)
+        return response.status_code in ok
+
+    def stripe_stubs(self):
+        def call(prefix, **fields):
+            def stub(*args, **kwargs):
+                time.sleep(self.stripe_latency)
+                identifier = f'{prefix}_bench_{uuid4().hex}'
+                return SimpleNamespace(id=identifier, **{key: value.format(id=identifier) for key, value in fields.items()})
+            return stub
+
+        return {
+            'stripe.Customer.create': call('cus'),
+            'stripe.checkout.Session.create': call('cs', url='https://checkout.stripe.com/c/pay/{id}'),
+        }
+
+    def pick(self, paths, requests):
+        def fetch():
+            return self.send('get', self.random.choice(paths))
+
+        return fetch, requests if paths else 0
+
+    def published_posts(self):
+        return Post.objects.filter(status='published').order_by('-created_at')
+
+    def prepare_feed(self, requests):
+        pages = max(1, min(5, self.published_posts().count() // settings.REST_FRAMEWORK['PAGE_SIZE']))
+        base = reverse('main:post-list')
+        return self.pick([base] + [f'{base}?page={page}' for page in range(2, pages + 1)], requests)
+
+    def prepare_post_detail(self, requests):
+        slugs = self.published_posts().values_list('slug', flat=True)[:1000]
+        return self.pick([reverse('main:post-detail', args=[slug]) for slug in slugs], requests)
+
+    def prepare_comment_thread(self, requests):
+        posts = self.published_posts().filter(comments__parent=None).values_list('pk', flat=True).distinct()[:1000]
+        return self.pick([reverse('post-comments', args=[pk]) for pk in posts], requests)
+
+    def prepare_checkout(self, requests):
+        plan = SubscriptionPlan.objects.filter(is_active=True).order_by('price').first()
+        users = list(
+            User.objects.filter(is_active=True, subscription__isnull=True)
+            .exclude(payments__status__in=['pending', 'processing'])
+            .values_list('pk', flat=True)[:requests]
+        )
+        if plan is None or not users:
+            return None, 0
+
+        tokens = [str(AccessToken.for_user(User(pk=pk))) for pk in users]
+        body = json.dumps({'subscription_plan_id': plan.pk})
+        path = reverse('payment:create-checkout-session')
+        sequence = count()
+
+        def fetch():
+            headers = {'Authorization': f'Bearer {tokens[next(sequence)]}', 'Content-Type': 'application/json'}
+            return self.send('post', path, body, headers, ok=(201,))
+
+        return fetch, len(tokens)
+
+    def prepare_webhook(self, requests):
+        payments = list(
+            Payment.objects.filter(Q(status='pending') | Q(status='processing'), subscription__isnull=False)
+            .values_list('pk', 'stripe_session_id')[:requests]
+        )
+        if not payments:
+            return None, 0
+
+        path = reverse('payment:stripe-webhook')
+        sequence = count()
+
+        def fetch():
+            payment_id, session_id = payments[next(sequence)]
+            payload = json.dumps({
+                'id': f'evt_bench_{uuid4().hex}',
+                'type': 'checkout.session.completed',
+                'data': {'object': {'id': session_id, 'metadata': {'payment_id': str(payment_id)}}},
+            })
+            headers = {'Stripe-Signature': stripe_signature(payload, self.secret), 'Content-Type': 'application/json'}
+            return self.send('post', path, payload, headers)
+
+        return fetch, len(payments)
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
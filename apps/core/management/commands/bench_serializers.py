@@ -0,0 +1,60 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from apps.comments.models import Comment
+from apps.comments.serializers import CommentsDetailValuesSerializer, CommentValuesSerializer
+from apps.core.renderers import ORJSONRenderer
+from apps.main.models import Post
+from apps.main.serializers import PostListValuesSerializer
+from apps.payment.models import Payment
+from apps.payment.serializers import PaymentValuesSerializer
+
+
+class Command(BaseCommand):
+    help = 'Compare per-item cost of the model serializers and their values() counterparts on existing rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=100, help='Rows per list')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        limit, repeat = options['limit'], options['repeat']
+        context = {'request': Request(APIRequestFactory().get('/api/v1/posts/'))}
+        renderer = ORJSONRenderer()
+        cases = [
+            ('posts', PostListValuesSerializer, Post.objects.select_related('author', 'category')[:limit]),
+            ('comments', CommentValuesSerializer, Comment.objects.select_related('author')[:limit]),
+            ('comment threads', CommentsDetailValuesSerializer, Comment.objects.filter(parent=None).select_related('author')[:limit]),
+            ('payments', PaymentValuesSerializer, Payment.objects.select_related('user', 'subscription__plan')[:limit]),
+        ]
+
+        self.stdout.write(f'{"list":<16}{"items":>6}{"model µs/item":>15}{"values µs/item":>16}{"queries":>10}{"speedup":>9}')
+        for name, values_class, queryset in cases:
+            items = queryset.count()
+            if not items:
+                self.stdout.write(f'{name:<16}{"no rows":>6}')
+                continue
+
+            results = []
+            for serializer_class in (values_class.model_serializer_class, values_class):
+                body = None
+                best = float('inf')
+                for _ in range(repeat):
+                    with CaptureQueriesContext(connection) as queries:
+                        started = time.perf_counter()
+                        data = serializer_class(queryset.all(), many=True, context=context).data
+                        best = min(best, time.perf_counter() - started)
+                    body = renderer.render(data)
+                results.append((best / items * 1e6, len(queries), body))
+
+            (slow_us, slow_queries, slow_body), (fast_us, fast_queries, fast_body) = results
+            if slow_body != fast_body:
+                self.stdout.write(self.style.ERROR(f'{name}: values output differs from the model serializer'))
+            self.stdout.write(
+                f'{name:<16}{items:>6}{slow_us:>15.1f}{fast_us:>16.1f}{f"{slow_queries}->{fast_queries}":>10}{slow_us / fast_us:>8.1f}x'
+            )
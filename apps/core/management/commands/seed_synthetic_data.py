@@ -0,0 +1,265 @@
+import random
+import secrets
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+from django.utils.text import slugify
+
+from apps.accounts.models import User
+from apps.accounts.stats import reconcile_user_stats
+from apps.comments.models import Comment
+from apps.main.models import Category, Post, build_excerpt
+from apps.payment.models import Payment, Refund, WebhookEvent
+from apps.subscribe.models import PinnedPost, Subscription, SubscriptionHistory, SubscriptionPlan
+
+WORDS = (
+    'data python django query index cache lesson design course stream async model review deploy scale '
+    'replica vector thread pattern future queue worker budget latency storage search render migrate '
+    'feature release testing profile network memory schema backend frontend pipeline metric'
+).split()
+
+SUBSCRIPTION_STATUSES = (('active', 70), ('expired', 15), ('canceled', 10), ('pending', 5))
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """Let bulk_create keep generated created_at/updated_at values instead of stamping now()."""
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class Command(BaseCommand):
+    help = (
+        'Bulk-generate a production-shaped dataset: users, categories, posts, threaded comments, '
+        'subscriptions with history, pinned posts, payments, refunds and webhook events. Every run '
+        'adds rows under a fresh prefix, so it can be repeated to grow the data.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--categories', type=int, default=40)
+        parser.add_argument('--posts-per-user', type=float, default=5)
+        parser.add_argument('--comments-per-post', type=float, default=8)
+        parser.add_argument('--max-reply-depth', type=int, default=3)
+        parser.add_argument('--subscribed', type=float, default=0.2, help='Share of users with a subscription')
+        parser.add_argument('--payments-per-subscription', type=float, default=3)
+        parser.add_argument('--days', type=int, default=730, help='Spread created_at over this many days')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, help='Random seed, for repeatable datasets')
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+        self.days = options['days']
+        self.prefix = f'synthetic-{secrets.token_hex(3)}'
+
+        with explicit_timestamps(User, Post, Comment, Subscription, SubscriptionHistory, Payment, Refund, WebhookEvent):
+            user_ids = self.create_users(options['users'])
+            category_ids = self.create_categories(options['categories'])
+            post_ids = self.create_posts(user_ids, category_ids, round(options['users'] * options['posts_per_user']))
+            comments = self.create_comments(post_ids, user_ids, options['comments_per_post'], options['max_reply_depth'])
+            subscriptions = self.create_subscriptions(user_ids, options['subscribed'])
+            pinned = self.pin_posts(subscriptions)
+            payments, refunds, events = self.create_payments(subscriptions, options['payments_per_subscription'])
+
+        reconciled = reconcile_user_stats(User.objects.filter(username__startswith=self.prefix), batch_size=self.batch_size)
+        self.stdout.write(self.style.SUCCESS(
+            f'{self.prefix}: {len(user_ids)} users, {len(category_ids)} categories, {len(post_ids)} posts, '
+            f'{comments} comments, {len(subscriptions)} subscriptions, {pinned} pinned posts, {payments} payments, '
+            f'{refunds} refunds, {events} webhook events ({reconciled} user counters reconciled)'
+        ))
+
+    def moment(self, after=None):
+        start = after or self.now - timedelta(days=self.days)
+        return start + (self.now - start) * self.random.random()
+
+    def sentence(self, words):
+        return ' '.join(self.random.choice(WORDS) for _ in range(words))
+
+    def bulk_create(self, model, objects):
+        with transaction.atomic():
+            return model.objects.bulk_create(objects, batch_size=self.batch_size)
+
+    def create_users(self, number):
+        password = make_password('synthetic-password')
+        for batch in chunks(range(number), self.batch_size):
+            users = []
+            for i in batch:
+                joined = self.moment()
+                users.append(User(
+                    username=f'{self.prefix}-{i}', email=f'{self.prefix}-{i}@example.com', password=password,
+                    first_name=self.random.choice(WORDS).title(), last_name=self.random.choice(WORDS).title(),
+                    date_joined=joined, created_at=joined, updated_at=joined,
+                ))
+            self.bulk_create(User, users)
+        return list(User.objects.filter(username__startswith=self.prefix).order_by('pk').values_list('pk', flat=True))
+
+    def create_categories(self, number):
+        categories = [
+            Category(name=f'{self.sentence(2).title()} {self.prefix}-{i}', slug=slugify(f'{self.prefix}-category-{i}'))
+            for i in range(number)
+        ]
+        return [category.pk for category in self.bulk_create(Category, categories)]
+
+    def create_posts(self, user_ids, category_ids, number):
+        for batch in chunks(range(number), self.batch_size):
+            posts = []
+            for i in batch:
+                # a few prolific authors write most posts
+                author = user_ids[int(len(user_ids) * self.random.random() ** 3)]
+                title = self.sentence(self.random.randint(3, 8)).capitalize()
+                content = '\n\n'.join(self.sentence(self.random.randint(40, 120)) for _ in range(self.random.randint(1, 12)))
+                created = self.moment()
+                posts.append(Post(
+                    author_id=author, title=title[:100], slug=f'{self.prefix}-{i}', content=content, excerpt=build_excerpt(content),
+                    category_id=self.random.choice(category_ids) if category_ids and self.random.random() < 0.95 else None,
+                    status='published' if self.random.random() < 0.9 else 'draft',
+                    views_count=int(self.random.expovariate(1 / 300)), created_at=created, updated_at=created,
+                ))
+            self.bulk_create(Post, posts)
+        return list(
+            Post.objects.filter(slug__startswith=self.prefix, status='published').order_by('pk').values_list('pk', 'created_at')
+        )
+
+    def create_comments(self, posts, user_ids, per_post, max_depth):
+        """Top-level comments first, then replies one level at a time so every parent already has a pk."""
+        created = 0
+        for batch in chunks(posts, max(1, self.batch_size // max(1, round(per_post)))):
+            level = []
+            for post_id, posted in batch:
+                for _ in range(int(self.random.expovariate(1 / per_post) * 0.6) if per_post else 0):
+                    level.append(self.comment(post_id, user_ids, posted))
+            for depth in range(max_depth + 1):
+                if not level:
+                    break
+                level = self.bulk_create(Comment, level)
+                created += len(level)
+                if depth == max_depth:
+                    break
+                replies = []
+                for parent in level:
+                    for _ in range(int(self.random.expovariate(1.5 + depth))):
+                        replies.append(self.comment(parent.post_id, user_ids, parent.created_at, parent=parent))
+                level = replies
+        return created
+
+    def comment(self, post_id, user_ids, after, parent=None):
+        created = self.moment(after)
+        return Comment(
+            post_id=post_id, parent=parent, author_id=self.random.choice(user_ids), content=self.sentence(self.random.randint(5, 60)),
+            is_active=self.random.random() < 0.97, created_at=created, updated_at=created,
+        )
+
+    def plans(self):
+        plans = list(SubscriptionPlan.objects.filter(is_active=True))
+        if not plans:
+            plans = [
+                SubscriptionPlan.objects.create(
+                    name=name, price=Decimal(price), duration_days=days, stripe_price_id=f'price_{self.prefix}_{slugify(name)}',
+                    features={'pin_posts': True},
+                )
+                for name, price, days in (('Monthly', '9.99', 30), ('Quarterly', '24.99', 90), ('Yearly', '89.99', 365))
+            ]
+        return plans
+
+    def create_subscriptions(self, user_ids, share):
+        plans = self.plans()
+        statuses, weights = zip(*SUBSCRIPTION_STATUSES)
+        subscriptions, history = [], []
+        for user_id in self.random.sample(user_ids, round(len(user_ids) * share)):
+            plan = self.random.choice(plans)
+            status = self.random.choices(statuses, weights)[0]
+            start = self.moment()
+            if status == 'active':
+                start = self.now - timedelta(days=self.random.randint(0, plan.duration_days - 1))
+            end = start + timedelta(days=plan.duration_days)
+            subscriptions.append(Subscription(
+                user_id=user_id, plan=plan, status=status, start_date=start, end_date=end,
+                auto_renew=self.random.random() < 0.7, created_at=start, updated_at=start,
+            ))
+        subscriptions = self.bulk_create(Subscription, subscriptions)
+        for subscription in subscriptions:
+            history.append(SubscriptionHistory(
+                subscription=subscription, action='created', description=f'Subscription created for plan {subscription.plan.name}',
+                created_at=subscription.start_date,
+            ))
+            if subscription.status != 'pending':
+                history.append(SubscriptionHistory(
+                    subscription=subscription, action='activated', description='Subscription activated after successful payment',
+                    created_at=subscription.start_date,
+                ))
+            if subscription.status in ('expired', 'canceled'):
+                history.append(SubscriptionHistory(
+                    subscription=subscription, action=subscription.status, created_at=min(subscription.end_date, self.now),
+                ))
+        self.bulk_create(SubscriptionHistory, history)
+        return subscriptions
+
+    def pin_posts(self, subscriptions):
+        active = [subscription.user_id for subscription in subscriptions if subscription.status == 'active']
+        first_posts = (
+            Post.objects.filter(author_id__in=active, status='published').values('author_id').annotate(post_id=Min('pk'))
+        )
+        pins = [PinnedPost(user_id=row['author_id'], post_id=row['post_id']) for row in first_posts if self.random.random() < 0.4]
+        return len(self.bulk_create(PinnedPost, pins))
+
+    def create_payments(self, subscriptions, per_subscription):
+        payments = []
+        for subscription in subscriptions:
+            number = 1 if subscription.status == 'pending' else max(1, round(self.random.expovariate(1 / per_subscription)))
+            for _ in range(number):
+                status = 'pending' if subscription.status == 'pending' else self.random.choices(
+                    ('succeeded', 'failed', 'canceled'), (90, 7, 3),
+                )[0]
+                created = self.moment(subscription.start_date) if subscription.start_date < self.now else self.now
+                token = secrets.token_hex(8)
+                payments.append(Payment(
+                    user_id=subscription.user_id, subscription=subscription, amount=subscription.plan.price, status=status,
+                    stripe_session_id=f'cs_synth_{token}', stripe_payment_intent_id=f'pi_synth_{token}' if status == 'succeeded' else None,
+                    description=f'Subscription - {subscription.plan.name}', created_at=created, updated_at=created,
+                    processed_at=created if status == 'succeeded' else None,
+                ))
+        payments = self.bulk_create(Payment, payments)
+
+        succeeded = [payment for payment in payments if payment.status == 'succeeded']
+        refunds = [
+            Refund(payment=payment, amount=payment.amount, reason='Requested by customer', status='succeeded',
+                   created_at=payment.created_at, processed_at=payment.created_at)
+            for payment in succeeded if self.random.random() < 0.02
+        ]
+        self.bulk_create(Refund, refunds)
+
+        events = [
+            WebhookEvent(
+                provider='stripe', event_id=f'evt_synth_{secrets.token_hex(10)}', event_type='checkout.session.completed',
+                status='processed', created_at=payment.created_at, processed_at=payment.created_at,
+                data={'type': 'checkout.session.completed', 'data': {'object': {
+                    'id': payment.stripe_session_id, 'metadata': {'payment_id': payment.pk},
+                }}},
+            )
+            for payment in succeeded
+        ]
+        self.bulk_create(WebhookEvent, events)
+        return len(payments), len(refunds), len(events)
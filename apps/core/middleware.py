@@ -0,0 +1,154 @@
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.decorators import sync_and_async_middleware
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from . import profiling
+from .routers import _route
+
+PRIMARY_COOKIE = 'db_primary_until'
+_jwt = JWTAuthentication()
+
+
+def _token_user_id(request):
+    # Only the signature is checked here; the view still authenticates the request properly.
+    header = _jwt.get_header(request)
+    if not header:
+        return None
+    try:
+        raw_token = _jwt.get_raw_token(header)
+        return _jwt.get_validated_token(raw_token).get(jwt_settings.USER_ID_CLAIM) if raw_token else None
+    except AuthenticationFailed:
+        return None
+
+
+def _pin_key(user_id):
+    return f'db-primary-pin:{user_id}'
+
+
+def _reads_go_to_replicas(request):
+    if not settings.DB_REPLICAS or request.method not in SAFE_METHODS:
+        return False
+    if request.path.startswith(tuple(settings.DB_PRIMARY_PATH_PREFIXES)):
+        return False
+
+    # read-your-writes: clients that wrote recently keep reading from the primary
+    try:
+        if float(request.COOKIES.get(PRIMARY_COOKIE, 0)) > time.time():
+            return False
+    except ValueError:
+        pass
+    user_id = _token_user_id(request)
+    return user_id is None or not cache.get(_pin_key(user_id))
+
+
+def _remember_write(request, response):
+    if not settings.DB_REPLICAS or request.method in SAFE_METHODS:
+        return response
+
+    seconds = settings.DB_READ_YOUR_WRITES_SECONDS
+    response.set_cookie(PRIMARY_COOKIE, str(time.time() + seconds), max_age=seconds, httponly=True, samesite='Lax')
+    user = getattr(request, 'user', None)
+    user_id = user.pk if user is not None and user.is_authenticated else _token_user_id(request)
+    if user_id is not None:
+        cache.set(_pin_key(user_id), True, seconds)
+    return response
+
+
+@sync_and_async_middleware
+def replica_routing_middleware(get_response):
+    """
+    Serves safe-method requests from the read replicas, except DB_PRIMARY_PATH_PREFIXES (payments,
+    webhooks, admin, auth) and clients that wrote within DB_READ_YOUR_WRITES_SECONDS.
+    """
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            token = _route.set('replica' if _reads_go_to_replicas(request) else None)
+            try:
+                response = await get_response(request)
+            finally:
+                _route.reset(token)
+            return _remember_write(request, response)
+    else:
+        def middleware(request):
+            token = _route.set('replica' if _reads_go_to_replicas(request) else None)
+            try:
+                response = get_response(request)
+            finally:
+                _route.reset(token)
+            return _remember_write(request, response)
+
+    return middleware
+
+
+def _start_profile(request):
+    rate = settings.PROFILING_SAMPLE_RATE
+    if rate <= 0 or (rate < 1 and random.random() >= rate):
+        return None, None
+    profile = profiling.RequestProfile()
+    return profile, profiling._profile.set(profile)
+
+
+def _finish_profile(request, response, profile, token):
+    profiling._profile.reset(token)
+    match = request.resolver_match
+    view = match.view_name if match is not None else 'unresolved'
+    size = None if response.streaming else len(response.content)
+    duration = profiling.record(view, request.method, response.status_code, profile, size)
+    if settings.PROFILING_SERVER_TIMING:
+        response['Server-Timing'] = profiling.server_timing(profile, duration)
+    return response
+
+
+class ProfilingMiddleware:
+    """
+    Records query count, SQL time, serialization time, render time and response size for a
+    PROFILING_SAMPLE_RATE share of requests into per-view histograms and a structured log line,
+    and optionally returns them in a Server-Timing header. Keep it first in MIDDLEWARE.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        profile, token = _start_profile(request)
+        if profile is None:
+            return self.get_response(request)
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            profiling._profile.reset(token)
+            raise
+        return _finish_profile(request, response, profile, token)
+
+    async def __acall__(self, request):
+        profile, token = _start_profile(request)
+        if profile is None:
+            return await self.get_response(request)
+        try:
+            response = await self.get_response(request)
+        except BaseException:
+            profiling._profile.reset(token)
+            raise
+        return _finish_profile(request, response, profile, token)
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after the view returns; time the rendering separately
+        profile = profiling._profile.get()
+        if profile is not None:
+            profile.start_render()
+            response.add_post_render_callback(lambda rendered: profile.finish_render())
+        return response
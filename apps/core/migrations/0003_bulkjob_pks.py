@@ -0,0 +1,22 @@
+# Generated by Django 5.2.7 on 2026-10-19 01:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_outbox_events'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='bulkjob',
+            name='query',
+        ),
+        migrations.AddField(
+            model_name='bulkjob',
+            name='pks',
+            field=models.JSONField(default=list),
+        ),
+    ]
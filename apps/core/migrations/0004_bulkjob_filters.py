@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-19 01:54
+
+from django.db import migrations, models
+
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_bulkjob_pks'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='bulkjob',
+            name='pks',
+        ),
+        migrations.AddField(
+            model_name='bulkjob',
+            name='filters',
+            field=models.TextField(blank=True),
+        ),
+    ]
@@ -0,0 +1,104 @@
+from django.apps import apps
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+
+class BulkJob(models.Model):
+    """An admin action over a selection of rows, applied chunk by chunk by ``run_bulk_job``."""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    ]
+
+    operation = models.CharField(max_length=255)
+    description = models.CharField(max_length=255)
+    model = models.CharField(max_length=100)
+    # the query string of the changelist the action was taken on, which the selection is rebuilt from
+    filters = models.TextField(blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+
+    total = models.PositiveBigIntegerField(default=0)
+    processed = models.PositiveBigIntegerField(default=0)
+    changed = models.PositiveBigIntegerField(default=0)
+    last_pk = models.BigIntegerField(default=0)
+    error = models.TextField(blank=True)
+
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='bulk_jobs')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'bulk_jobs'
+        verbose_name = 'Bulk Job'
+        verbose_name_plural = 'Bulk Jobs'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f'{self.description} #{self.pk} ({self.status})'
+
+    def get_model(self):
+        return apps.get_model(self.model)
+
+    @property
+    def progress(self):
+        if self.status == 'succeeded':
+            return 100
+        if not self.total:
+            return 0
+        # totals of large selections are estimates, so stay below 100 until the job is done
+        return min(99, self.processed * 100 // self.total)
+
+
+class TracksStatusMixin:
+    """
+    Remembers the ``status_field`` as loaded from the database, so save signals can tell a
+    transition without querying the row again. None for new instances and when it was deferred.
+    """
+    status_field = 'status'
+    loaded_status = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.loaded_status = instance.__dict__.get(cls.status_field)
+        return instance
+
+
+class OutboxEvent(models.Model):
+    """
+    A domain event written in the same transaction as the change it describes, so it exists
+    exactly when the change committed. ``relay_outbox`` runs the handlers registered for its topic.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processed', 'Processed'),
+        ('failed', 'Failed'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    topic = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # a failed attempt pushes this back, see OUTBOX_MAX_ATTEMPTS
+    available_at = models.DateTimeField(default=timezone.now)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'outbox_events'
+        verbose_name = 'Outbox Event'
+        verbose_name_plural = 'Outbox Events'
+        ordering = ['-id']
+        indexes = [
+            models.Index(fields=['available_at'], condition=models.Q(status='pending'), name='outbox_pending_idx'),
+            models.Index(fields=['processed_at']),
+        ]
+
+    def __str__(self):
+        return f'{self.topic} #{self.pk} ({self.status})'
@@ -0,0 +1,65 @@
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+_handlers = defaultdict(list)
+
+
+def outbox_handler(topic):
+    """
+    Register ``func(**payload)`` to run for every event published on ``topic``. Handlers run on
+    the Celery worker after the publishing transaction committed. Their database writes commit
+    together with the event being marked processed, or not at all; anything else they do (e.g.
+    sending mail) happens again when the event is retried.
+    """
+    def register(func):
+        _handlers[topic].append(func)
+        return func
+    return register
+
+
+def publish(topic, **payload):
+    """Append an event to the outbox; it is rolled back along with the transaction it was published in."""
+    return OutboxEvent.objects.create(topic=topic, payload=payload)
+
+
+def relay(limit=None):
+    """
+    Run the handlers of up to ``limit`` due events, oldest first, in one transaction. Rows are
+    claimed with SKIP LOCKED, so relays running side by side take different events. Each event is
+    handled in a savepoint; a failing one is retried with exponential backoff and given up after
+    OUTBOX_MAX_ATTEMPTS. Returns the number of events taken.
+    """
+    limit = limit or settings.OUTBOX_RELAY_BATCH_SIZE
+    now = timezone.now()
+    with transaction.atomic():
+        events = list(
+            OutboxEvent.objects.select_for_update(skip_locked=True)
+            .filter(status='pending', available_at__lte=now).order_by('pk')[:limit]
+        )
+        for event in events:
+            try:
+                with transaction.atomic():
+                    for handler in _handlers.get(event.topic, ()):
+                        handler(**event.payload)
+            except Exception as e:
+                logger.exception(f'Outbox event {event.pk} ({event.topic}) failed')
+                event.attempts += 1
+                event.last_error = str(e)
+                if event.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+                    event.status = 'failed'
+                else:
+                    event.available_at = now + timedelta(seconds=2 ** event.attempts)
+            else:
+                event.status, event.processed_at = 'processed', now
+        OutboxEvent.objects.bulk_update(events, ['status', 'attempts', 'last_error', 'available_at', 'processed_at'])
+    return len(events)
+
@@ -0,0 +1,166 @@
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+# RequestProfile of the sampled request being served; pool threads get it through copied contexts.
+_profile = ContextVar('request_profile', default=None)
+
+
+class RequestProfile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.render_started = None
+        self.render_time = 0.0
+        self.serializing = False
+        self.serialize_time = 0.0
+        self._lock = threading.Lock()
+
+    def add_query(self, duration):
+        with self._lock:
+            self.queries += 1
+            self.db_time += duration
+
+    def start_render(self):
+        self.render_started = time.perf_counter()
+
+    def finish_render(self):
+        if self.render_started is not None:
+            self.render_time = time.perf_counter() - self.render_started
+
+    @property
+    def total_time(self):
+        return time.perf_counter() - self.started
+
+
+@contextmanager
+def serializing():
+    """Count the time spent inside as serialization of the sampled request; nested blocks count once."""
+    profile = _profile.get()
+    if profile is None or profile.serializing:
+        yield
+        return
+    profile.serializing = True
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.serialize_time += time.perf_counter() - started
+        profile.serializing = False
+
+
+def _record_query(execute, sql, params, many, context):
+    profile = _profile.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.add_query(time.perf_counter() - started)
+
+
+@receiver(connection_created)
+def install_query_recorder(sender, connection, **kwargs):
+    # connection_created fires again whenever a wrapper reconnects, so only install once
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self.series = {}
+
+    def observe(self, labels, value):
+        counts, total = self.series.get(labels, ([0] * (len(self.buckets) + 1), 0.0))
+        counts[bisect_left(self.buckets, value)] += 1
+        self.series[labels] = (counts, total + value)
+
+    def exposition(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        for labels, (counts, total) in sorted(self.series.items()):
+            label_text = ','.join(f'{key}="{_escape(value)}"' for key, value in labels)
+            cumulative = 0
+            for bound, count in zip((*self.buckets, '+Inf'), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{label_text}}} {total}')
+            lines.append(f'{self.name}_count{{{label_text}}} {cumulative}')
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+SECONDS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_histograms = {
+    'duration': Histogram('lessoner_request_duration_seconds', 'Time spent serving the request.', SECONDS),
+    'queries': Histogram('lessoner_request_db_queries', 'SQL queries run by the request.', (0, 1, 2, 5, 10, 20, 50, 100, 200)),
+    'db': Histogram('lessoner_request_db_seconds', 'Time spent in SQL queries.', SECONDS),
+    'serialize': Histogram('lessoner_request_serialize_seconds', 'Time spent in serializer.data, queries included.', SECONDS),
+    'render': Histogram('lessoner_request_render_seconds', 'Time spent rendering the response body.', SECONDS),
+    'size': Histogram('lessoner_response_size_bytes', 'Size of the response body.', (256, 1024, 4096, 16384, 65536, 262144, 1048576)),
+}
+_histograms_lock = threading.Lock()
+
+
+def record(view, method, status, profile, size):
+    duration = profile.total_time
+    labels = (('view', view), ('method', method))
+    with _histograms_lock:
+        _histograms['duration'].observe(labels, duration)
+        _histograms['queries'].observe(labels, profile.queries)
+        _histograms['db'].observe(labels, profile.db_time)
+        _histograms['serialize'].observe(labels, profile.serialize_time)
+        _histograms['render'].observe(labels, profile.render_time)
+        if size is not None:
+            _histograms['size'].observe(labels, size)
+
+    logger.info(
+        'request view=%s method=%s status=%s duration_ms=%.1f queries=%d db_ms=%.1f serialize_ms=%.1f render_ms=%.1f bytes=%s',
+        view, method, status, duration * 1000, profile.queries, profile.db_time * 1000, profile.serialize_time * 1000,
+        profile.render_time * 1000, size,
+        extra={'profile': {
+            'view': view, 'method': method, 'status': status, 'duration_ms': round(duration * 1000, 1),
+            'queries': profile.queries, 'db_ms': round(profile.db_time * 1000, 1),
+            'serialize_ms': round(profile.serialize_time * 1000, 1), 'render_ms': round(profile.render_time * 1000, 1),
+            'bytes': size,
+        }},
+    )
+    return duration
+
+
+def server_timing(profile, duration):
+    return ', '.join([
+        f'db;dur={profile.db_time * 1000:.1f};desc="{profile.queries} queries"',
+        f'serialize;dur={profile.serialize_time * 1000:.1f}',
+        f'render;dur={profile.render_time * 1000:.1f}',
+        f'app;dur={duration * 1000:.1f}',
+    ])
+
+
+def exposition():
+    """Histograms of this process in the Prometheus text format."""
+    with _histograms_lock:
+        lines = [line for histogram in _histograms.values() for line in histogram.exposition()]
+    return '\n'.join(lines) + '\n'
+
+
+def reset():
+    with _histograms_lock:
+        for histogram in _histograms.values():
+            histogram.series.clear()
@@ -0,0 +1,48 @@
+from django.conf import settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+ORJSON_OPTIONS = (orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME) if orjson else 0
+
+
+def orjson_enabled():
+    return orjson is not None and settings.API_JSON_BACKEND == 'orjson'
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer backed by orjson, producing the same bytes as the stock renderer except for floats:
+
+    - exponents are written without padding or a plus sign, e.g. ``1e-7`` and ``1e16`` rather than
+      ``1e-07`` and ``1e+16``; they parse to the same numbers.
+    - NaN and Infinity are written as ``null``, where the stock renderer raises ValueError.
+
+    Anything orjson does not handle natively (Decimal, lazy strings, datetimes, querysets) goes
+    through DRF's JSONEncoder, so e.g. datetimes keep the trailing ``Z`` and a Decimal is written as
+    the float it converts to, as it is there; serializer DecimalFields already render strings. Falls
+    back to the stdlib path when orjson is missing, disabled via API_JSON_BACKEND, or when
+    indentation is requested.
+    """
+    _encoder = JSONEncoder()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        if not orjson_enabled() or self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=self._encoder.default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            # e.g. integers beyond 64 bits; the stdlib encoder copes with those
+            return super().render(data, accepted_media_type, renderer_context)
+
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
@@ -0,0 +1,67 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# 'replica' while serving a read-only request or task; flipped to 'primary' by the first write.
+_route = ContextVar('db_route', default=None)
+
+
+def replicas_enabled():
+    return _route.get() == 'replica'
+
+
+def pin_to_primary():
+    if _route.get() == 'replica':
+        _route.set('primary')
+
+
+@contextmanager
+def use_replicas():
+    token = _route.set('replica')
+    try:
+        yield
+    finally:
+        _route.reset(token)
+
+
+def replica_reads(func):
+    """Run a read-only function (e.g. a Celery task body) against the replicas."""
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with use_replicas():
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+class ReplicaRouter:
+    """
+    Sends reads to a random DB_REPLICAS alias inside ``use_replicas()`` and everything else to
+    the primary. A write, or an open transaction on the primary, keeps the rest of the unit of
+    work on the primary so it reads its own changes.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not settings.DB_REPLICAS or not replicas_enabled():
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(settings.DB_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        pin_to_primary()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DB_REPLICAS:
+            return False
+        return None
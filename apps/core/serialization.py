@@ -0,0 +1,108 @@
+from functools import cache
+
+from django.conf import settings
+from django.db.models import Count, IntegerField, OuterRef, QuerySet, Subquery
+from django.db.models.functions import Coalesce
+from rest_framework import serializers
+from rest_framework.response import Response
+from rest_framework.utils.serializer_helpers import ReturnDict, ReturnList
+
+from . import profiling
+
+
+def subquery_count(queryset, outer_field, outer_ref='pk'):
+    counts = queryset.filter(**{outer_field: OuterRef(outer_ref)}).order_by().values(outer_field).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+class ProfiledSerializerMixin:
+    """Counts ``to_representation()`` as the serialization time of a profiled request."""
+
+    def to_representation(self, instance):
+        with profiling.serializing():
+            return super().to_representation(instance)
+
+
+class Serializer(ProfiledSerializerMixin, serializers.Serializer):
+    pass
+
+
+class ModelSerializer(ProfiledSerializerMixin, serializers.ModelSerializer):
+    pass
+
+
+@cache
+def field_representation(serializer_class, field_name):
+    """to_representation of a model serializer's field, so both paths format values identically."""
+    return serializer_class().fields[field_name].to_representation
+
+
+class ValuesSerializer:
+    """
+    Read-only serializer over ``values()`` rows, matching ``model_serializer_class`` output exactly.
+
+    Subclasses list the columns in ``values`` (plus ``get_annotations()``) and build each item as a
+    plain dict in ``to_representation(row)``. Model querysets passed in are prepared here; pass
+    ``prepare()``d rows (e.g. a paginated page) as they are.
+    """
+    model_serializer_class = None
+    values = ()
+
+    def __init__(self, instance=None, many=False, context=None):
+        self.instance = instance
+        self.many = many
+        self.context = context or {}
+        self.request = self.context.get('request')
+
+    @classmethod
+    def select(cls):
+        return cls if settings.API_VALUES_SERIALIZERS else cls.model_serializer_class
+
+    @classmethod
+    def get_annotations(cls):
+        return {}
+
+    @classmethod
+    def prepare(cls, queryset):
+        annotations = cls.get_annotations()
+        return queryset.prefetch_related(None).annotate(**annotations).values(*cls.values, *annotations)
+
+    def file_url(self, name, storage):
+        if not name:
+            return None
+        url = storage.url(name)
+        return self.request.build_absolute_uri(url) if self.request is not None else url
+
+    def to_representation(self, row):
+        raise NotImplementedError
+
+    def to_representation_list(self, rows):
+        return [self.to_representation(row) for row in rows]
+
+    @property
+    def data(self):
+        rows = self.instance
+        if isinstance(rows, QuerySet):
+            rows = self.prepare(rows)
+        with profiling.serializing():
+            if self.many:
+                return ReturnList(self.to_representation_list(rows), serializer=self)
+            return ReturnDict(self.to_representation_list([rows])[0], serializer=self)
+
+
+class ValuesListMixin:
+    """Serves list GETs through ``values_serializer_class`` when API_VALUES_SERIALIZERS is enabled."""
+    values_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        serializer_class = self.values_serializer_class
+        if serializer_class is None or not settings.API_VALUES_SERIALIZERS:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        context = self.get_serializer_context()
+
+        page = self.paginate_queryset(serializer_class.prepare(queryset))
+        if page is not None:
+            return self.get_paginated_response(serializer_class(page, many=True, context=context).data)
+        return Response(serializer_class(queryset, many=True, context=context).data)
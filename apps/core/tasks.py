@@ -0,0 +1,70 @@
+import logging
+from datetime import timedelta
+
+from celery import shared_task
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import outbox
+from .bulk import get_operation, selection_queryset
+from .models import BulkJob, OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def run_bulk_job(job_id):
+    """
+    Walk the job's selection in primary key order, one chunk per transaction. Progress is saved
+    after every chunk, so a retried job resumes after the last chunk that committed.
+    """
+    job = BulkJob.objects.filter(pk=job_id).exclude(status='succeeded').select_related('created_by').first()
+    if job is None:
+        return {'processed': 0}
+
+    operation = get_operation(job.operation)
+    BulkJob.objects.filter(pk=job.pk).update(status='running', started_at=job.started_at or timezone.now())
+
+    last_pk = job.last_pk
+    try:
+        queryset = selection_queryset(job)
+        while True:
+            ids = list(
+                queryset.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:settings.BULK_ACTION_CHUNK_SIZE]
+            )
+            if not ids:
+                break
+            with transaction.atomic():
+                changed = operation(queryset.model._default_manager.filter(pk__in=ids))
+                last_pk = ids[-1]
+                BulkJob.objects.filter(pk=job.pk).update(
+                    processed=F('processed') + len(ids), changed=F('changed') + changed, last_pk=last_pk,
+                )
+    except Exception as e:
+        logger.exception(f'Bulk job {job.pk} failed')
+        BulkJob.objects.filter(pk=job.pk).update(status='failed', error=str(e), finished_at=timezone.now())
+        raise
+
+    BulkJob.objects.filter(pk=job.pk).update(status='succeeded', finished_at=timezone.now())
+    job.refresh_from_db()
+    return {'processed': job.processed, 'changed': job.changed}
+
+
+@shared_task
+def relay_outbox():
+    """Relay outbox events a batch at a time until none is due."""
+    relayed = 0
+    while True:
+        taken = outbox.relay()
+        relayed += taken
+        if taken < settings.OUTBOX_RELAY_BATCH_SIZE:
+            return {'relayed': relayed}
+
+
+@shared_task
+def prune_outbox():
+    cutoff = timezone.now() - timedelta(days=settings.OUTBOX_RETENTION_DAYS)
+    deleted, _ = OutboxEvent.objects.filter(status='processed', processed_at__lt=cutoff).delete()
+    return {'deleted_events': deleted}
@@ -0,0 +1,220 @@
+import hashlib
+import hmac
+import time
+from datetime import timedelta
+from decimal import Decimal
+from itertools import count
+from types import SimpleNamespace
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient, APITestCase
+
+_sequence = count(1)
+
+PASSWORD = 'budget-pass-123'
+
+
+def make_user(**fields):
+    n = next(_sequence)
+    fields.setdefault('username', f'user{n}')
+    fields.setdefault('email', f'user{n}@example.com')
+    return get_user_model().objects.create_user(password=PASSWORD, **fields)
+
+
+def make_plan(**fields):
+    from apps.subscribe.models import SubscriptionPlan
+
+    n = next(_sequence)
+    fields.setdefault('name', f'Plan {n}')
+    fields.setdefault('price', Decimal('9.99'))
+    fields.setdefault('stripe_price_id', f'price_{n}')
+    fields.setdefault('features', {'pin_posts': True})
+    return SubscriptionPlan.objects.create(**fields)
+
+
+def make_subscriber(plan, history=3, **fields):
+    from apps.subscribe.models import Subscription, SubscriptionHistory
+
+    user = make_user(**fields)
+    now = timezone.now()
+    subscription = Subscription.objects.create(
+        user=user, plan=plan, status='active', start_date=now - timedelta(days=5), end_date=now + timedelta(days=25),
+    )
+    SubscriptionHistory.objects.bulk_create(
+        SubscriptionHistory(subscription=subscription, action='created', description=f'Event {i}') for i in range(history)
+    )
+    return user
+
+
+def make_category(**fields):
+    from apps.main.models import Category
+
+    n = next(_sequence)
+    fields.setdefault('name', f'Category {n}')
+    return Category.objects.create(**fields)
+
+
+def make_posts(author, number, category=None, **fields):
+    from apps.main.models import Post
+
+    fields.setdefault('status', 'published')
+    posts = []
+    for _ in range(number):
+        n = next(_sequence)
+        posts.append(Post.objects.create(
+            author=author, category=category, title=f'Post {n}', content=f'Body of post {n}. ' * 40, **fields,
+        ))
+    return posts
+
+
+def make_comments(post, authors, number, replies=0):
+    """``number`` top-level comments on ``post``, each with ``replies`` replies, round-robin over ``authors``."""
+    from apps.comments.models import Comment
+
+    comments = []
+    for i in range(number):
+        comment = Comment.objects.create(post=post, author=authors[i % len(authors)], content=f'Comment {next(_sequence)}')
+        for j in range(replies):
+            Comment.objects.create(post=post, author=authors[j % len(authors)], parent=comment, content=f'Reply {next(_sequence)}')
+        comments.append(comment)
+    return comments
+
+
+def make_payments(user, number, subscription=None):
+    from apps.payment.models import Payment
+
+    return Payment.objects.bulk_create(
+        Payment(
+            user=user, subscription=subscription, amount=Decimal('9.99'), status='succeeded',
+            stripe_session_id=f'cs_test_{next(_sequence)}', description='Subscription payment',
+        )
+        for _ in range(number)
+    )
+
+
+def stripe_signature(payload, secret, timestamp=None):
+    """A ``Stripe-Signature`` header for ``payload``, as Stripe signs webhook deliveries."""
+    timestamp = int(time.time()) if timestamp is None else timestamp
+    digest = hmac.new(secret.encode(), f'{timestamp}.{payload}'.encode(), hashlib.sha256).hexdigest()
+    return f't={timestamp},v1={digest}'
+
+
+def admin_action(testcase, user, model, action, selected=(), select_across=False):
+    """POST a changelist action as ``user``; bulk jobs it queues run in-process when the test transaction would commit."""
+    from apps.core.tasks import run_bulk_job
+
+    client = Client()
+    client.force_login(user)
+    url = reverse(f'admin:{model._meta.app_label}_{model._meta.model_name}_changelist')
+    # the changelist wants a checked row even when the action applies to everything matching
+    data = {'action': action, 'index': 0, '_selected_action': [str(pk) for pk in selected] or ['0'], 'select_across': int(select_across)}
+    with mock.patch.object(run_bulk_job, 'delay', side_effect=run_bulk_job), testcase.captureOnCommitCallbacks(execute=True):
+        return client.post(url, data)
+
+
+def seed(size):
+    """
+    A small site: an author with an active subscription and a pinned post, a reader, ``size``
+    published posts per author across two categories, threaded comments and payments.
+    """
+    from apps.subscribe.models import PinnedPost
+
+    plan = make_plan()
+    author = make_subscriber(plan)
+    reader = make_subscriber(plan)
+    categories = [make_category(), make_category()]
+    posts = []
+    for user in (author, reader):
+        for i, category in enumerate(categories):
+            posts += make_posts(user, (size + i) // 2, category=category)
+    make_posts(author, 1, status='draft')
+    own_posts = [post for post in posts if post.author_id == author.pk]
+    PinnedPost.objects.create(user=author, post=own_posts[0])
+    comments = make_comments(own_posts[0], [author, reader], size, replies=2)
+    make_payments(author, size, subscription=author.subscription)
+    return SimpleNamespace(
+        plan=plan, author=author, reader=reader, categories=categories, posts=posts, own_posts=own_posts,
+        post=own_posts[0], comments=comments, comment=comments[0],
+    )
+
+
+@override_settings(
+    CONCURRENT_QUERIES=False,
+    PROFILING_SAMPLE_RATE=0,
+    DB_REPLICAS=[],
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+    ANALYTICS_EVENT_FLUSH_SECONDS=float('inf'),
+    ANALYTICS_EVENT_BUFFER_SIZE=10 ** 9,
+)
+class QueryBudgetTestCase(APITestCase):
+    """
+    Checks endpoints against ``budgets`` ({url name: {method: max queries}}) and ``max_seconds``.
+
+    Fixtures are never committed inside a TestCase, so concurrent queries (which run on their own
+    connections) are switched off and every query runs on the test connection where it is counted.
+    Analytics events stay buffered instead of being written after whichever response comes due.
+    A fast password hasher keeps the auth endpoints' timings about the queries, not key stretching.
+    """
+    budgets = {}
+    max_seconds = 1.0
+    size = 5
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed(cls.size)
+
+    def setUp(self):
+        from apps.analytics import events
+
+        # events recorded by earlier tests point at rows that were rolled back
+        events.buffer.drain()
+
+    def client_for(self, user=None):
+        client = APIClient()
+        if user is not None:
+            # a fresh instance, as the authentication backend would load it, without cached relations
+            client.force_authenticate(get_user_model().objects.get(pk=user.pk))
+        return client
+
+    def measure(self, method, url_name, args=(), user=None, data=None, headers=None):
+        client = self.client_for(user)
+        url = reverse(url_name, args=args)
+        # a str body is sent as is, e.g. a signed webhook payload
+        encoding = {'content_type': 'application/json'} if isinstance(data, str) else {'format': 'json'}
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = getattr(client, method)(url, data, headers=headers, **encoding)
+            elapsed = time.perf_counter() - started
+        return response, queries, elapsed
+
+    def assertWithinBudget(self, method, url_name, args=(), user=None, data=None, status=200, headers=None):
+        return self._check_budget(method, url_name, args, user, data, status, headers)[0]
+
+    def assertQueriesConstant(self, method, url_name, grow, args=(), user=None, status=200):
+        """Fail when growing the data with ``grow()`` changes the number of queries, i.e. an N+1."""
+        before = self._check_budget(method, url_name, args, user, None, status)[1]
+        grow()
+        response, after = self._check_budget(method, url_name, args, user, None, status)
+        self.assertEqual(
+            len(after), len(before),
+            self._describe(f'{method.upper()} {url_name} went from {len(before)} queries to', after),
+        )
+        return response
+
+    def _check_budget(self, method, url_name, args, user, data, status, headers=None):
+        response, queries, elapsed = self.measure(method, url_name, args, user, data, headers)
+        budget = self.budgets[url_name][method]
+        self.assertEqual(response.status_code, status, getattr(response, 'data', response.content))
+        self.assertLessEqual(len(queries), budget, self._describe(f'{method.upper()} {url_name} is over its budget of {budget}:', queries))
+        self.assertLessEqual(elapsed, self.max_seconds, f'{method.upper()} {url_name} took {elapsed:.3f}s')
+        return response, queries
+
+    def _describe(self, title, queries):
+        lines = '\n'.join(f'{i}. {query["sql"]}' for i, query in enumerate(queries.captured_queries, start=1))
+        return f'{title} {len(queries)} queries\n{lines}'
@@ -0,0 +1,419 @@
+import csv
+import gzip
+import importlib.util
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from datetime import date, datetime, time as dt_time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from importlib import import_module
+from unittest import mock, skipUnless
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.handlers.base import BaseHandler
+from django.core.management import CommandError, call_command
+from django.db import DEFAULT_DB_ALIAS, connection, connections, router, transaction
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+
+from apps.main.models import Post
+from apps.payment.models import Payment
+
+from . import outbox, profiling
+from .admin import EstimatedCountPaginator
+from .async_views import public_async_view
+from .concurrency import gather_reads, run_concurrently
+from .middleware import PRIMARY_COOKIE, replica_routing_middleware
+from .models import OutboxEvent
+from .renderers import ORJSONRenderer, orjson
+from .routers import replica_reads
+from .testing import (
+    QueryBudgetTestCase, make_category, make_comments, make_payments, make_posts, make_subscriber, make_user,
+)
+
+# Apps whose tests.py define QUERY_BUDGETS for their endpoints.
+BUDGETED_APPS = ['apps.core', 'apps.accounts', 'apps.main', 'apps.comments', 'apps.subscribe', 'apps.payment', 'apps.analytics']
+
+QUERY_BUDGETS = {
+    'metrics': {'get': 4},
+}
+
+ADMIN_QUERY_BUDGETS = {
+    'admin:main_post_changelist': {'get': 8},
+    'admin:main_category_changelist': {'get': 7},
+    'admin:comments_comment_changelist': {'get': 7},
+    'admin:subscribe_subscriptionplan_changelist': {'get': 7},
+    'admin:subscribe_pinnedpost_changelist': {'get': 7},
+    'admin:subscribe_subscriptionhistory_changelist': {'get': 7},
+    'admin:payment_payment_changelist': {'get': 7},
+    'admin:payment_refund_changelist': {'get': 7},
+}
+
+
+def url_names(patterns, namespace=None):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            if pattern.namespace == 'admin':
+                continue
+            yield from url_names(pattern.url_patterns, pattern.namespace or namespace)
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            yield f'{namespace}:{pattern.name}' if namespace else pattern.name
+
+
+class QueryBudgetCoverageTests(SimpleTestCase):
+    def test_every_url_has_a_budget(self):
+        budgeted = set()
+        for app in BUDGETED_APPS:
+            budgeted.update(import_module(f'{app}.tests').QUERY_BUDGETS)
+        missing = set(url_names(get_resolver(settings.ROOT_URLCONF).url_patterns)) - budgeted
+        self.assertFalse(missing, f'URLs without a query budget: {sorted(missing)}')
+
+
+class SessionQueryBudgetTestCase(QueryBudgetTestCase):
+    def client_for(self, user=None):
+        # plain Django views, authenticated through the session
+        client = super().client_for()
+        client.force_login(user)
+        return client
+
+
+class MetricsQueryBudgetTests(SessionQueryBudgetTestCase):
+    budgets = QUERY_BUDGETS
+
+    def test_metrics(self):
+        self.assertWithinBudget('get', 'metrics', user=make_user(is_staff=True))
+
+
+@override_settings(PROFILING_SAMPLE_RATE=1, PROFILING_SERVER_TIMING=True)
+class ProfilingTests(TestCase):
+    def setUp(self):
+        self.addCleanup(profiling.reset)
+
+    def test_serialization_is_timed_apart(self):
+        make_posts(make_user(), 3)
+        with self.assertLogs('apps.core.profiling', 'INFO') as logs:
+            response = self.client.get(reverse('main:post-list'))
+
+        timings = dict(
+            (part.split(';')[0], float(part.split('dur=')[1].split(';')[0])) for part in response['Server-Timing'].split(', ')
+        )
+        self.assertEqual(set(timings), {'db', 'serialize', 'render', 'app'})
+        self.assertGreater(timings['serialize'], 0)
+        self.assertIn(' serialize_ms=', logs.output[0])
+        self.assertIn('lessoner_request_serialize_seconds_count{view="main:post-list",method="GET"} 1', profiling.exposition())
+
+
+class AdminChangelistQueryTests(SessionQueryBudgetTestCase):
+    budgets = ADMIN_QUERY_BUDGETS
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.admin = make_user(is_staff=True, is_superuser=True)
+
+    def grow(self):
+        for _ in range(5):
+            user = make_subscriber(self.data.plan)
+            post = make_posts(user, 2, category=make_category())[0]
+            make_comments(post, [user, self.data.reader], 3, replies=1)
+
+    def test_changelists(self):
+        for url_name in ADMIN_QUERY_BUDGETS:
+            with self.subTest(url_name):
+                self.assertQueriesConstant('get', url_name, self.grow, user=self.admin)
+
+    @override_settings(ADMIN_EXACT_COUNT_LIMIT=3)
+    def test_count_stops_at_the_limit(self):
+        self.assertEqual(EstimatedCountPaginator(Post.objects.all(), 10).count, 4)
+        self.assertEqual(EstimatedCountPaginator(Post.objects.filter(status='draft'), 10).count, 1)
+
+
+@override_settings(EXPORT_CHUNK_SIZE=2, DB_REPLICAS=[])
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = make_user(is_staff=True, is_superuser=True)
+        user = make_user()
+        cls.payments = make_payments(user, 5)
+        Payment.objects.filter(pk=cls.payments[0].pk).update(created_at=timezone.now() - timedelta(days=40))
+        Payment.objects.filter(pk=cls.payments[1].pk).update(status='failed')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def export(self, **params):
+        return self.client.get(reverse('admin:payment_payment_export'), params)
+
+    def content(self, response):
+        with CaptureQueriesContext(connection) as queries:
+            content = b''.join(response.streaming_content)
+        # one cursor, however many chunks it is read in
+        self.assertEqual(len(queries), 1)
+        return content
+
+    def test_csv_filtered_by_date_and_status(self):
+        since = (timezone.localdate() - timedelta(days=7)).isoformat()
+        response = self.export(date_from=since, status='succeeded')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('attachment; filename="payments-', response['Content-Disposition'])
+        rows = list(csv.DictReader(io.StringIO(self.content(response).decode())))
+        self.assertEqual([int(row['id']) for row in rows], [payment.pk for payment in self.payments[2:]])
+        self.assertEqual(rows[0]['user__email'], self.payments[0].user.email)
+
+    def test_csv_cells_are_not_read_as_formulas(self):
+        Payment.objects.filter(pk=self.payments[2].pk).update(description='=HYPERLINK("http://example.com")')
+        Payment.objects.filter(pk=self.payments[3].pk).update(description='-1+2')
+        rows = {int(row['id']): row for row in csv.DictReader(io.StringIO(self.content(self.export()).decode()))}
+        self.assertEqual(rows[self.payments[2].pk]['description'], '\'=HYPERLINK("http://example.com")')
+        self.assertEqual(rows[self.payments[3].pk]['description'], "'-1+2")
+        self.assertEqual(rows[self.payments[3].pk]['amount'], str(self.payments[3].amount))
+
+        response = self.export(format='jsonl')
+        self.assertIn('"description": "-1+2"', self.content(response).decode())
+
+    def test_gzipped_jsonl(self):
+        response = self.export(format='jsonl', gzip=1)
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        lines = gzip.decompress(self.content(response)).decode().splitlines()
+        self.assertEqual([json.loads(line)['id'] for line in lines], [payment.pk for payment in self.payments])
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.export(format='xlsx').status_code, 400)
+        self.assertEqual(self.export(date_to='last week').status_code, 400)
+        self.assertEqual(self.export(status='paid').status_code, 400)
+
+    def test_export_selected_action(self):
+        selected = [self.payments[3].pk, self.payments[1].pk]
+        response = self.client.post(
+            reverse('admin:payment_payment_changelist'),
+            {'action': 'export_csv', 'index': 0, '_selected_action': selected},
+        )
+        rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual([int(row['id']) for row in rows], sorted(selected))
+
+
+@override_settings(OUTBOX_MAX_ATTEMPTS=2)
+class OutboxTests(TestCase):
+    def setUp(self):
+        self.handled = []
+        self.failing = False
+
+        def handler(value):
+            if self.failing:
+                raise RuntimeError('downstream is down')
+            self.handled.append(value)
+
+        outbox._handlers['test.event'] = [handler]
+        self.addCleanup(outbox._handlers.pop, 'test.event')
+
+    def test_events_are_rolled_back_with_their_transaction(self):
+        try:
+            with transaction.atomic():
+                outbox.publish('test.event', value=1)
+                raise ValueError
+        except ValueError:
+            pass
+        outbox.publish('test.event', value=2)
+
+        self.assertEqual(outbox.relay(), 1)
+        self.assertEqual(self.handled, [2])
+        self.assertEqual(OutboxEvent.objects.get().status, 'processed')
+        self.assertEqual(outbox.relay(), 0)
+
+    def test_failing_events_are_retried_then_given_up(self):
+        event = outbox.publish('test.event', value=1)
+        self.failing = True
+        with self.assertLogs('apps.core.outbox', 'ERROR'):
+            outbox.relay()
+        event.refresh_from_db()
+        self.assertEqual((event.status, event.attempts, event.last_error), ('pending', 1, 'downstream is down'))
+        self.assertGreater(event.available_at, timezone.now())
+        # not due again until the backoff passed
+        self.assertEqual(outbox.relay(), 0)
+
+        OutboxEvent.objects.update(available_at=timezone.now())
+        with self.assertLogs('apps.core.outbox', 'ERROR'):
+            outbox.relay()
+        event.refresh_from_db()
+        self.assertEqual((event.status, event.attempts), ('failed', 2))
+        self.assertEqual(self.handled, [])
+
+
+@override_settings(CONCURRENT_QUERIES=True)
+class ConcurrentQueryTests(TransactionTestCase):
+    def test_pool_connections_are_closed_afterwards(self):
+        make_posts(make_user(), 2)
+        used = []
+
+        def count():
+            used.append(connections[DEFAULT_DB_ALIAS])
+            return Post.objects.count()
+
+        # without persistent connections no pool thread keeps one open (closing an in-memory
+        # SQLite database does nothing, so the calls are checked rather than the connections)
+        wrapper_class = type(connections[DEFAULT_DB_ALIAS])
+        with (
+            mock.patch.dict(connections[DEFAULT_DB_ALIAS].settings_dict, CONN_MAX_AGE=0),
+            mock.patch.object(wrapper_class, 'close', autospec=True, side_effect=wrapper_class.close) as close,
+        ):
+            self.assertEqual(run_concurrently(count, count, count), [2, 2, 2])
+
+        self.assertNotIn(connections[DEFAULT_DB_ALIAS], used)
+        closed = [call.args[0] for call in close.call_args_list]
+        self.assertTrue(all(wrapper in closed for wrapper in used))
+
+    def test_async_reads_share_the_switch_and_pool(self):
+        make_posts(make_user(), 2)
+
+        def count():
+            return threading.current_thread().name, Post.objects.count()
+
+        with override_settings(CONCURRENT_QUERIES=False):
+            (first, posts), (second, _) = async_to_sync(gather_reads)(count, count)
+        self.assertEqual((first, posts), (second, 2))
+        self.assertFalse(first.startswith('concurrent-queries'))
+
+        with override_settings(CONCURRENT_QUERIES=True):
+            results = async_to_sync(gather_reads)(count, count)
+        self.assertTrue(all(name.startswith('concurrent-queries') and posts == 2 for name, posts in results))
+
+
+# The replica aliases are only named, never connected to: the tests look at where querysets would go.
+@override_settings(DB_REPLICAS=['replica_1'])
+class ReplicaRoutingTests(SimpleTestCase):
+    def serve(self, request, write=False):
+        routes = []
+
+        def view(request):
+            routes.append(Post.objects.all().db)
+            if write:
+                routes.append(router.db_for_write(Post))
+                routes.append(Post.objects.all().db)
+            return HttpResponse()
+
+        return routes, replica_routing_middleware(view)(request)
+
+    def test_reads_go_to_a_replica(self):
+        self.assertEqual(self.serve(RequestFactory().get('/api/v1/posts/'))[0], ['replica_1'])
+
+    def test_writes_go_to_the_primary(self):
+        routes, response = self.serve(RequestFactory().post('/api/v1/posts/'))
+        self.assertEqual(routes, ['default'])
+        self.assertIn(PRIMARY_COOKIE, response.cookies)
+
+    def test_reads_after_a_write_stay_on_the_primary(self):
+        routes, _ = self.serve(RequestFactory().get('/api/v1/posts/'), write=True)
+        self.assertEqual(routes, ['replica_1', 'default', 'default'])
+
+    def test_clients_that_just_wrote_read_from_the_primary(self):
+        request = RequestFactory().get('/api/v1/posts/')
+        request.COOKIES[PRIMARY_COOKIE] = str(time.time() + 60)
+        self.assertEqual(self.serve(request)[0], ['default'])
+
+    def test_primary_paths_read_from_the_primary(self):
+        self.assertEqual(self.serve(RequestFactory().get('/api/v1/payments/'))[0], ['default'])
+
+    def test_tasks_and_requests_fall_back_to_the_primary_without_replicas(self):
+        with override_settings(DB_REPLICAS=[]):
+            self.assertEqual(self.serve(RequestFactory().get('/api/v1/posts/'))[0], ['default'])
+            self.assertEqual(replica_reads(lambda: Post.objects.all().db)(), 'default')
+        self.assertEqual(replica_reads(lambda: Post.objects.all().db)(), 'replica_1')
+        self.assertEqual(Post.objects.all().db, 'default')
+
+
+class ReplicaSettingsTests(SimpleTestCase):
+    def load_settings(self, **environ):
+        with mock.patch.dict(os.environ, environ):
+            spec = importlib.util.find_spec('lessoner.settings')
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+        return module
+
+    def test_replica_aliases(self):
+        loaded = self.load_settings(DB_REPLICA_HOSTS='replica1,replica2:6432/lessoner', DB_ATOMIC_REQUESTS='True')
+        self.assertEqual(loaded.DB_REPLICAS, ['replica_1', 'replica_2'])
+        replica = loaded.DATABASES['replica_2']
+        self.assertEqual((replica['HOST'], replica['PORT'], replica['NAME']), ('replica2', 6432, 'lessoner'))
+        self.assertTrue(loaded.DATABASES['default']['ATOMIC_REQUESTS'])
+        self.assertFalse(replica['ATOMIC_REQUESTS'])
+
+        # async views opt out of ATOMIC_REQUESTS for the primary only, and still run with replicas
+        @public_async_view
+        async def view(request):
+            return HttpResponse()
+
+        with mock.patch.dict(connections.settings, {'replica_1': loaded.DATABASES['replica_1']}):
+            self.assertIs(BaseHandler().make_view_atomic(view), view)
+
+
+@override_settings(
+    ALLOWED_HOSTS=['localhost', '127.0.0.1'],
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+    CONCURRENT_QUERIES=False,
+    DB_REPLICAS=[],
+)
+class BenchmarkCommandTests(TransactionTestCase):
+    """The benchmarks run in-process against seeded data with the project's ALLOWED_HOSTS, and every request succeeds."""
+
+    def setUp(self):
+        call_command(
+            'seed_synthetic_data', users=8, categories=2, posts_per_user=2, comments_per_post=2, subscribed=0.5, seed=1,
+            stdout=io.StringIO(),
+        )
+
+    def test_bench_load(self):
+        with tempfile.NamedTemporaryFile('r', suffix='.json') as output:
+            call_command('bench_load', requests=4, concurrency=1, output=output.name, seed=1, stdout=io.StringIO())
+            report = json.load(output)
+        self.assertEqual(set(report['scenarios']), {'feed', 'post_detail', 'comment_thread', 'checkout', 'webhook'})
+        self.assertFalse([name for name, stats in report['scenarios'].items() if stats['errors']])
+
+    def test_bench_async_reads(self):
+        stdout = io.StringIO()
+        call_command('bench_async_reads', requests=2, concurrency=1, stdout=stdout)
+        self.assertIn('asgi async', stdout.getvalue())
+
+    def test_failed_requests_fail_the_run(self):
+        with override_settings(ALLOWED_HOSTS=['localhost']), mock.patch('apps.core.management.commands.bench_load.Client', lambda: Client(HTTP_HOST='example.com')):
+            with self.assertRaisesMessage(CommandError, 'feed 2'), self.assertLogs('django.security.DisallowedHost', 'ERROR'):
+                call_command('bench_load', scenarios='feed', requests=2, concurrency=1, stdout=io.StringIO())
+
+
+@skipUnless(orjson, 'orjson is not installed')
+@override_settings(API_JSON_BACKEND='orjson')
+class ORJSONRendererTests(SimpleTestCase):
+    def test_renders_what_the_stock_renderer_does(self):
+        payloads = [
+            None,
+            [],
+            {'count': 2, 'next': None, 'results': [{'id': 1, 'is_active': True}, {'id': 2, 'is_active': False}]},
+            {'title': 'Ünïcode — ✓ 😀', 'separators': 'line\u2028paragraph\u2029', 'quote': '"\\/\n\t'},
+            {'created_at': datetime(2024, 5, 1, 12, 30, tzinfo=dt_timezone.utc), 'day': date(2024, 5, 1), 'at': dt_time(9, 15)},
+            {'uuid': uuid.UUID(int=1), 'duration': timedelta(minutes=90), 'lazy': gettext_lazy('Subscription')},
+            {'price': Decimal('12.50'), 'ratio': 0.1, 'mean': 123456789.123, 'whole': 1.0, 'big': 2 ** 70},
+            {1: 'int keys', 'nested': {'tuple': (1, 2), 'set': [3]}},
+        ]
+        for data in payloads:
+            with self.subTest(data=data):
+                self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_float_differences(self):
+        for value in (1e-7, 1e16, Decimal('1E-7')):
+            with self.subTest(value=value):
+                rendered, stock = ORJSONRenderer().render([value]), JSONRenderer().render([value])
+                self.assertNotEqual(rendered, stock)
+                self.assertEqual(json.loads(rendered), json.loads(stock))
+
+        self.assertEqual(ORJSONRenderer().render([float('nan'), float('inf')]), b'[null,null]')
+        with self.assertRaises(ValueError):
+            JSONRenderer().render([float('nan')])
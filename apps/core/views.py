@@ -0,0 +1,12 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import HttpResponse
+from django.views.decorators.http import require_safe
+
+from . import profiling
+
+
+@require_safe
+@staff_member_required
+def metrics(request):
+    """Request histograms of the serving process, for Prometheus or a quick look from the admin."""
+    return HttpResponse(profiling.exposition(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -1,5 +1,8 @@
 from django.contrib import admin
 
+from apps.comments.models import Comment
+from apps.core.admin import LargeTableAdmin
+from apps.core.serialization import subquery_count
 from apps.main.models import Category, Post
 
 
@@ -13,15 +16,20 @@ class CategoryAdmin(admin.ModelAdmin):
     readonly_fields = ('created_at',)
 
     def posts_count(self, obj):
-        return obj.posts.coutn()
+        return obj.posts_total
 
     posts_count.short_description = 'Posts Count'
+    posts_count.admin_order_field = 'posts_total'
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(posts_total=subquery_count(Post.objects.all(), 'category'))
 
 
 @admin.register(Post)
-class PostAdmin(admin.ModelAdmin):
+class PostAdmin(LargeTableAdmin):
     list_display = ('title', 'slug', 'author', 'category', 'status', 'views_count', 'comments_count', 'created_at')
-    list_filter = ('status', 'category', 'created_at', 'updated_at')
+    list_filter = ('status', 'category', 'created_at')
+    date_hierarchy = 'created_at'
     prepopulated_fields = {'slug': ('title',)}
     readonly_fields = ('created_at', 'updated_at', 'views_count')
     raw_id_fields = ('author',)
@@ -40,9 +48,11 @@ class PostAdmin(admin.ModelAdmin):
     )
 
     def comments_count(self, obj):
-        return obj.comments.count()
+        return obj.comments_total
 
     comments_count.short_description = 'Comments'
 
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related('author', 'category')
+        return super().get_queryset(request).select_related('author', 'category').annotate(
+            comments_total=subquery_count(Comment.objects.all(), 'post'),
+        )
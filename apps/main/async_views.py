@@ -0,0 +1,76 @@
+from datetime import timedelta
+
+from django.shortcuts import aget_object_or_404
+from django.utils import timezone
+
+from apps.analytics import events
+from apps.core.async_views import json_response, public_async_view
+from apps.core.conditional import conditional_get
+from apps.core.concurrency import gather_reads
+
+from .models import Category, Post
+from .serializers import CategorySerializer, PostListValuesSerializer
+from .views import _posts_by_category_queryset, _posts_by_category_validators
+
+
+def _read_rows(queryset):
+    return lambda: list(PostListValuesSerializer.prepare(queryset))
+
+
+def _serialize(rows, request):
+    return PostListValuesSerializer(rows, many=True, context={'request': request}).data
+
+
+@public_async_view
+async def popular_posts(request):
+    posts = Post.objects.with_subscription_info().filter(status='published').order_by('-views_count')[:10]
+    rows = [row async for row in PostListValuesSerializer.prepare(posts)]
+    return json_response(_serialize(rows, request))
+
+
+@public_async_view
+async def recent_posts(request):
+    posts = Post.objects.with_subscription_info().filter(status='published').order_by('-created_at')[:10]
+    rows = [row async for row in PostListValuesSerializer.prepare(posts)]
+    return json_response(_serialize(rows, request))
+
+
+@public_async_view
+async def featured_posts(request):
+    week_ago = timezone.now() - timedelta(days=7)
+    pinned_posts = Post.objects.pinned_posts()
+    popular_posts = Post.objects.with_subscription_info().filter(status='published', created_at__gte=week_ago).order_by('-views_count')
+
+    # Over-fetch popular posts instead of excluding the pinned ids so all three reads run at once.
+    pinned_rows, popular_rows, total_count = await gather_reads(
+        _read_rows(pinned_posts[:3]),
+        _read_rows(popular_posts[:9]),
+        pinned_posts.count,
+    )
+    pinned_ids = {row['id'] for row in pinned_rows}
+    popular_rows = [row for row in popular_rows if row['id'] not in pinned_ids][:6]
+    pinned_data = _serialize(pinned_rows, request)
+    events.record_pin_impressions(pinned_data)
+
+    return json_response({
+        'pinned_posts': pinned_data,
+        'popular_posts': _serialize(popular_rows, request),
+        'total_count': total_count,
+    })
+
+
+@public_async_view
+@conditional_get(_posts_by_category_validators, 'posts_by_category')
+async def post_by_category(request, slug):
+    category = await aget_object_or_404(Category, slug=slug)
+    category_data, rows = await gather_reads(
+        lambda: CategorySerializer(category).data,
+        _read_rows(_posts_by_category_queryset(category)),
+    )
+    posts = _serialize(rows, request)
+    events.record_pin_impressions(posts)
+    return json_response({
+        'category': category_data,
+        'posts': posts,
+        'pinned_posts_count': sum(1 for post in posts if post['is_pinned']),
+    })
@@ -0,0 +1,53 @@
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from apps.main.models import Post, build_excerpt
+from apps.main.serializers import PostListSerializer
+
+
+def _column_bytes(queryset, columns):
+    return sum(len(str(value).encode()) for row in queryset.values_list(*columns) for value in row if value is not None)
+
+
+def _peak_memory(func):
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+class Command(BaseCommand):
+    help = 'Measure what a post list page reads when it loads full bodies versus the stored excerpt'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, default=20)
+
+    def handle(self, *args, **options):
+        page = Post.objects.select_related('author', 'category').order_by('-created_at')[:options['page_size']]
+        ids = list(page.values_list('pk', flat=True))
+        if not ids:
+            self.stdout.write(self.style.WARNING('No posts to measure'))
+            return
+        rows = Post.objects.filter(pk__in=ids)
+
+        full_bytes = _column_bytes(rows, ['content'])
+        excerpt_bytes = _column_bytes(rows, ['excerpt'])
+
+        def full_bodies():
+            posts = list(page)
+            return [build_excerpt(post.content) for post in posts], PostListSerializer(posts, many=True).data
+
+        def excerpts():
+            return PostListSerializer(list(page.defer('content')), many=True).data
+
+        full_peak = _peak_memory(full_bodies)
+        excerpt_peak = _peak_memory(excerpts)
+
+        self.stdout.write(f'posts on page: {len(ids)}')
+        self.stdout.write(f'body bytes read: {full_bytes} (full content) vs {excerpt_bytes} (excerpt)')
+        self.stdout.write(f'peak memory while listing: {full_peak} B (full content) vs {excerpt_peak} B (excerpt)')
+        if full_bytes:
+            self.stdout.write(self.style.SUCCESS(f'body bytes reduced by {100 - excerpt_bytes * 100 / full_bytes:.1f}%'))
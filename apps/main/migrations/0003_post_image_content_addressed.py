@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-18 23:33
+
+import apps.media.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0002_post_image_renditions'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, null=True, upload_to=apps.media.storage.ContentAddressedPath('images', 'image')),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 23:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0003_post_image_content_addressed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comments_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
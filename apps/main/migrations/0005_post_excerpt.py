@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-18 23:44
+
+from django.db import migrations, models
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Concat, Length, Substr
+from django.db.models.lookups import GreaterThan
+
+
+def backfill_excerpts(apps, schema_editor):
+    Post = apps.get_model('main', 'Post')
+    Post.objects.update(excerpt=Case(
+        When(GreaterThan(Length('content'), 200), then=Concat(Substr('content', 1, 200), Value('...'))),
+        default=F('content'),
+        output_field=models.CharField(),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0004_post_comments_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='excerpt',
+            field=models.CharField(blank=True, editable=False, max_length=203),
+        ),
+        migrations.RunPython(backfill_excerpts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-19 01:00
+
+import apps.media.storage
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0005_post_excerpt'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=apps.media.storage.ContentAddressedImageField(blank=True, null=True, upload_to=apps.media.storage.ContentAddressedPath('images', 'image')),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.7 on 2026-10-19 01:48
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0006_post_image_content_hash'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['category', 'status', 'updated_at'], name='posts_categor_b1060f_idx'),
+        ),
+    ]
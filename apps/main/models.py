@@ -1,8 +1,19 @@
 from django.db import models
 from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
 from django.utils.text import slugify
 from django.urls import reverse
 
+from apps.core.models import TracksStatusMixin
+from apps.core.serialization import subquery_count
+from apps.media.storage import ContentAddressedImageField, ContentAddressedPath
+
+EXCERPT_LENGTH = 200
+
+
+def build_excerpt(content):
+    return content[:EXCERPT_LENGTH] + '...' if len(content) > EXCERPT_LENGTH else content
+
 
 class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)
@@ -25,26 +36,36 @@ class Category(models.Model):
         super().save(*args, **kwargs)
 
 
-class PostManager(models.Manager):
+class PostQuerySet(models.QuerySet):
+    def with_list_info(self):
+        """Load everything PostListSerializer reads per post along with the posts."""
+        from apps.comments.models import Comment
+
+        return self.select_related('author', 'category', 'pin_info__user__subscription').annotate(
+            active_comments_count=subquery_count(Comment.objects.filter(is_active=True), 'post'),
+        ).defer('content')
+
+
+class PostManager(models.Manager.from_queryset(PostQuerySet)):
     def published(self):
         return self.filter(status='published')
 
     def pinned_posts(self):
         return self.filter(
             pin_info__isnull=False,
-            pin_info__user__subscription_status='active',
-            pin_info__user__subscrition_end_date__gt=models.functions.Now(),
+            pin_info__user__subscription__status='active',
+            pin_info__user__subscription__end_date__gt=models.functions.Now(),
             status='published'
-        ).select_related('pin_info', 'pin_info__user', 'pin_info__user__subscription').order_by('pin_info__pinned_at')
+        ).with_list_info().order_by('pin_info__pinned_at')
 
     def regular_posts(self):
         return self.filter(pin_info__isnull=True, status='published')
 
     def with_subscription_info(self):
-        return self.select_related('author', 'author__subscription', 'category').prefetch_related('pin_info')
+        return self.get_queryset().with_list_info()
 
 
-class Post(models.Model):
+class Post(TracksStatusMixin, models.Model):
     STATUS_CHOICES = [
         ('draft', 'Draft'),
         ('published', 'Published'),
@@ -53,13 +74,18 @@ class Post(models.Model):
     title = models.CharField(max_length=100)
     slug = models.SlugField(max_length=100, unique=True, blank=True)
     content = models.TextField()
-    image = models.ImageField(upload_to='images/', blank=True, null=True)
+    # List endpoints read this instead of the full body; kept in sync by save().
+    excerpt = models.CharField(max_length=EXCERPT_LENGTH + 3, blank=True, editable=False)
+    image = ContentAddressedImageField(upload_to=ContentAddressedPath('images', 'image'), blank=True, null=True)
+    image_renditions = models.JSONField(default=dict, blank=True, editable=False)
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, blank=True, null=True, related_name='posts')
     author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='posts')
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='draft')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     views_count = models.PositiveIntegerField(default=0)
+    # Bumped on every comment change; used as a cheap validator for comment thread responses.
+    comments_version = models.PositiveIntegerField(default=0, editable=False)
 
     objects = PostManager()
 
@@ -72,26 +98,45 @@ class Post(models.Model):
             models.Index(fields=['-created_at']),
             models.Index(fields=['status', '-created_at']),
             models.Index(fields=['category', '-created_at']),
+            models.Index(fields=['category', 'status', 'updated_at']),
             models.Index(fields=['author', '-created_at'])
         ]
 
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'image' in instance.__dict__:
+            instance._loaded_image = instance.__dict__['image'] or None
+        return instance
+
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.title)
+
+        update_fields = kwargs.get('update_fields')
+        if 'content' in self.__dict__ and (update_fields is None or 'content' in update_fields):
+            self.excerpt = build_excerpt(self.content)
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'excerpt'}
         super().save(*args, **kwargs)
 
     def get_absolute_url(self):
         return reverse('main:detail', kwargs={'slug': self.slug})
 
     def comments_count(self):
+        if hasattr(self, 'active_comments_count'):
+            return self.active_comments_count
         return self.comments.filter(is_active=True).count()
 
     @property
     def is_pinned(self):
-        return hasattr(self.pin_info, 'pin_info') and self.pin_info.pinned_at is not None
+        try:
+            return self.pin_info.pinned_at is not None
+        except ObjectDoesNotExist:
+            return False
 
     @property
     def can_be_pinned_by_user(self):
@@ -126,9 +171,14 @@ class Post(models.Model):
                 'pinned_by': {
                     'id': self.pin_info.user.id,
                     'username': self.pin_info.user.username,
-                    'has_active_subscription': self.pin_info.user.subscription.is_active
+                    'has_active_subscription': hasattr(self.pin_info.user, 'subscription') and self.pin_info.user.subscription.is_active
                 }
             }
         return {
             'is_pinned': False,
         }
+
+
+def deleting_posts(origin):
+    """Whether the delete that started from ``origin`` deletes posts, cascading to their comments."""
+    return isinstance(origin, Post) or (isinstance(origin, models.QuerySet) and origin.model is Post)
@@ -1,9 +1,12 @@
 from rest_framework import serializers
+from django.utils import timezone
 from django.utils.text import slugify
+from apps.core.serialization import ModelSerializer, ValuesSerializer, field_representation, subquery_count
+from apps.media.renditions import rendition_urls
 from .models import Category, Post
 
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(ModelSerializer):
     posts_count = serializers.SerializerMethodField()
 
     class Meta:
@@ -12,6 +15,8 @@ class CategorySerializer(serializers.ModelSerializer):
         read_only_fields = ['slug', 'created_at']
 
     def get_posts_count(self, obj):
+        if hasattr(obj, 'published_posts_count'):
+            return obj.published_posts_count
         return obj.posts.filter(status='published').count()
 
     def create(self, validated_data):
@@ -19,42 +24,108 @@ class CategorySerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
-class PostListSerializer(serializers.ModelSerializer):
+class PostListSerializer(ModelSerializer):
+    content = serializers.CharField(source='excerpt', read_only=True)
     author = serializers.StringRelatedField()
     categories = serializers.StringRelatedField()
     comments_count = serializers.ReadOnlyField()
     is_pinned = serializers.ReadOnlyField()
     pinned_info = serializers.SerializerMethodField()
+    image_renditions = serializers.SerializerMethodField()
 
     class Meta:
         model = Post
         fields = [
-            'id', 'title', 'slug', 'content', 'image', 'categories', 'author', 'status', 'created_at', 'updated_at', 'views_count', 'comments_count',
+            'id', 'title', 'slug', 'content', 'image', 'image_renditions', 'categories', 'author', 'status', 'created_at', 'updated_at', 'views_count', 'comments_count',
             'is_pinned', 'pinned_info']
         read_only_fields = ['slug', 'created_at', 'views_count', 'author', 'comments_count']
 
     def get_pinned_info(self, obj):
         return obj.get_pinned_info()
 
-    def to_representation(self, instance):
-        data = super().to_representation(instance)
-        if len(data['content']) > 200:
-            data['content'] = data['content'][:200] + '...'
-        return data
+    def get_image_renditions(self, obj):
+        return rendition_urls(obj.image_renditions, request=self.context.get('request'))
 
 
-class PostDetailSerializer(serializers.ModelSerializer):
+class PostRetrieveSerializer(PostListSerializer):
+    # estimated from the viewer sketches, so it trails views_count by up to a rollup interval
+    unique_viewers = serializers.IntegerField(read_only=True)
+
+    class Meta(PostListSerializer.Meta):
+        fields = PostListSerializer.Meta.fields + ['unique_viewers']
+
+
+class PostListValuesSerializer(ValuesSerializer):
+    model_serializer_class = PostListSerializer
+    values = (
+        'id', 'title', 'slug', 'excerpt', 'image', 'image_renditions', 'author__email', 'status', 'created_at', 'updated_at', 'views_count',
+        'pin_info__pinned_at', 'pin_info__user', 'pin_info__user__username', 'pin_info__user__subscription__status',
+        'pin_info__user__subscription__end_date',
+    )
+
+    @classmethod
+    def get_annotations(cls):
+        from apps.comments.models import Comment
+
+        return {
+            'active_comments_count': subquery_count(Comment.objects.filter(is_active=True), 'post'),
+        }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.image_storage = Post._meta.get_field('image').storage
+        self.format_datetime = field_representation(PostListSerializer, 'created_at')
+        self.now = timezone.now()
+
+    def to_representation(self, row):
+        pinned_at = row['pin_info__pinned_at']
+        if pinned_at is not None:
+            subscription_end = row['pin_info__user__subscription__end_date']
+            pinned_info = {
+                'is_pinned': True,
+                'pinned_at': pinned_at,
+                'pinned_by': {
+                    'id': row['pin_info__user'],
+                    'username': row['pin_info__user__username'],
+                    'has_active_subscription': (
+                        row['pin_info__user__subscription__status'] == 'active' and subscription_end is not None and subscription_end > self.now
+                    ),
+                },
+            }
+        else:
+            pinned_info = {'is_pinned': False}
+
+        return {
+            'id': row['id'],
+            'title': row['title'],
+            'slug': row['slug'],
+            'content': row['excerpt'],
+            'image': self.file_url(row['image'], self.image_storage),
+            'image_renditions': rendition_urls(row['image_renditions'], request=self.request),
+            'author': row['author__email'],
+            'status': row['status'],
+            'created_at': self.format_datetime(row['created_at']),
+            'updated_at': self.format_datetime(row['updated_at']),
+            'views_count': row['views_count'],
+            'comments_count': row['active_comments_count'],
+            'is_pinned': pinned_at is not None,
+            'pinned_info': pinned_info,
+        }
+
+
+class PostDetailSerializer(ModelSerializer):
     author_info = serializers.SerializerMethodField()
     category_info = serializers.SerializerMethodField()
     comments_count = serializers.ReadOnlyField()
     is_pinned = serializers.ReadOnlyField()
     pinned_info = serializers.SerializerMethodField()
     can_pin = serializers.SerializerMethodField()
+    image_renditions = serializers.SerializerMethodField()
 
     class Meta:
         model = Post
         fields = [
-            'id', 'title', 'slug', 'content', 'image', 'category', 'category_info', 'author', 'author_info', 'status', 'created_at', 'updated_at',
+            'id', 'title', 'slug', 'content', 'image', 'image_renditions', 'category', 'category_info', 'author', 'author_info', 'status', 'created_at', 'updated_at',
             'views_count', 'comments_count', 'is_pinned', 'pinned_info', 'can_pin'
         ]
         read_only_fields = ['slug', 'created_at', 'author', 'views_count', 'comments_count']
@@ -65,7 +136,8 @@ class PostDetailSerializer(serializers.ModelSerializer):
             'id': author.id,
             'username': author.username,
             'full_name': author.full_name,
-            'avatar': author.avatar.url if author.avatar else None
+            'avatar': author.avatar.url if author.avatar else None,
+            'avatar_renditions': rendition_urls(author.avatar_renditions),
         }
 
     def get_category_info(self, obj):
@@ -80,6 +152,9 @@ class PostDetailSerializer(serializers.ModelSerializer):
     def get_pinned_info(self, obj):
         return obj.get_pinned_info()
 
+    def get_image_renditions(self, obj):
+        return rendition_urls(obj.image_renditions, request=self.context.get('request'))
+
     def get_can_pin(self, obj):
         request = self.context.get('request')
         if not request or not request.user.is_authenticated:
@@ -87,7 +162,7 @@ class PostDetailSerializer(serializers.ModelSerializer):
         return obj.can_be_pinned(request.user)
 
 
-class PostCreateUpdateSerializer(serializers.ModelSerializer):
+class PostCreateUpdateSerializer(ModelSerializer):
     class Meta:
         model = Post
         fields = ['title', 'content', 'image', 'category', 'status']
@@ -1,3 +1,267 @@
-from django.test import TestCase
+from datetime import timedelta
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.accounts.stats import refresh_user_stats
+from apps.analytics import events
+from apps.analytics.models import PostEvent, PostViewers
+from apps.analytics.rollups import refresh_rollups
+from apps.comments.models import Comment
+from apps.core.testing import QueryBudgetTestCase, make_category, make_comments, make_plan, make_posts, make_subscriber, make_user
+from apps.subscribe.models import PinnedPost
+
+QUERY_BUDGETS = {
+    'main:category-list': {'get': 2, 'post': 5},
+    'main:category-detail': {'get': 1, 'patch': 4},
+    'main:posts-by-category': {'get': 5},
+    'main:post-list': {'get': 2, 'post': 5},
+    'main:my-posts': {'get': 2},
+    'main:my-posts-stats': {'get': 3},
+    'main:popular-posts': {'get': 1},
+    'main:recent-posts': {'get': 1},
+    'main:pinned-posts': {'get': 2},
+    'main:featured-posts': {'get': 3},
+    # deleting a post takes its comments off their authors' counters in one UPDATE and deletes its analytics rollups
+    'main:post-detail': {'get': 3, 'patch': 4, 'delete': 17},
+}
+
+
+class CategoryQueryBudgetTests(QueryBudgetTestCase):
+    budgets = QUERY_BUDGETS
+
+    def test_category_list(self):
+        def grow():
+            for _ in range(5):
+                make_posts(self.data.author, 2, category=make_category())
+
+        self.assertQueriesConstant('get', 'main:category-list', grow)
+
+    def test_category_create(self):
+        self.assertWithinBudget('post', 'main:category-list', user=self.data.author, data={'name': 'Fresh'}, status=201)
+
+    def test_category_detail(self):
+        slug = self.data.categories[0].slug
+        self.assertWithinBudget('get', 'main:category-detail', args=[slug])
+        self.assertWithinBudget('patch', 'main:category-detail', args=[slug], user=self.data.author, data={'description': 'Updated'})
+
+    def test_posts_by_category(self):
+        category = self.data.categories[0]
+        self.assertQueriesConstant(
+            'get', 'main:posts-by-category', lambda: make_posts(make_user(), 25, category=category), args=[category.slug],
+        )
+
+
+class PostQueryBudgetTests(QueryBudgetTestCase):
+    budgets = QUERY_BUDGETS
+
+    def grow(self):
+        for category in self.data.categories:
+            make_posts(make_user(), 15, category=category, views_count=1000)
+
+    def test_post_list(self):
+        self.assertQueriesConstant('get', 'main:post-list', self.grow)
+
+    def test_post_list_authenticated(self):
+        self.assertQueriesConstant('get', 'main:post-list', self.grow, user=self.data.reader)
+
+    @override_settings(API_VALUES_SERIALIZERS=False)
+    def test_post_list_model_serializer(self):
+        self.assertQueriesConstant('get', 'main:post-list', self.grow)
+
+    def test_post_list_pinned_first(self):
+        pinned = self.data.post
+        make_posts(self.data.reader, 3)
+        client = self.client_for()
+        self.assertEqual(client.get(reverse('main:post-list')).data['results'][0]['id'], pinned.pk)
+        # an explicit ordering other than the feed's own is followed as is
+        by_title = client.get(reverse('main:post-list'), {'ordering': 'title'}).data['results']
+        self.assertEqual([post['title'] for post in by_title], sorted(post['title'] for post in by_title))
+
+        self.data.author.subscription.status = 'expired'
+        self.data.author.subscription.save()
+        self.assertNotEqual(client.get(reverse('main:post-list')).data['results'][0]['id'], pinned.pk)
+
+    def test_values_and_model_serializers_agree(self):
+        client = self.client_for(self.data.author)
+        for url in (reverse('main:post-list'), reverse('main:my-posts'), reverse('main:posts-by-category', args=[self.data.categories[0].slug])):
+            with self.subTest(url=url):
+                values = client.get(url).json()
+                with override_settings(API_VALUES_SERIALIZERS=False):
+                    model = client.get(url).json()
+                self.assertEqual(values, model)
+
+    def test_post_create(self):
+        data = {'title': 'New post', 'content': 'Body ' * 100, 'category': self.data.categories[0].pk, 'status': 'published'}
+        self.assertWithinBudget('post', 'main:post-list', user=self.data.author, data=data, status=201)
+
+    def test_my_posts(self):
+        author = self.data.author
+        self.assertQueriesConstant('get', 'main:my-posts', lambda: make_posts(author, 25), user=author)
+
+    @override_settings(ANALYTICS_ROLLUP_LAG_SECONDS=0)
+    def test_my_posts_stats(self):
+        author = self.data.author
+
+        def grow():
+            events.record('view', [post.pk for post in make_posts(author, 25)], viewer=1)
+            events.flush()
+            refresh_rollups()
+
+        response = self.assertQueriesConstant('get', 'main:my-posts-stats', grow, user=author)
+        self.assertEqual(response.data['series'][0]['views'], 25)
+        self.assertEqual(response.data['posts'][0]['unique_viewers'], 1)
+
+    @override_settings(ANALYTICS_ROLLUP_LAG_SECONDS=0)
+    def test_my_posts_stats_merges_the_days_of_each_post(self):
+        author, now = self.data.author, timezone.now()
+        first, second = make_posts(author, 2)
+        events.record('view', [first.pk, second.pk], viewer=events.user_key(1))
+        events.record('view', [first.pk], viewer=events.user_key(2))
+        events.flush()
+        PostEvent.objects.update(created_at=now - timedelta(days=1))
+        events.record('view', [first.pk], viewer=events.user_key(1))
+        events.record('view', [first.pk], viewer=events.user_key(3))
+        events.flush()
+        refresh_rollups(now + timedelta(seconds=1))
+
+        response = self.client_for(author).get(reverse('main:my-posts-stats'))
+        viewers = {row['id']: row['unique_viewers'] for row in response.data['posts']}
+        self.assertEqual((viewers[first.pk], viewers[second.pk]), (3, 1))
+
+        response = self.client_for(author).get(reverse('main:my-posts-stats'), {'date_from': '2020-01-01', 'date_to': '2021-01-01'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_popular_posts(self):
+        self.assertQueriesConstant('get', 'main:popular-posts', self.grow)
+
+    def test_recent_posts(self):
+        self.assertQueriesConstant('get', 'main:recent-posts', self.grow)
+
+    def test_featured_posts(self):
+        self.assertQueriesConstant('get', 'main:featured-posts', self.grow)
+
+    def test_pinned_posts(self):
+        def grow():
+            for _ in range(10):
+                user = make_subscriber(self.data.plan)
+                PinnedPost.objects.create(user=user, post=make_posts(user, 1)[0])
+
+        self.assertQueriesConstant('get', 'main:pinned-posts', grow)
+
+    def test_post_detail(self):
+        slug = self.data.post.slug
+        self.assertWithinBudget('get', 'main:post-detail', args=[slug])
+        self.assertWithinBudget('get', 'main:post-detail', args=[slug], user=self.data.reader)
+
+    @override_settings(ANALYTICS_ROLLUP_LAG_SECONDS=0)
+    def test_post_detail_unique_viewers(self):
+        slug = self.data.post.slug
+        self.client_for(self.data.reader).get(f'/api/v1/posts/{slug}/')
+        self.client_for(self.data.reader).get(f'/api/v1/posts/{slug}/')
+        self.client_for().get(f'/api/v1/posts/{slug}/')
+        events.flush()
+        refresh_rollups()
+        response = self.assertWithinBudget('get', 'main:post-detail', args=[slug])
+        self.assertEqual((response.data['views_count'], response.data['unique_viewers']), (4, 2))
+
+    def test_post_update_and_delete(self):
+        slug = self.data.post.slug
+        self.assertWithinBudget('patch', 'main:post-detail', args=[slug], user=self.data.author, data={'title': 'Renamed'})
+        self.assertWithinBudget('delete', 'main:post-detail', args=['renamed'], user=self.data.author, status=204)
+
+    def test_post_delete_cascades_in_constant_queries(self):
+        author, reader = self.data.author, self.data.reader
+        few, many = make_posts(author, 2)
+        make_comments(few, [author], 1)
+        make_comments(many, [author, reader, make_user()], 10, replies=2)
+        Comment.objects.filter(post=many).first().replies.update(is_active=False)
+        refresh_user_stats([author.pk, reader.pk])
+
+        _, before = self._check_budget('delete', 'main:post-detail', [few.slug], author, None, 204)
+        _, after = self._check_budget('delete', 'main:post-detail', [many.slug], author, None, 204)
+        self.assertEqual(len(after), len(before), self._describe('deleting a post with more comments took', after))
+        for user in (author, reader):
+            user.refresh_from_db()
+            self.assertEqual(user.comments_count, Comment.objects.filter(author=user, is_active=True).count())
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = make_subscriber(make_plan())
+        cls.category = make_category()
+        cls.post, cls.other = make_posts(cls.author, 2, category=cls.category)
+        PinnedPost.objects.create(user=cls.author, post=cls.post)
+        cls.detail = reverse('main:post-detail', args=[cls.post.slug])
+        cls.by_category = reverse('main:posts-by-category', args=[cls.category.slug])
+
+    def etag(self, url):
+        response = self.client.get(url)
+        self.assertNotIn('Last-Modified', response.headers)
+        return response.headers['ETag']
+
+    def revalidate(self, url, etag):
+        return self.client.get(url, headers={'if-none-match': etag}).status_code
+
+    def assertChangeInvalidates(self, url, change):
+        etag = self.etag(url)
+        change()
+        self.assertEqual(self.revalidate(url, etag), 200)
+
+    def expire_subscription(self):
+        self.author.subscription.end_date = timezone.now() - timedelta(minutes=1)
+        self.author.subscription.save()
+
+    def change_email(self):
+        self.author.email = 'renamed@example.com'
+        self.author.save()
+
+    def assertNotModifiedAfter(self, url, change):
+        etag = self.etag(url)
+        change()
+        self.assertEqual(self.revalidate(url, etag), 304)
+
+    def unpin(self):
+        PinnedPost.objects.filter(post=self.post).delete()
+
+    def test_post_detail_not_modified(self):
+        etag = self.etag(self.detail)
+        for _ in range(3):
+            # revalidations count as views, which leave the weak ETag alone
+            self.assertEqual(self.revalidate(self.detail, etag), 304)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views_count, 4)
+
+    def test_post_detail_changes(self):
+        for change in (self.change_email, self.expire_subscription, self.unpin):
+            with self.subTest(change=change):
+                self.assertChangeInvalidates(self.detail, change)
+
+    def test_post_detail_views_do_not_change_the_etag(self):
+        for change in (
+            lambda: PostViewers.objects.create(post=self.post, sketch=b'', unique_viewers=7),
+            lambda: self.client.get(self.detail, headers={'user-agent': 'another reader'}),
+        ):
+            with self.subTest(change=change):
+                self.assertNotModifiedAfter(self.detail, change)
+
+    def test_posts_by_category_not_modified(self):
+        etag = self.etag(self.by_category)
+        self.assertEqual(self.revalidate(self.by_category, etag), 304)
+        self.assertEqual(self.revalidate(self.by_category, etag), 304)
+        self.assertNotModifiedAfter(self.by_category, lambda: self.client.get(self.detail))
+
+    def test_posts_by_category_changes(self):
+        def unpublish():
+            self.other.status = 'draft'
+            self.other.save()
+
+        def edit():
+            self.other.title = 'Renamed'
+            self.other.save()
+
+        for change in (edit, self.unpin, unpublish):
+            with self.subTest(change=change):
+                self.assertChangeInvalidates(self.by_category, change)
@@ -1,18 +1,22 @@
+from django.conf import settings
 from django.urls import path
 
-from . import views
+from . import async_views, views
+
+reads = async_views if settings.ASYNC_READ_VIEWS else views
 
 app_name = 'main'
 urlpatterns = [
     path('categories/', views.CategoryListCreateView.as_view(), name='category-list'),
     path('categories/<slug:slug>/', views.CategoryDetailView.as_view(), name='category-detail'),
-    path('categories/<slug:slug>/posts/', views.post_by_category, name='posts-by-category'),
+    path('categories/<slug:slug>/posts/', reads.post_by_category, name='posts-by-category'),
 
     path('', views.PostListCreateView.as_view(), name='post-list'),
     path('my-posts/', views.MyPostsView.as_view(), name='my-posts'),
-    path('popular/', views.popular_posts, name='popular-posts'),
-    path('recent/', views.recent_posts, name='recent-posts'),
+    path('my-posts/stats/', views.my_posts_stats, name='my-posts-stats'),
+    path('popular/', reads.popular_posts, name='popular-posts'),
+    path('recent/', reads.recent_posts, name='recent-posts'),
     path('pinned/', views.pinned_posts_only, name='pinned-posts'),
-    path('featured/', views.featured_posts, name='featured-posts'),
+    path('featured/', reads.featured_posts, name='featured-posts'),
     path('<slug:slug>/', views.PostDetailView.as_view(), name='post-detail'),
 ]
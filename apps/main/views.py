@@ -1,22 +1,38 @@
+from datetime import datetime, time, timedelta
+from itertools import groupby
+
 from rest_framework import generics, permissions, status, filters
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Q
+from django.db.models import Case, Q, F, Max, Count, OuterRef, Subquery, Sum, When
+from django.db.models.functions import Coalesce, Now
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+
+from apps.analytics import events
+from apps.analytics.hll import merged
+from apps.analytics.models import PostDailyStats, PostHourlyStats, PostViewers, PostViewerSketch
+from apps.analytics.serializers import PostStatsQuerySerializer
+from apps.core.concurrency import run_concurrently
+from apps.core.conditional import ConditionalGetMixin, conditional_get, make_etag
+from apps.core.db import NonAtomicReadsMixin, non_atomic_reads
+from apps.core.serialization import ValuesListMixin, subquery_count
 
 from .models import Category, Post
 from .serializers import (
     CategorySerializer,
     PostListSerializer,
+    PostListValuesSerializer,
+    PostRetrieveSerializer,
     PostDetailSerializer,
     PostCreateUpdateSerializer
 )
 from .permissions import IsAuthorOrReadOnly
 
 
-class CategoryListCreateView(generics.ListCreateAPIView):
-    queryset = Category.objects.all()
+class CategoryListCreateView(NonAtomicReadsMixin, generics.ListCreateAPIView):
+    queryset = Category.objects.annotate(published_posts_count=subquery_count(Post.objects.filter(status='published'), 'category'))
     serializer_class = CategorySerializer
     permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
@@ -25,15 +41,16 @@ class CategoryListCreateView(generics.ListCreateAPIView):
     ordering = ['name']
 
 
-class CategoryDetailView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Category.objects.all()
+class CategoryDetailView(NonAtomicReadsMixin, generics.RetrieveUpdateDestroyAPIView):
+    queryset = Category.objects.annotate(published_posts_count=subquery_count(Post.objects.filter(status='published'), 'category'))
     serializer_class = CategorySerializer
     permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
     lookup_field = 'slug'
 
 
-class PostListCreateView(generics.ListCreateAPIView):
+class PostListCreateView(NonAtomicReadsMixin, ValuesListMixin, generics.ListCreateAPIView):
     serializer_class = PostListSerializer
+    values_serializer_class = PostListValuesSerializer
     permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
     filter_backends = [filters.SearchFilter, filters.OrderingFilter, DjangoFilterBackend]
     filterset_fields = ['category', 'author', 'status']
@@ -42,21 +59,29 @@ class PostListCreateView(generics.ListCreateAPIView):
     ordering = ['-created_at']
 
     def get_queryset(self):
-        queryset = Post.objects.select_related('author', 'category').all()
+        queryset = Post.objects.with_list_info()
         if not self.request.user.is_authenticated:
             queryset = queryset.filter(status='published')
         else:
             queryset = queryset.filter(
                 Q(status='published') | Q(author=self.request.user)
             )
+        return queryset
 
-        ordering = self.request.query_params.get('ordering', None)
-        show_pinned_first = not ordering or ordering in ['-created_at', 'updated_at']
-
-        if show_pinned_first:
-            return Post.get_posts_for_feed().filter(
-                Q(status='published') | Q(author=self.request.user) if self.request.user.is_authenticated else Q()
-            )
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        ordering = self.request.query_params.get('ordering')
+        if self.request.method == 'GET' and (not ordering or ordering in ['-created_at', 'updated_at']):
+            # the feed shows posts pinned by active subscribers first, in the order they were pinned
+            queryset = queryset.annotate(feed_pinned_at=Case(
+                When(
+                    status='published',
+                    pin_info__user__subscription__status='active',
+                    pin_info__user__subscription__end_date__gt=Now(),
+                    then='pin_info__pinned_at',
+                ),
+                default=None,
+            )).order_by(F('feed_pinned_at').asc(nulls_last=True), *queryset.query.order_by)
         return queryset
 
     def get_serializer_class(self):
@@ -70,19 +95,40 @@ class PostListCreateView(generics.ListCreateAPIView):
         if hasattr(response, 'data') and 'results' in response.data:
             pinned_count = sum(1 for post in response.data['results'] if post.get('is_pinned', False))
             response.data['pinned_posts_count'] = pinned_count
+            events.record_pin_impressions(response.data['results'])
 
         return response
 
 
-class PostDetailView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Post.objects.select_related('author', 'category')
+class PostDetailView(NonAtomicReadsMixin, ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = PostDetailSerializer
     permission_classes = [IsAuthorOrReadOnly]
     lookup_field = 'slug'
+    cache_policy = 'post_detail'
+
+    def get_conditional_validators(self):
+        # No Last-Modified: related rows change the response and leave updated_at alone.
+        row = Post.objects.filter(slug=self.kwargs['slug']).values_list(*DETAIL_ETAG_FIELDS).first()
+        if row is None:
+            return None
+        self.post_id = row[0]
+        return _post_detail_etag(*row), None
+
+    def on_not_modified(self, validators):
+        # A revalidated read is still a view.
+        Post.objects.filter(slug=self.kwargs['slug']).update(views_count=F('views_count') + 1)
+        events.record('view', [self.post_id], events.viewer_key(self.request))
+
+    def get_queryset(self):
+        if self.request.method == 'GET':
+            return Post.objects.with_list_info().annotate(unique_viewers=_unique_viewers())
+        return Post.objects.select_related('author', 'category')
 
     def get_serializer_class(self):
         if self.request.method in ['PUT', 'PATCH']:
             return PostCreateUpdateSerializer
+        if self.request.method == 'GET':
+            return PostRetrieveSerializer
         return PostListSerializer
 
     def retrieve(self, request, *args, **kwargs):
@@ -90,12 +136,34 @@ class PostDetailView(generics.RetrieveUpdateDestroyAPIView):
 
         if request.method == 'GET':
             instance.increment_views_count()
+            events.record('view', [instance.pk], events.viewer_key(request))
         serializer = self.get_serializer(instance)
         return Response(serializer.data)
 
 
-class MyPostsView(generics.ListAPIView):
+def _unique_viewers():
+    return Coalesce(Subquery(PostViewers.objects.filter(post=OuterRef('pk')).values('unique_viewers')), 0)
+
+
+# What PostRetrieveSerializer renders beyond the post's own fields, which bump updated_at. The
+# view counters are left out: the ETag is weak, and every read, a revalidation included, bumps them.
+DETAIL_ETAG_FIELDS = (
+    'id', 'updated_at', 'comments_version', 'image_renditions', 'author__email',
+    'pin_info__pinned_at', 'pin_info__user', 'pin_info__user__username',
+    'pin_info__user__subscription__status', 'pin_info__user__subscription__end_date',
+)
+
+
+def _post_detail_etag(post_id, updated_at, *values):
+    subscription_end = values[-1]
+    # the pinning user's subscription runs out without any row changing
+    subscription_active = values[-2] == 'active' and subscription_end is not None and subscription_end > timezone.now()
+    return make_etag('post', post_id, updated_at.isoformat(), *values, subscription_active)
+
+
+class MyPostsView(NonAtomicReadsMixin, ValuesListMixin, generics.ListAPIView):
     serializer_class = PostListSerializer
+    values_serializer_class = PostListValuesSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter, DjangoFilterBackend]
     filterset_fields = ['category', 'status']
@@ -104,88 +172,189 @@ class MyPostsView(generics.ListAPIView):
     ordering = ['-created_at']
 
     def get_queryset(self):
-        return Post.objects.filter(author=self.request.user).select_related('author', 'category')
+        return Post.objects.filter(author=self.request.user).with_list_info()
+
 
+# daily sketches fetched per round trip; a sketch is at most 4 KB
+STATS_SKETCH_CHUNK_SIZE = 500
 
+
+def _unique_viewers_per_post(sketches):
+    # streamed in post order and merged one post at a time, so memory doesn't grow with the
+    # number of posts or days in the range
+    rows = sketches.order_by('post').values_list('post', 'sketch').iterator(chunk_size=STATS_SKETCH_CHUNK_SIZE)
+    return {
+        post_id: merged(sketch for _, sketch in post_sketches).count()
+        for post_id, post_sketches in groupby(rows, key=lambda row: row[0])
+    }
+
+
+@non_atomic_reads
 @api_view(['GET'])
-@permission_classes([permissions.AllowAny])
-def post_by_category(request, slug):
-    category = get_object_or_404(Category, slug=slug)
-    posts = Post.objects.with_subscription_info().filter(category=category, status='published')
+@permission_classes([permissions.IsAuthenticated])
+def my_posts_stats(request):
+    """
+    Views, unique viewers, comments and pin impressions of the author's posts per hour or day,
+    and per post over the whole range, read from the analytics rollups. A post's unique viewers
+    over the range come from merging its daily viewer sketches, as the same viewer on several
+    days would be counted again by adding up the daily numbers.
+    """
+    query = PostStatsQuerySerializer(data=request.query_params)
+    query.is_valid(raise_exception=True)
+    query = query.validated_data
+
+    if query['interval'] == 'hour':
+        start = timezone.make_aware(datetime.combine(query['date_from'], time.min))
+        end = timezone.make_aware(datetime.combine(query['date_to'] + timedelta(days=1), time.min))
+        stats = PostHourlyStats.objects.filter(hour__gte=start, hour__lt=end)
+        bucket = 'hour'
+    else:
+        stats = PostDailyStats.objects.filter(day__range=(query['date_from'], query['date_to']))
+        bucket = 'day'
+    sketches = PostViewerSketch.objects.filter(day__range=(query['date_from'], query['date_to']))
+    stats, sketches = stats.filter(post__author=request.user), sketches.filter(post__author=request.user)
+    if 'post' in query:
+        stats, sketches = stats.filter(post_id=query['post']), sketches.filter(post_id=query['post'])
+
+    totals = {field: Sum(field) for field in ('views', 'unique_viewers', 'comments', 'pin_impressions')}
+    series, posts, viewers = run_concurrently(
+        lambda: list(stats.order_by(bucket).values(bucket).annotate(**totals)),
+        lambda: list(stats.order_by().values('post', 'post__slug', 'post__title').annotate(**totals).order_by('-views', 'post')),
+        lambda: _unique_viewers_per_post(sketches),
+    )
+    for row in posts:
+        row['unique_viewers'] = viewers.get(row['post'], 0)
+    return Response({
+        'interval': query['interval'],
+        'date_from': query['date_from'],
+        'date_to': query['date_to'],
+        'series': [{'period': point.pop(bucket), **point} for point in series],
+        'posts': [
+            {
+                'id': row['post'], 'slug': row['post__slug'], 'title': row['post__title'],
+                **{field: row[field] for field in totals},
+            }
+            for row in posts
+        ],
+    })
 
+
+def _posts_by_category_validators(request, slug):
+    category = Category.objects.filter(slug=slug).values_list('id', 'name', 'description').first()
+    if category is None:
+        return None
+    # Counts and latest timestamps only, read off the (category, status, updated_at) index and the
+    # one-to-one pins. No Last-Modified: a post or pin leaving the list advances no timestamp.
+    # Counters such as views are left out as a weak ETag allows, and a pin whose subscription ran
+    # out shows until check_expired_subscriptions removes it.
+    stats = Post.objects.filter(category_id=category[0], status='published').aggregate(
+        posts=Count('id'),
+        last_updated=Max('updated_at'),
+        pins=Count('pin_info'),
+        last_pinned=Max('pin_info__pinned_at'),
+    )
+    return make_etag(request.get_full_path(), *category, *stats.values()), None
+
+
+def _posts_by_category_queryset(category):
     from django.db.models import Case, When, Value, DateTimeField, BooleanField
     from django.utils import timezone
 
-    posts = posts.annotate(
+    return Post.objects.with_subscription_info().filter(category=category, status='published').annotate(
         effective_date=Case(
             When(
                 pin_info__isnull=False,
                 pin_info__user__subscription__status='active',
-                pin_info__user__subscription__end_date=timezone.now(),
+                pin_info__user__subscription__end_date__gt=timezone.now(),
                 then='pin_info__pinned_at'
             ),
             default='created_at',
             output_field=DateTimeField(),
-        )
+        ),
+        is_pinned_flag=Case(
+            When(pin_info__isnull=False, then=Value(True)),
+            default=Value(False),
+            output_field=BooleanField(),
+        ),
     ).order_by('-is_pinned_flag', 'effective_date', '-created_at')
 
-    serializer = PostListSerializer(posts, many=True, context={'request': request})
+
+@non_atomic_reads
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+@conditional_get(_posts_by_category_validators, 'posts_by_category')
+def post_by_category(request, slug):
+    category = get_object_or_404(Category, slug=slug)
+    posts = _posts_by_category_queryset(category)
+
+    data = PostListValuesSerializer.select()(posts, many=True, context={'request': request}).data
+    events.record_pin_impressions(data)
     return Response({
         'category': CategorySerializer(category).data,
-        'posts': serializer.data,
-        'pinned_posts_count': sum(1 for post in serializer.data if post.get('is_pinned', False))
+        'posts': data,
+        'pinned_posts_count': sum(1 for post in data if post.get('is_pinned', False))
     })
 
 
+@non_atomic_reads
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
 def popular_posts(request):
     posts = Post.objects.with_subscription_info().filter(status='published').order_by('-views_count')[:10]
-    serializer = PostListSerializer(posts, many=True, context={'request': request})
+    serializer = PostListValuesSerializer.select()(posts, many=True, context={'request': request})
     return Response(serializer.data)
 
 
+@non_atomic_reads
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
 def recent_posts(request):
     posts = Post.objects.with_subscription_info().filter(status='published').order_by('-created_at')[:10]
-    serializer = PostListSerializer(posts, many=True, context={'request': request})
+    serializer = PostListValuesSerializer.select()(posts, many=True, context={'request': request})
     return Response(serializer.data)
 
 
+@non_atomic_reads
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
 def pinned_posts_only(request):
     posts = Post.objects.pinned_posts()
-    serializer = PostListSerializer(posts, many=True, context={'request': request})
+    data = PostListValuesSerializer.select()(posts, many=True, context={'request': request}).data
+    events.record_pin_impressions(data)
     return Response({
         'count': posts.count(),
-        'results': serializer.data,
+        'results': data,
     })
 
 
+@non_atomic_reads
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
 def featured_posts(request):
     from django.utils import timezone
     from datetime import timedelta
-    pinned_posts = Post.objects.pinned_posts()[:3]
-
     week_ago = timezone.now() - timedelta(days=7)
+    serializer_class = PostListValuesSerializer.select()
+    context = {'request': request}
+    pinned_posts = Post.objects.pinned_posts()
     popular_posts = Post.objects.with_subscription_info().filter(
         status='published',
         created_at__gte=week_ago
-    ).exclude(
-        id__in=[post.id for post in pinned_posts]
-    ).order_by('-views_count')[:6]
+    ).order_by('-views_count')
 
-    pinned_serializer = PostListSerializer(pinned_posts, many=True, context={'request': request})
-    popular_serializer = PostListSerializer(popular_posts, many=True, context={'request': request})
+    # Over-fetch popular posts instead of excluding the pinned ids so all three reads run at once.
+    pinned_data, popular_data, total_count = run_concurrently(
+        lambda: serializer_class(pinned_posts[:3], many=True, context=context).data,
+        lambda: serializer_class(popular_posts[:9], many=True, context=context).data,
+        pinned_posts.count,
+    )
+    pinned_ids = {post['id'] for post in pinned_data}
+    events.record_pin_impressions(pinned_data)
 
     return Response({
-        'pinned_posts': pinned_serializer.data,
-        'popular_posts': popular_serializer.data,
-        'total_count': Post.objects.pinned_posts().count()
+        'pinned_posts': pinned_data,
+        'popular_posts': [post for post in popular_data if post['id'] not in pinned_ids][:6],
+        'total_count': total_count
     })
 
 
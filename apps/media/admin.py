@@ -0,0 +1,14 @@
+from django.contrib import admin
+
+from .models import MediaBlob
+
+
+@admin.register(MediaBlob)
+class MediaBlobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'ref_count', 'rendition_error', 'created_at', 'updated_at')
+    list_filter = ('created_at',)
+    search_fields = ('name',)
+    readonly_fields = ('name', 'ref_count', 'rendition_error', 'created_at', 'updated_at')
+
+    def has_add_permission(self, request):
+        return False
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 01:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mediablob',
+            name='rendition_error',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+    ]
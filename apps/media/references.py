@@ -0,0 +1,27 @@
+from django.apps import apps
+from django.db.models import Count, F
+from django.db.models.functions import Now
+
+from .models import MediaBlob
+from .renditions import RENDITION_FIELDS
+
+
+def add_reference(name):
+    MediaBlob.objects.bulk_create([MediaBlob(name=name)], ignore_conflicts=True)
+    MediaBlob.objects.filter(name=name).update(ref_count=F('ref_count') + 1, updated_at=Now())
+
+
+def release_reference(name):
+    MediaBlob.objects.filter(name=name).update(ref_count=F('ref_count') - 1, updated_at=Now())
+
+
+def count_references(names):
+    counts = dict.fromkeys(names, 0)
+    for label, (field_name, _) in RENDITION_FIELDS.items():
+        rows = (
+            apps.get_model(label).objects.filter(**{f'{field_name}__in': names})
+            .order_by().values(field_name).annotate(total=Count('pk')).values_list(field_name, 'total')
+        )
+        for name, total in rows:
+            counts[name] += total
+    return counts
@@ -0,0 +1,78 @@
+import posixpath
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from .storage import is_content_addressed
+
+# Largest first: each rendition is downscaled from the previous one.
+RENDITION_SIZES = {
+    'full': (1600, 1600),
+    'card': (640, 400),
+    'thumbnail': (160, 160),
+}
+
+RENDITION_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+# Image fields that get renditions, mapped to the JSONField holding the rendition names.
+RENDITION_FIELDS = {
+    'main.Post': ('image', 'image_renditions'),
+    'accounts.User': ('avatar', 'avatar_renditions'),
+}
+
+
+def rendition_name(name, size, extension):
+    directory, filename = posixpath.split(name)
+    stem = posixpath.splitext(filename)[0]
+    return posixpath.join(directory, 'renditions', stem, f'{size}.{extension}')
+
+
+def generate_renditions(name, storage=default_storage):
+    # The source is streamed from storage and JPEGs are decoded at reduced scale, so only the
+    # downscaled pixels are held in memory. Re-encoding without exif/icc_profile strips metadata.
+    renditions = {
+        size: {extension: rendition_name(name, size, extension) for extension in RENDITION_FORMATS}
+        for size in RENDITION_SIZES
+    }
+    # Renditions of content-addressed files are shared between every upload of the same bytes.
+    if is_content_addressed(name) and all(
+        storage.exists(target) for names in renditions.values() for target in names.values()
+    ):
+        return renditions
+
+    largest = max(RENDITION_SIZES.values())
+
+    with storage.open(name, 'rb') as source, Image.open(source) as original:
+        original.draft('RGB', largest)
+        image = ImageOps.exif_transpose(original).convert('RGB')
+
+        for size, box in RENDITION_SIZES.items():
+            image.thumbnail(box, Image.Resampling.LANCZOS)
+            for extension, (image_format, options) in RENDITION_FORMATS.items():
+                buffer = BytesIO()
+                image.save(buffer, image_format, **options)
+                target = renditions[size][extension]
+                if storage.exists(target):
+                    storage.delete(target)
+                renditions[size][extension] = storage.save(target, ContentFile(buffer.getvalue()))
+
+    return renditions
+
+
+def rendition_urls(renditions, storage=default_storage, request=None):
+    if not renditions:
+        return None
+
+    def build_url(name):
+        url = storage.url(name)
+        return request.build_absolute_uri(url) if request is not None else url
+
+    return {
+        size: {extension: build_url(name) for extension, name in names.items()}
+        for size, names in renditions.items()
+    }
@@ -0,0 +1,57 @@
+from django.apps import apps
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+
+from .references import add_reference, release_reference
+from .renditions import RENDITION_FIELDS
+from .tasks import generate_image_renditions
+
+
+def image_pre_save(sender, instance, **kwargs):
+    field_name, renditions_field = RENDITION_FIELDS[sender._meta.label]
+    if field_name not in instance.__dict__:
+        return
+
+    image = getattr(instance, field_name)
+    # FieldFile.save() stores the new file before saving the instance, so a new name counts as new too
+    replaced = image and image.name != getattr(instance, f'_loaded_{field_name}', image.name)
+    if image and (not image._committed or replaced):
+        setattr(instance, renditions_field, {})
+        instance._renditions_pending = True
+    elif not image and getattr(instance, renditions_field):
+        setattr(instance, renditions_field, {})
+
+
+def image_post_save(sender, instance, created, **kwargs):
+    field_name, _ = RENDITION_FIELDS[sender._meta.label]
+    loaded_attr = f'_loaded_{field_name}'
+
+    # Instances loaded with the file field deferred have no known previous name; skip them.
+    if created or hasattr(instance, loaded_attr):
+        previous_name = None if created else getattr(instance, loaded_attr)
+        current_name = getattr(instance, field_name).name or None
+        if current_name != previous_name:
+            if current_name:
+                add_reference(current_name)
+            if previous_name:
+                release_reference(previous_name)
+        setattr(instance, loaded_attr, current_name)
+
+    if getattr(instance, '_renditions_pending', False):
+        instance._renditions_pending = False
+        model_label, pk = sender._meta.label, instance.pk
+        transaction.on_commit(lambda: generate_image_renditions.delay(model_label, pk))
+
+
+def image_post_delete(sender, instance, **kwargs):
+    field_name, _ = RENDITION_FIELDS[sender._meta.label]
+    name = getattr(instance, field_name).name
+    if name:
+        release_reference(name)
+
+
+for label in RENDITION_FIELDS:
+    model = apps.get_model(label)
+    pre_save.connect(image_pre_save, sender=model, dispatch_uid=f'media_pre_save_{label}')
+    post_save.connect(image_post_save, sender=model, dispatch_uid=f'media_post_save_{label}')
+    post_delete.connect(image_post_delete, sender=model, dispatch_uid=f'media_post_delete_{label}')
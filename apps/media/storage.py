@@ -0,0 +1,94 @@
+import hashlib
+import posixpath
+import re
+
+from django.core.files.storage import FileSystemStorage
+from django.db import models
+from django.db.models.fields.files import ImageFieldFile
+from django.db.models.functions import Now
+from django.utils.deconstruct import deconstructible
+
+from .models import MediaBlob
+
+CONTENT_ADDRESSED_NAME = re.compile(r'(^|/)[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}(\.\w+)?$')
+CONTENT_ADDRESSED_RENDITION = re.compile(r'(^|/)[0-9a-f]{2}/[0-9a-f]{2}/renditions/[0-9a-f]{64}/\w+\.\w+$')
+
+
+def is_content_addressed(name):
+    return bool(name and CONTENT_ADDRESSED_NAME.search(name))
+
+
+def is_immutable(name):
+    # Content-addressed originals and the renditions derived from them never change under the same name.
+    return is_content_addressed(name) or bool(name and CONTENT_ADDRESSED_RENDITION.search(name))
+
+
+def file_content_hash(file):
+    content_hash = getattr(file, 'content_hash', None)
+    if content_hash is None:
+        hasher = hashlib.sha256()
+        for chunk in file.chunks():
+            hasher.update(chunk)
+        content_hash = hasher.hexdigest()
+    return content_hash
+
+
+@deconstructible
+class ContentAddressedPath:
+    """
+    ``upload_to`` of a ContentAddressedImageField that names a file after the SHA-256 of the content
+    being saved: ``<prefix>/ab/cd/<hash>.<ext>``.
+    """
+
+    def __init__(self, prefix, field_name):
+        self.prefix = prefix
+        self.field_name = field_name
+
+    def __call__(self, instance, filename):
+        content_hash = getattr(instance, self.field_name).saving_hash
+        if content_hash is None:
+            raise ValueError(f'{self.field_name} must be a ContentAddressedImageField to get a content-addressed name')
+        extension = posixpath.splitext(filename)[1].lower()
+        if not re.fullmatch(r'\.\w{1,10}', extension):
+            extension = ''
+        return posixpath.join(self.prefix, content_hash[:2], content_hash[2:4], f'{content_hash}{extension}')
+
+    def __eq__(self, other):
+        return isinstance(other, ContentAddressedPath) and (self.prefix, self.field_name) == (other.prefix, other.field_name)
+
+
+class ContentAddressedImageFieldFile(ImageFieldFile):
+    # the hash of the content save() is storing, for upload_to which is only given the file name
+    saving_hash = None
+
+    def save(self, name, content, save=True):
+        self.saving_hash = file_content_hash(content)
+        try:
+            super().save(name, content, save)
+        finally:
+            self.saving_hash = None
+
+
+class ContentAddressedImageField(models.ImageField):
+    attr_class = ContentAddressedImageFieldFile
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File system storage that keeps a single copy of content-addressed files: saving a name that
+    already exists is a no-op instead of writing a renamed duplicate.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        if is_content_addressed(name):
+            return name
+        return super().get_available_name(name, max_length)
+
+    def _save(self, name, content):
+        if is_content_addressed(name):
+            # Touching the blob row waits for a collector that claimed it to delete the copy, and
+            # keeps later collections away from it for their grace period.
+            MediaBlob.objects.filter(name=name).update(updated_at=Now())
+            if self.exists(name):
+                return name
+        return super()._save(name, content)
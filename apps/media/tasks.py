@@ -0,0 +1,103 @@
+import logging
+from datetime import timedelta
+
+from celery import shared_task
+from django.apps import apps
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image, UnidentifiedImageError
+
+from .models import MediaBlob
+from .references import count_references
+from .renditions import RENDITION_FIELDS, RENDITION_FORMATS, RENDITION_SIZES, generate_renditions, rendition_name
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def generate_image_renditions(model_label, pk):
+    field_name, renditions_field = RENDITION_FIELDS[model_label]
+    model = apps.get_model(model_label)
+
+    instance = model.objects.filter(pk=pk).only('pk', field_name).first()
+    if instance is None:
+        return {'renditions': 0}
+
+    image = getattr(instance, field_name)
+    if not image:
+        return {'renditions': 0}
+
+    blob = MediaBlob.objects.filter(name=image.name)
+    if blob.exclude(rendition_error='').exists():
+        return {'renditions': 0}
+
+    try:
+        renditions = generate_renditions(image.name, storage=image.storage)
+    except (Image.DecompressionBombError, UnidentifiedImageError) as e:
+        # not an image we can open, and never will be: give up on the file rather than retry it
+        logger.warning(f'Not generating renditions for {model_label} {pk}: {e}')
+        blob.update(rendition_error=str(e)[:255])
+        return {'renditions': 0}
+    except (OSError, ValueError) as e:
+        logger.error(f'Error generating renditions for {model_label} {pk}: {e}')
+        return {'renditions': 0}
+
+    # Only attach the renditions if the image was not replaced while we were working. They change
+    # what the row renders, so they advance updated_at, which ETags are derived from.
+    model.objects.filter(pk=pk, **{field_name: image.name}).update(**{renditions_field: renditions, 'updated_at': timezone.now()})
+    return {'renditions': sum(len(formats) for formats in renditions.values())}
+
+
+@shared_task
+def collect_unreferenced_media(batch_size=500, grace_hours=24):
+    """
+    Delete the files of blobs no longer referenced for ``grace_hours``, with their renditions.
+
+    Each batch is claimed with its rows locked, and the files go before the transaction commits:
+    an upload of the same bytes touches the blob row before it reuses a stored copy, so it either
+    keeps the collector off that row or waits until the copy is gone and stores it again.
+    """
+    cutoff = timezone.now() - timedelta(hours=grace_hours)
+    deleted_count = 0
+    repaired_count = 0
+
+    while True:
+        with transaction.atomic():
+            # rows an upload or a reference is changing right now are locked by it and skipped
+            blobs = list(
+                MediaBlob.objects.select_for_update(skip_locked=True)
+                .filter(ref_count__lte=0, updated_at__lt=cutoff).order_by('pk')[:batch_size]
+            )
+            if not blobs:
+                break
+
+            # Counters can drift through queryset.update(); never delete a file that is still referenced.
+            references = count_references([blob.name for blob in blobs])
+            referenced = [blob for blob in blobs if references[blob.name]]
+            for blob in referenced:
+                blob.ref_count = references[blob.name]
+            MediaBlob.objects.bulk_update(referenced, ['ref_count'])
+            repaired_count += len(referenced)
+
+            orphans = MediaBlob.objects.filter(
+                pk__in=[blob.pk for blob in blobs if not references[blob.name]], ref_count__lte=0,
+            )
+            deleted = list(orphans.values_list('name', flat=True))
+            orphans.filter(name__in=deleted).delete()
+            for blob_name in deleted:
+                names = [blob_name] + [
+                    rendition_name(blob_name, size, extension)
+                    for size in RENDITION_SIZES for extension in RENDITION_FORMATS
+                ]
+                for name in names:
+                    try:
+                        default_storage.delete(name)
+                    except OSError as e:
+                        logger.error(f'Error deleting media file {name}: {e}')
+            deleted_count += len(deleted)
+
+    return {
+        'deleted_blobs': deleted_count,
+        'repaired_blobs': repaired_count,
+    }
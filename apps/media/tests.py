@@ -0,0 +1,208 @@
+import hashlib
+import os
+import tempfile
+from datetime import timedelta
+from io import BytesIO
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import InMemoryUploadedFile, SimpleUploadedFile, TemporaryUploadedFile
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+
+from apps.accounts.models import User
+from apps.core.testing import make_user
+
+from .models import MediaBlob
+from .renditions import rendition_name
+from .tasks import collect_unreferenced_media, generate_image_renditions
+from .uploadhandlers import HashingUploadHandler, UploadTooLarge
+
+
+def sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def content_addressed(prefix, data, extension):
+    digest = sha256(data)
+    return f'{prefix}/{digest[:2]}/{digest[2:4]}/{digest}{extension}'
+
+
+def png(color='red', size=(8, 8)):
+    buffer = BytesIO()
+    Image.new('RGB', size, color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+class TemporaryMediaMixin:
+    def setUp(self):
+        super().setUp()
+        self.media_root = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(MEDIA_ROOT=self.media_root))
+
+    def stored_files(self):
+        return sorted(
+            os.path.relpath(os.path.join(directory, name), self.media_root)
+            for directory, _, names in os.walk(self.media_root) for name in names
+        )
+
+
+@mock.patch.object(generate_image_renditions, 'delay')
+class ContentAddressedFileTests(TemporaryMediaMixin, TestCase):
+    def test_saving_into_an_empty_field(self, delay):
+        user = make_user()
+        with self.captureOnCommitCallbacks(execute=True):
+            user.avatar.save('Me.PNG', ContentFile(b'first'))
+
+        self.assertEqual(user.avatar.name, content_addressed('avatars', b'first', '.png'))
+        with default_storage.open(user.avatar.name) as stored:
+            self.assertEqual(stored.read(), b'first')
+        self.assertEqual(MediaBlob.objects.get(name=user.avatar.name).ref_count, 1)
+        delay.assert_called_once_with('accounts.User', user.pk)
+
+    def test_replacing_the_content(self, delay):
+        user = make_user()
+        user.avatar.save('a.png', ContentFile(b'first'))
+        first = user.avatar.name
+        user.avatar_renditions = {'card': {'webp': 'stale.webp'}}
+        user.save()
+
+        user.refresh_from_db()
+        with self.captureOnCommitCallbacks(execute=True):
+            user.avatar.save('b.png', ContentFile(b'second'))
+
+        user.refresh_from_db()
+        self.assertEqual(user.avatar.name, content_addressed('avatars', b'second', '.png'))
+        with default_storage.open(user.avatar.name) as stored:
+            self.assertEqual(stored.read(), b'second')
+        self.assertEqual(user.avatar_renditions, {})
+        self.assertEqual(dict(MediaBlob.objects.values_list('name', 'ref_count')), {first: 0, user.avatar.name: 1})
+        delay.assert_called_once_with('accounts.User', user.pk)
+
+    def test_assigned_upload(self, delay):
+        user = make_user()
+        user.avatar = SimpleUploadedFile('photo.jpeg', b'bytes')
+        user.save()
+        self.assertEqual(user.avatar.name, content_addressed('avatars', b'bytes', '.jpeg'))
+
+
+class RenditionFailureTests(TemporaryMediaMixin, TestCase):
+    def generate(self, data):
+        user = make_user()
+        user.avatar.save('photo.png', ContentFile(data))
+        return generate_image_renditions('accounts.User', user.pk), MediaBlob.objects.get(name=user.avatar.name), user
+
+    def test_files_that_are_not_images_are_given_up(self):
+        with self.assertLogs('apps.media.tasks', 'WARNING'):
+            result, blob, user = self.generate(b'not an image')
+        self.assertEqual(result, {'renditions': 0})
+        self.assertIn('cannot identify image file', blob.rendition_error)
+
+        # the same bytes are not tried again
+        with mock.patch('apps.media.tasks.generate_renditions') as generate:
+            self.assertEqual(generate_image_renditions('accounts.User', user.pk), {'renditions': 0})
+        generate.assert_not_called()
+
+    @mock.patch.object(Image, 'MAX_IMAGE_PIXELS', 10)
+    def test_decompression_bombs_are_given_up(self):
+        with self.assertLogs('apps.media.tasks', 'WARNING'):
+            result, blob, user = self.generate(png(size=(8, 8)))
+        self.assertEqual(result, {'renditions': 0})
+        self.assertIn('decompression bomb', blob.rendition_error)
+        self.assertEqual(User.objects.get(pk=user.pk).avatar_renditions, {})
+
+
+class HashingUploadHandlerTests(SimpleTestCase):
+    def upload(self, data, field_name='avatar', content_length=None, chunk_size=4):
+        handler = HashingUploadHandler()
+        handler.new_file(field_name, 'photo.png', 'image/png', content_length)
+        for start in range(0, len(data), chunk_size):
+            handler.receive_data_chunk(data[start:start + chunk_size], start)
+        return handler.file_complete(len(data))
+
+    @override_settings(FILE_UPLOAD_MAX_MEMORY_SIZE=16)
+    def test_small_uploads_stay_in_memory(self):
+        uploaded = self.upload(b'0123456789')
+        self.assertIsInstance(uploaded, InMemoryUploadedFile)
+        self.assertEqual((uploaded.read(), uploaded.size), (b'0123456789', 10))
+        self.assertEqual(uploaded.content_hash, sha256(b'0123456789'))
+
+    @override_settings(FILE_UPLOAD_MAX_MEMORY_SIZE=16)
+    def test_large_uploads_spool_to_disk(self):
+        data = bytes(range(40))
+        uploaded = self.upload(data)
+        self.addCleanup(uploaded.close)
+        self.assertIsInstance(uploaded, TemporaryUploadedFile)
+        self.assertEqual((uploaded.read(), uploaded.size), (data, 40))
+        self.assertEqual(uploaded.content_hash, sha256(data))
+
+    @override_settings(MEDIA_UPLOAD_MAX_SIZES={'avatar': 8})
+    def test_size_limit_per_field(self):
+        with self.assertRaises(UploadTooLarge):
+            self.upload(b'x' * 9)
+        with self.assertRaises(UploadTooLarge):
+            self.upload(b'', content_length=9)
+        # other fields fall back to MEDIA_UPLOAD_DEFAULT_MAX_SIZE
+        self.assertEqual(self.upload(b'x' * 9, field_name='image').size, 9)
+
+
+@mock.patch.object(generate_image_renditions, 'delay')
+class UploadDeduplicationTests(TemporaryMediaMixin, TestCase):
+    def test_same_upload_is_stored_once(self, delay):
+        data = png()
+        names = []
+        for user in (make_user(), make_user()):
+            client = APIClient()
+            client.force_authenticate(user)
+            response = client.patch(reverse('profile'), {'avatar': SimpleUploadedFile('me.png', data, 'image/png')}, format='multipart')
+            self.assertEqual(response.status_code, 200, response.data)
+            user.refresh_from_db()
+            names.append(user.avatar.name)
+
+        self.assertEqual(names, [content_addressed('avatars', data, '.png')] * 2)
+        self.assertEqual(self.stored_files(), [names[0]])
+        self.assertEqual(MediaBlob.objects.get(name=names[0]).ref_count, 2)
+
+
+class CollectUnreferencedMediaTests(TemporaryMediaMixin, TestCase):
+    def store(self, data, age=timedelta(days=2)):
+        name = default_storage.save(content_addressed('avatars', data, '.png'), ContentFile(data))
+        for size in ('full', 'thumbnail'):
+            default_storage.save(rendition_name(name, size, 'webp'), ContentFile(data))
+        MediaBlob.objects.create(name=name)
+        MediaBlob.objects.filter(name=name).update(updated_at=timezone.now() - age)
+        return name
+
+    def test_only_orphaned_blobs_are_removed(self):
+        orphan = self.store(b'orphan')
+        # the counter drifted to 0 while a user still points at the file
+        referenced = self.store(b'referenced')
+        User.objects.filter(pk=make_user().pk).update(avatar=referenced)
+        recent = self.store(b'recent', age=timedelta(hours=1))
+        untracked = default_storage.save('avatars/untracked.png', ContentFile(b'untracked'))
+
+        self.assertEqual(collect_unreferenced_media(batch_size=1), {'deleted_blobs': 1, 'repaired_blobs': 1})
+
+        self.assertEqual(dict(MediaBlob.objects.values_list('name', 'ref_count')), {referenced: 1, recent: 0})
+        self.assertEqual(self.stored_files(), sorted([untracked] + [
+            name for blob in (referenced, recent)
+            for name in [blob, rendition_name(blob, 'full', 'webp'), rendition_name(blob, 'thumbnail', 'webp')]
+        ]))
+        self.assertFalse(default_storage.exists(orphan))
+
+    def test_reused_copies_are_kept_or_stored_again(self):
+        kept = self.store(b'uploaded again')
+        # the upload reuses the stored copy, which puts it back at the start of the grace period
+        self.assertEqual(default_storage.save(kept, ContentFile(b'uploaded again')), kept)
+        collected = self.store(b'collected')
+
+        self.assertEqual(collect_unreferenced_media(), {'deleted_blobs': 1, 'repaired_blobs': 0})
+        self.assertTrue(default_storage.exists(kept))
+        self.assertFalse(default_storage.exists(collected))
+
+        self.assertEqual(default_storage.save(collected, ContentFile(b'collected')), collected)
+        self.assertTrue(default_storage.exists(collected))
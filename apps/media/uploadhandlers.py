@@ -0,0 +1,71 @@
+import hashlib
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import InMemoryUploadedFile, TemporaryUploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+from django.http.multipartparser import MultiPartParserError
+
+
+class UploadTooLarge(MultiPartParserError):
+    pass
+
+
+def max_upload_size(field_name):
+    return settings.MEDIA_UPLOAD_MAX_SIZES.get(field_name, settings.MEDIA_UPLOAD_DEFAULT_MAX_SIZE)
+
+
+class HashingUploadHandler(FileUploadHandler):
+    """
+    Stream each uploaded file into memory up to FILE_UPLOAD_MAX_MEMORY_SIZE and into a temporary
+    file beyond that, hashing the bytes as they arrive and rejecting a field as soon as it grows past
+    its MEDIA_UPLOAD_MAX_SIZES limit. The resulting file carries a ``content_hash`` attribute.
+    """
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        largest = max([settings.MEDIA_UPLOAD_DEFAULT_MAX_SIZE, *settings.MEDIA_UPLOAD_MAX_SIZES.values()])
+        if content_length and content_length > largest + (settings.DATA_UPLOAD_MAX_MEMORY_SIZE or 0):
+            raise UploadTooLarge(f'Request body exceeds the maximum upload size of {largest} bytes')
+
+    def new_file(self, field_name, file_name, content_type, content_length, charset=None, content_type_extra=None):
+        super().new_file(field_name, file_name, content_type, content_length, charset, content_type_extra)
+        self.max_size = max_upload_size(field_name)
+        if content_length and content_length > self.max_size:
+            raise UploadTooLarge(f'{field_name} exceeds the maximum size of {self.max_size} bytes')
+
+        self.hasher = hashlib.sha256()
+        self.buffer = BytesIO()
+        self.file = None
+        self.size = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.size += len(raw_data)
+        if self.size > self.max_size:
+            raise UploadTooLarge(f'{self.field_name} exceeds the maximum size of {self.max_size} bytes')
+
+        self.hasher.update(raw_data)
+        if self.file is None and self.size > settings.FILE_UPLOAD_MAX_MEMORY_SIZE:
+            self.file = TemporaryUploadedFile(self.file_name, self.content_type, 0, self.charset, self.content_type_extra)
+            self.file.write(self.buffer.getvalue())
+            self.buffer = None
+
+        if self.file is not None:
+            self.file.write(raw_data)
+        else:
+            self.buffer.write(raw_data)
+
+    def file_complete(self, file_size):
+        if self.file is not None:
+            uploaded = self.file
+            uploaded.size = file_size
+        else:
+            uploaded = InMemoryUploadedFile(
+                self.buffer, self.field_name, self.file_name, self.content_type, file_size, self.charset, self.content_type_extra
+            )
+        uploaded.seek(0)
+        uploaded.content_hash = self.hasher.hexdigest()
+        return uploaded
+
+    def upload_interrupted(self):
+        if getattr(self, 'file', None) is not None:
+            self.file.close()
@@ -1,3 +1,58 @@
 from django.contrib import admin
 
-# Register your models here.
+from apps.core.admin import ExportAdminMixin, LargeTableAdmin
+
+from .models import Payment, Refund
+
+
+@admin.register(Payment)
+class PaymentAdmin(ExportAdminMixin, LargeTableAdmin):
+    list_display = ('id', 'user', 'amount', 'currency', 'status', 'payment_method', 'created_at', 'processed_at')
+    list_filter = ('status', 'payment_method', 'created_at')
+    date_hierarchy = 'created_at'
+    search_fields = ('=stripe_session_id', '=stripe_payment_intent_id', '=user__email')
+    readonly_fields = ('created_at', 'updated_at', 'processed_at')
+    raw_id_fields = ('user', 'subscription')
+    export_fields = (
+        'id', 'user_id', 'user__email', 'subscription_id', 'amount', 'currency', 'status', 'payment_method',
+        'stripe_session_id', 'stripe_payment_intent_id', 'stripe_customer_id', 'description', 'metadata',
+        'created_at', 'processed_at',
+    )
+
+    fieldsets = (
+        (None, {
+            'fields': ('user', 'subscription', 'amount', 'currency', 'status', 'payment_method', 'description')
+        }),
+        ('Stripe', {
+            'fields': ('stripe_session_id', 'stripe_payment_intent_id', 'stripe_customer_id'),
+            'classes': ('collapse',),
+        }),
+        ('Metadata', {
+            'fields': ('metadata',),
+            'classes': ('collapse',),
+        }),
+        ('Timestamps', {
+            'fields': ('created_at', 'updated_at', 'processed_at'),
+            'classes': ('collapse',),
+        }),
+    )
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('user')
+
+
+@admin.register(Refund)
+class RefundAdmin(ExportAdminMixin, LargeTableAdmin):
+    list_display = ('id', 'payment', 'amount', 'status', 'created_by', 'created_at', 'processed_at')
+    list_filter = ('status', 'created_at')
+    date_hierarchy = 'created_at'
+    search_fields = ('=stripe_refund_id', '=payment__user__email')
+    readonly_fields = ('created_at', 'processed_at')
+    raw_id_fields = ('payment', 'created_by')
+    export_fields = (
+        'id', 'payment_id', 'payment__user__email', 'amount', 'payment__currency', 'status', 'reason',
+        'stripe_refund_id', 'created_by__email', 'created_at', 'processed_at',
+    )
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('payment__user', 'created_by')
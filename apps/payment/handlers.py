@@ -0,0 +1,26 @@
+from apps.core.outbox import outbox_handler
+
+from .models import Payment
+from .services import PaymentService
+
+
+def _pending_subscription_payment(payment_id):
+    # PaymentService settles the subscription itself when it is the one changing the payment; this
+    # catches payments settled any other way, e.g. from the admin
+    return Payment.objects.select_related('subscription__plan').filter(
+        pk=payment_id, subscription__status='pending',
+    ).first()
+
+
+@outbox_handler('payment.succeeded')
+def activate_paid_subscription(payment_id):
+    payment = _pending_subscription_payment(payment_id)
+    if payment is not None:
+        PaymentService.activate_subscription(payment)
+
+
+@outbox_handler('payment.failed')
+def cancel_unpaid_subscription(payment_id):
+    payment = _pending_subscription_payment(payment_id)
+    if payment is not None:
+        PaymentService.cancel_unpaid_subscription(payment, payment.metadata.get('failure_reason', ''))
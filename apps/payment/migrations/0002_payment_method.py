@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 23:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payment', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='payment_method',
+            field=models.CharField(choices=[('stripe', 'Stripe'), ('paypal', 'Paypal'), ('manual', 'Manual')], default='stripe', max_length=20),
+        ),
+    ]
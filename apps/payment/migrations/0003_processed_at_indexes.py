@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-19 00:25
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payment', '0002_payment_method'),
+        ('subscribe', '0002_subscriptionhistory_created_at_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['processed_at'], name='payments_process_8f5388_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='refund',
+            index=models.Index(fields=['processed_at'], name='refunds_process_445f6f_idx'),
+        ),
+    ]
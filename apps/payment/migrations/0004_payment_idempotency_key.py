@@ -0,0 +1,25 @@
+# Generated by Django 5.2.7 on 2026-10-19 00:45
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payment', '0003_processed_at_indexes'),
+        ('subscribe', '0002_subscriptionhistory_created_at_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='idempotency_key',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='payment',
+            constraint=models.UniqueConstraint(fields=('user', 'idempotency_key'), name='payment_idempotency_key_unique'),
+        ),
+    ]
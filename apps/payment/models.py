@@ -1,11 +1,14 @@
+import time
+
 from django.db import models
 from django.conf import settings
 from decimal import Decimal
 
+from apps.core.models import TracksStatusMixin
 from apps.subscribe.models import Subscription
 
 
-class Payment(models.Model):
+class Payment(TracksStatusMixin, models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
         ('processing', 'Processing'),
@@ -27,10 +30,13 @@ class Payment(models.Model):
     amount = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
     currency = models.CharField(max_length=3, default='USD')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    payment_method = models.CharField(max_length=20, choices=PAYMENT_METHOD_CHOICES, default='stripe')
 
     stripe_payment_intent_id = models.CharField(max_length=255, null=True, blank=True)
     stripe_session_id = models.CharField(max_length=255, null=True, blank=True)
     stripe_customer_id = models.CharField(max_length=255, null=True, blank=True)
+    # the client's Idempotency-Key header of the checkout that created the payment
+    idempotency_key = models.CharField(max_length=255, null=True, blank=True)
 
     description = models.TextField(blank=True)
     metadata = models.JSONField(default=dict, blank=True)
@@ -49,6 +55,10 @@ class Payment(models.Model):
             models.Index(fields=['stripe_payment_intent_id']),
             models.Index(fields=['stripe_session_id']),
             models.Index(fields=['created_at']),
+            models.Index(fields=['processed_at']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'idempotency_key'], name='payment_idempotency_key_unique'),
         ]
 
     def __str__(self):
@@ -66,6 +76,16 @@ class Payment(models.Model):
     def can_be_refunded(self):
         return self.status == 'succeeded' and self.payment_method == 'stripe'
 
+    def open_checkout_session(self):
+        """The checkout response that created this payment, while its Stripe session can still be paid."""
+        checkout_url = self.metadata.get('checkout_url')
+        if not self.is_pending or not self.stripe_session_id or not checkout_url:
+            return None
+        expires_at = self.metadata.get('session_expires_at')
+        if expires_at and expires_at <= time.time():
+            return None
+        return {'checkout_url': checkout_url, 'session_id': self.stripe_session_id, 'payment_id': self.pk}
+
     def mark_as_succeeded(self):
         from django.utils import timezone
         self.status = 'succeeded'
@@ -127,6 +147,9 @@ class Refund(models.Model):
         verbose_name = 'Refund'
         verbose_name_plural = 'Refunds'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['processed_at']),
+        ]
 
     def __str__(self):
         return f'Refund {self.id} - ${self.amount} for Payment ({self.payment.id})'
@@ -1,9 +1,11 @@
 from rest_framework import serializers
 from decimal import Decimal
+from django.db.models import Sum
+from apps.core.serialization import ModelSerializer, Serializer, ValuesSerializer, field_representation
 from .models import Payment, PaymentAttempt, Refund, WebhookEvent
 
 
-class PaymentSerializer(serializers.ModelSerializer):
+class PaymentSerializer(ModelSerializer):
     user_info = serializers.SerializerMethodField()
     subscription_info = serializers.SerializerMethodField()
     is_successful = serializers.ReadOnlyField()
@@ -40,9 +42,58 @@ class PaymentSerializer(serializers.ModelSerializer):
         return None
 
 
-class PaymentCreateSerializer(serializers.Serializer):
+class PaymentValuesSerializer(ValuesSerializer):
+    model_serializer_class = PaymentSerializer
+    values = (
+        'id', 'user', 'user__username', 'user__email', 'subscription', 'subscription__plan__name', 'subscription__start_date',
+        'subscription__end_date', 'subscription__status', 'amount', 'currency', 'status', 'payment_method', 'description',
+        'created_at', 'updated_at', 'processed_at',
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.format_amount = field_representation(PaymentSerializer, 'amount')
+        self.format_datetime = field_representation(PaymentSerializer, 'created_at')
+
+    def to_representation(self, row):
+        subscription_info = None
+        if row['subscription'] is not None:
+            subscription_info = {
+                'id': row['subscription'],
+                'plan_name': row['subscription__plan__name'],
+                'start_date': row['subscription__start_date'],
+                'end_date': row['subscription__end_date'],
+                'status': row['subscription__status'],
+            }
+        processed_at = row['processed_at']
+
+        return {
+            'id': row['id'],
+            'user': row['user'],
+            'user_info': {
+                'id': row['user'],
+                'username': row['user__username'],
+                'email': row['user__email'],
+            },
+            'subscription': row['subscription'],
+            'subscription_info': subscription_info,
+            'amount': self.format_amount(row['amount']),
+            'currency': row['currency'],
+            'status': row['status'],
+            'payment_method': row['payment_method'],
+            'description': row['description'],
+            'is_successful': row['status'] == 'succeeded',
+            'is_pending': row['status'] in ['pending', 'processing'],
+            'can_be_refunded': row['status'] == 'succeeded' and row['payment_method'] == 'stripe',
+            'created_at': self.format_datetime(row['created_at']),
+            'updated_at': self.format_datetime(row['updated_at']),
+            'processed_at': self.format_datetime(processed_at) if processed_at is not None else None,
+        }
+
+
+class PaymentCreateSerializer(Serializer):
     subscription_plan_id = serializers.IntegerField()
-    payment_method = serializers.CharField(
+    payment_method = serializers.ChoiceField(
         choices=Payment.PAYMENT_METHOD_CHOICES,
         default='stripe'
     )
@@ -67,19 +118,11 @@ class PaymentCreateSerializer(serializers.Serializer):
                 'non_field_error': ['This field is required.']
             })
 
-        pending_payments = Payment.objects.filter(
-            user=user,
-            status__in=['pending', 'processing']
-        ).exists()
-        if pending_payments:
-            raise serializers.ValidationError({
-                'non_field_error': ['User has pending payments.']
-            })
-
+        # pending payments are looked at by the view, under a lock on the user
         return attrs
 
 
-class PaymentAttemptSerializer(serializers.ModelSerializer):
+class PaymentAttemptSerializer(ModelSerializer):
     class Meta:
         model = PaymentAttempt
         fields = [
@@ -88,7 +131,7 @@ class PaymentAttemptSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
 
 
-class RefundSerializer(serializers.ModelSerializer):
+class RefundSerializer(ModelSerializer):
     payment_info = serializers.SerializerMethodField()
     created_by_info = serializers.SerializerMethodField()
     is_partials = serializers.ReadOnlyField()
@@ -123,31 +166,10 @@ class RefundSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError('Refund amount must be greater than zero')
         return value
 
-    # common validation for refunds
-    def validate(self, attrs):
-        payment_id = self.context.get('payment_id')
-        if payment_id:
-            try:
-                payment = Payment.objects.get(id=payment_id)
-            except Payment.DoesNotExist:
-                raise serializers.ValidationError('Payment does not exist')
 
-            if not payment.can_be_refunded:
-                raise serializers.ValidationError('This payment is not refunded')
+class RefundCreateSerializer(ModelSerializer):
+    """Expects the refunded ``payment`` in its context, locked for the transaction the refund is saved in."""
 
-            total_refunded = payment.refunds.filter(
-                status='succeeded'
-            ).aggregate(total=models.Sum('amount'))['total'] or Decimal('0')
-
-            if attrs['amount'] > (payment.amount - total_refunded):
-                raise serializers.ValidationError(
-                    'Refund amount exceeds remaining payment amount'
-                )
-
-        return attrs
-
-
-class RefundCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Refund
         fields = ['amount', 'reason']
@@ -157,8 +179,21 @@ class RefundCreateSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError('Refund amount must be greater than zero')
         return value
 
+    def validate(self, attrs):
+        payment = self.context['payment']
+        # pending refunds may still go through at Stripe
+        total_refunded = payment.refunds.filter(
+            status__in=['succeeded', 'pending']
+        ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
+
+        if attrs['amount'] > payment.amount - total_refunded:
+            raise serializers.ValidationError({
+                'amount': ['Refund amount exceeds remaining payment amount']
+            })
+        return attrs
+
 
-class WebhookEventSerializer(serializers.ModelSerializer):
+class WebhookEventSerializer(ModelSerializer):
     class Meta:
         model = WebhookEvent
         fields = [
@@ -167,13 +202,13 @@ class WebhookEventSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
 
 
-class StripeCheckoutSessionSerializer(serializers.Serializer):
+class StripeCheckoutSessionSerializer(Serializer):
     checkout_url = serializers.URLField(read_only=True)
     session_id = serializers.CharField(read_only=True)
     payment_id = serializers.IntegerField(read_only=True)
 
 
-class PaymentStatusSerializer(serializers.Serializer):
+class PaymentStatusSerializer(Serializer):
     payment_id = serializers.IntegerField()
     status = serializers.CharField()
     message = serializers.CharField()
@@ -1,21 +1,34 @@
 import stripe
 from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
 from decimal import Decimal
 from typing import Dict, Optional, Tuple
 import logging
 
-from .models import Payment, PaymentAttempt, WebhookEvent
-from apps.subscribe.models import Subscription, SubscriptionHistory, SubscriptionPlan
+from .models import Payment, PaymentAttempt, Refund, WebhookEvent
+from apps.subscribe.history import record_history
+from apps.subscribe.models import Subscription, SubscriptionPlan
 
 logger = logging.getLogger(__name__)
 
 stripe.api_key = settings.STRIPE_SECRET_KEY
 
+# Stripe's definite refusals. After any other error (connection errors, timeouts, 5xx) the call may
+# still have gone through, so it is retried with the same idempotency key instead of given up.
+REJECTED_ERRORS = (
+    stripe.error.InvalidRequestError, stripe.error.CardError, stripe.error.AuthenticationError, stripe.error.PermissionError,
+)
+
 
 class StripeService:
+    """
+    Calls to the Stripe API. The checkout and refund calls only talk to Stripe and leave recording
+    the result to PaymentService, so they can run outside any database transaction.
+    """
+
     @staticmethod
-    def create_customer(user) -> Optional[str]:
+    def create_customer(user, idempotency_key: Optional[str] = None) -> Optional[str]:
         try:
             customer = stripe.Customer.create(
                 email=user.email,
@@ -23,7 +36,8 @@ class StripeService:
                 metadata={
                     'user_id': user.id,
                     'username': user.username
-                }
+                },
+                idempotency_key=idempotency_key,
             )
             return customer.id
         except stripe.error.StripeError as e:
@@ -31,52 +45,38 @@ class StripeService:
             return None
 
     @staticmethod
-    def create_checkout_session(payment: Payment, success_url: str, cancel_url: str) -> Optional[Dict]:
-        try:
-            if not payment.stripe_customer_id:
-                customer_id = StripeService.create_customer(payment.user)
-                if customer_id:
-                    payment.stripe_customer_id = customer_id
-                    payment.save()
-
-                session = stripe.checkout.Session.create(
-                    customer=payment.stripe_customer_id,
-                    payment_method_types=['card'],
-                    line_items=[{
-                        'price_data': {
-                            'currency': payment.currency.lower(),
-                            'product_data': {
-                                'name': f'Subscription - {payment.subscription.plan.name}',
-                                'description': payment.description,
-                            },
-                            'unit_amount': int(payment.amount * 100),
-                        },
-                        'quantity': 1,
-                    }],
-                    mode='payment',
-                    success_url=success_url,
-                    cancel_url=cancel_url,
-                    metadata={
-                        'payment_id': payment.id,
-                        'user_id': payment.user.id,
-                        'subscription_id': payment.subscription.id if payment.subscription else None,
-                    }
-                )
-
-                payment.stripe_session_id = session.id
-                payment.status = 'processing'
-                payment.save()
-
-                return {
-                    'checkout_url': session.url,
-                    'session_id': session.id,
-                    'payment_id': payment.id,
-                }
-
-        except stripe.error.StripeError as e:
-            logger.error(f'Error creating checkout session: {e}')
-            payment.mark_as_failed(str(e))
-            return None
+    def create_checkout_session(payment: Payment, success_url: str, cancel_url: str):
+        """
+        The Stripe session paying for ``payment``, with a customer created first when the payment
+        has none. Idempotency keys derived from the payment make a retried call return what the
+        first one created. Raises StripeError.
+        """
+        customer_id = payment.stripe_customer_id or StripeService.create_customer(payment.user, f'customer-payment-{payment.pk}')
+        session = stripe.checkout.Session.create(
+            customer=customer_id,
+            payment_method_types=['card'],
+            line_items=[{
+                'price_data': {
+                    'currency': payment.currency.lower(),
+                    'product_data': {
+                        'name': f'Subscription - {payment.subscription.plan.name}',
+                        'description': payment.description,
+                    },
+                    'unit_amount': int(payment.amount * 100),
+                },
+                'quantity': 1,
+            }],
+            mode='payment',
+            success_url=success_url,
+            cancel_url=cancel_url,
+            metadata={
+                'payment_id': payment.id,
+                'user_id': payment.user.id,
+                'subscription_id': payment.subscription.id if payment.subscription else None,
+            },
+            idempotency_key=f'checkout-payment-{payment.pk}',
+        )
+        return customer_id, session
 
     @staticmethod
     def create_payment_intent(payment: Payment) -> Optional[str]:
@@ -102,28 +102,39 @@ class StripeService:
             return None
 
     @staticmethod
-    def refund_payment(payment: Payment, amount: Optional[Decimal] = None, reason: str = '') -> bool:
-        try:
-            if not payment.stripe_payment_intent_id:
-                return False
+    def refund_payment(payment: Payment, amount: Optional[Decimal] = None, reason: str = '', idempotency_key: Optional[str] = None):
+        """
+        The Stripe refund of ``payment``, or None when Stripe refused it. Raises StripeError when
+        Stripe's answer is unknown and the refund may have been created.
+        """
+        if not payment.stripe_payment_intent_id:
+            return None
 
-            refund_data = {
-                'payment_intent': payment.stripe_payment_intent_id,
-                'metadata': {
-                    'payment_id': payment.id,
-                    'reason': reason
-                }
-            }
+        refund_data = {
+            'payment_intent': payment.stripe_payment_intent_id,
+            'metadata': {
+                'payment_id': payment.id,
+                'reason': reason
+            },
+            'idempotency_key': idempotency_key,
+        }
 
-            if amount:
-                refund_data['amount'] = int(amount * 100)
+        if amount:
+            refund_data['amount'] = int(amount * 100)
 
-            refund = stripe.Refund.create(**refund_data)
-            return refund.status == 'succeeded'
+        try:
+            return stripe.Refund.create(**refund_data)
+        except REJECTED_ERRORS as e:
+            logger.error(f'Error refund payment: {e}')
+            return None
 
+    @staticmethod
+    def retrieve_refund(refund_id: str):
+        try:
+            return stripe.Refund.retrieve(refund_id)
         except stripe.error.StripeError as e:
-            logger.error(f'Error refund payment: {e}')
-            return False
+            logger.error(f'Error retrieve refund: {e}')
+            return None
 
     @staticmethod
     def retrieve_session(session_id: str) -> Optional[Dict]:
@@ -142,44 +153,138 @@ class StripeService:
 
 class PaymentService:
     @staticmethod
-    def create_subscription_payment(user, plan: SubscriptionPlan) -> Tuple[Payment, Subscription]:
-        subscription = Subscription.objects.create(
-            user=user,
-            plan=plan,
-            status='pending',
-            start_date=timezone.now(),
-            end_date=timezone.now()
-        )
+    def create_subscription_payment(user, plan: SubscriptionPlan, idempotency_key: Optional[str] = None) -> Tuple[Payment, Subscription]:
+        # a user has one subscription row; an ended one is taken over by the new checkout
+        subscription = Subscription.objects.filter(user=user).first() or Subscription(user=user)
+        subscription.plan = plan
+        subscription.status = 'pending'
+        subscription.start_date = subscription.end_date = timezone.now()
+        subscription.save()
         payment = Payment.objects.create(
             user=user,
             subscription=subscription,
             amount=plan.price,
             currency='USD',
             description=f'Subscription - {plan.name}',
-            payment_method='stripe'
+            payment_method='stripe',
+            idempotency_key=idempotency_key,
         )
+        # the 'created' history row is written from the outbox, see apps.subscribe.handlers
+        return payment, subscription
 
-        SubscriptionHistory.objects.create(
-            subscription=subscription,
-            action='created',
-            description=f'Subscription created for plan {plan.name}'
+    @staticmethod
+    def start_checkout(payment: Payment, success_url: str, cancel_url: str) -> Optional[Dict]:
+        """
+        Create the Stripe session of ``payment``, committed as pending beforehand, then record it
+        in a short transaction. Call it outside any transaction, so that no connection or row lock
+        waits on Stripe.
+
+        A payment Stripe refused is failed. After an error that leaves the session's fate unknown
+        the payment stays pending and is marked ``checkout_interrupted``, so that the next checkout
+        resumes it with the same idempotency key.
+        """
+        try:
+            customer_id, session = StripeService.create_checkout_session(payment, success_url, cancel_url)
+        except stripe.error.StripeError as e:
+            logger.error(f'Error creating checkout session: {e}')
+            with transaction.atomic():
+                payment = Payment.objects.select_for_update().get(pk=payment.pk)
+                if payment.status == 'pending' and not payment.stripe_session_id:
+                    if isinstance(e, REJECTED_ERRORS):
+                        payment.mark_as_failed(str(e))
+                    else:
+                        payment.metadata['checkout_interrupted'] = {
+                            'error': str(e), 'success_url': success_url, 'cancel_url': cancel_url,
+                        }
+                        payment.save()
+            return None
+
+        with transaction.atomic():
+            # the row may have moved on while Stripe was called, e.g. canceled by the user
+            payment = Payment.objects.select_for_update().get(pk=payment.pk)
+            payment.stripe_customer_id = customer_id
+            payment.stripe_session_id = session.id
+            # what a retried or repeated checkout answers with while the session can still be paid
+            payment.metadata['checkout_url'] = session.url
+            payment.metadata['session_expires_at'] = getattr(session, 'expires_at', None)
+            payment.metadata.pop('checkout_interrupted', None)
+            if payment.status == 'pending':
+                payment.status = 'processing'
+            payment.save()
+
+        return {
+            'checkout_url': session.url,
+            'session_id': session.id,
+            'payment_id': payment.id,
+        }
+
+    @staticmethod
+    def process_refund(refund: Refund) -> Refund:
+        """
+        Ask Stripe for ``refund``, committed as pending beforehand, then record the outcome in a
+        short transaction. Call it outside any transaction. A refund is only failed when Stripe
+        refused or failed it: one Stripe is still processing, or whose request got no answer, stays
+        pending, and calling this again later looks it up or repeats the request under the same
+        idempotency key instead of refunding twice.
+        """
+        payment = refund.payment
+        if refund.stripe_refund_id:
+            # a repeated create would answer with the refund as it was first created
+            stripe_refund = StripeService.retrieve_refund(refund.stripe_refund_id)
+            if stripe_refund is None:
+                return refund
+        else:
+            try:
+                stripe_refund = StripeService.refund_payment(payment, refund.amount, refund.reason, idempotency_key=f'refund-{refund.pk}')
+            except stripe.error.StripeError as e:
+                logger.warning(f'Refund {refund.pk} left pending, Stripe did not answer: {e}')
+                return refund
+
+        with transaction.atomic():
+            refund = (
+                Refund.objects.select_for_update(of=('self',))
+                .select_related('payment__user', 'payment__subscription', 'created_by').get(pk=refund.pk)
+            )
+            if refund.status != 'pending':
+                # settled by a concurrent call meanwhile
+                return refund
+            payment = refund.payment
+
+            if stripe_refund is None or stripe_refund.status in ('failed', 'canceled'):
+                refund.status = 'failed'
+                refund.save()
+                return refund
+
+            refund.stripe_refund_id = stripe_refund.id
+            if stripe_refund.status != 'succeeded':
+                refund.save()
+                return refund
+
+            refund.process_refund()
+            if refund.amount == payment.amount and payment.subscription:
+                PaymentService.cancel_subscription(payment.subscription)
+        return refund
+
+    @staticmethod
+    def activate_subscription(payment: Payment) -> None:
+        payment.subscription.activate_subscription()
+        record_history(
+            payment.subscription, 'activated', 'Subscription activated after successful payment', {'payment_id': payment.id},
         )
 
-        return payment, subscription
+    @staticmethod
+    def cancel_unpaid_subscription(payment: Payment, reason: str = '') -> None:
+        payment.subscription.cancel_subscription()
+        record_history(
+            payment.subscription, 'payment_failed', f'Subscription cancelled due to {reason}', {'payment_id': payment.id},
+        )
 
     @staticmethod
     def process_successful_payment(payment: Payment) -> bool:
         try:
             payment.mark_as_succeeded()
             if payment.subscription:
-                payment.subscription.activate_subscription()
-
-                SubscriptionHistory.objects.create(
-                    subscription=payment.subscription,
-                    action='activated',
-                    description='Subscription activated after successful payment',
-                    metadata={'payment_id': payment.id}
-                )
+                PaymentService.activate_subscription(payment)
 
             logger.info(f'Payment {payment.id} successfully processed')
             return True
@@ -192,16 +297,10 @@ class PaymentService:
         try:
             payment.mark_as_failed(reason)
             if payment.subscription:
-                payment.subscription.cancel_subscription()
-                SubscriptionHistory.objects.create(
-                    subscription=payment.subscription,
-                    action='payment_failed',
-                    description=f'Subscription cancelled due to {reason}',
-                    metadata={'payment_id': payment.id}
-                )
-
-                logger.info(f'Payment {payment.id} failed due to {reason}')
-                return True
+                PaymentService.cancel_unpaid_subscription(payment, reason)
+
+            logger.info(f'Payment {payment.id} failed due to {reason}')
+            return True
         except Exception as e:
             logger.error(f'Error processing failed payment {payment.id}: {e}')
             return False
@@ -212,11 +311,7 @@ class PaymentService:
             subscription.cancel_subscription()
             if hasattr(subscription.user, 'pinned_post'):
                 subscription.user.pinned_post.delete()
-            SubscriptionHistory.objects.create(
-                subscription=subscription,
-                action='canceled',
-                description='Subscription canceled by user',
-            )
+            record_history(subscription, 'canceled', 'Subscription canceled by user')
 
             logger.info(f'Subscription {subscription.id} canceled due to {subscription.user}')
             return True
@@ -233,35 +328,40 @@ class WebhookService:
             event_id = event_data.get('id')
             event_type = event_data.get('type')
 
-            if WebhookEvent.objects.filter(event_id=event_id).exists():
-                return True
-
-            webhook_event = WebhookEvent.objects.create(
-                provider='stripe',
-                event_id=event_id,
-                event_type=event_type,
-                data=event_data
-            )
-
-            success = False
-
-            if event_type == 'checkout.session.completed':
-                success = WebhookService._handle_checkout_completed(event_data)
-            elif event_type == 'payment_intent.succeeded':
-                success = WebhookService._handle_payment_succeeded(event_data)
-            elif event_type == 'payment_intent.payment_failed':
-                success == WebhookService._handle_payment_failed(event_data)
-            elif event_type == 'charge.dispute.created':
-                success == WebhookService._handle_dispute_created(event_data)
-            else:
-                webhook_event.status = 'ignored'
-                webhook_event.save()
-                return True
-
-            if success:
-                webhook_event.mark_as_processed()
-            else:
-                webhook_event.mark_as_failed('Processing failed')
+            with transaction.atomic():
+                # Stripe redelivers an event until it is acknowledged, so only events already handled are
+                # skipped; a failed or interrupted one is processed again. The row lock keeps two deliveries
+                # of the same event from both handling it.
+                webhook_event = WebhookEvent.objects.select_for_update().filter(event_id=event_id).first()
+                if webhook_event is None:
+                    webhook_event = WebhookEvent.objects.create(
+                        provider='stripe',
+                        event_id=event_id,
+                        event_type=event_type,
+                        data=event_data
+                    )
+                elif webhook_event.status in ('processed', 'ignored'):
+                    return True
+
+                success = False
+
+                if event_type == 'checkout.session.completed':
+                    success = WebhookService._handle_checkout_completed(event_data)
+                elif event_type == 'payment_intent.succeeded':
+                    success = WebhookService._handle_payment_succeeded(event_data)
+                elif event_type == 'payment_intent.payment_failed':
+                    success = WebhookService._handle_payment_failed(event_data)
+                elif event_type == 'charge.dispute.created':
+                    success = WebhookService._handle_dispute_created(event_data)
+                else:
+                    webhook_event.status = 'ignored'
+                    webhook_event.save()
+                    return True
+
+                if success:
+                    webhook_event.mark_as_processed()
+                else:
+                    webhook_event.mark_as_failed('Processing failed')
 
             return success
         except Exception as e:
@@ -287,6 +387,7 @@ class WebhookService:
             return False
         except Exception as e:
             logger.error(f'Error processing payment {payment_id} -  {e}')
+            return False
 
     @staticmethod
     def _handle_payment_succeeded(event_data: Dict) -> bool:
@@ -1,23 +1,13 @@
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_save
 from django.dispatch import receiver
-from .models import Payment
-from .services import PaymentService
 
+from apps.core.outbox import publish
 
-@receiver(pre_save, sender=Payment)
-def payment_pre_save(sender, instance, **kwargs):
-    if instance.pk is None:
-        try:
-            previous = Payment.objects.get(pk=instance.pk)
-            instance._previous_status = previous.status
-        except Payment.DoesNotExist:
-            instance._previous_status = None
+from .models import Payment
 
 
 @receiver(post_save, sender=Payment)
 def payment_post_save(sender, instance, created, **kwargs):
-    if not created and hasattr(instance, '_previous_status'):
-        if (instance._previous_status in ['pending', 'processing'] and instance.status == 'succeeded'):
-            PaymentService.process_successful_payment(instance)
-        elif (instance._previous_status in ['pending', 'processing'] and instance.status == 'failed'):
-            PaymentService.process_failed_payment(instance)
+    if instance.loaded_status in ('pending', 'processing') and instance.status in ('succeeded', 'failed'):
+        publish(f'payment.{instance.status}', payment_id=instance.pk)
+    instance.loaded_status = instance.status
@@ -1,7 +1,8 @@
 from celery import shared_task
+from django.db.models import Q
 from django.utils import timezone
 from datetime import timedelta
-from .models import Payment, WebhookEvent
+from .models import Payment, Refund, WebhookEvent
 
 
 @shared_task
@@ -43,9 +44,29 @@ def retry_failed_webhook_events():
     processed_count = 0
 
     for event in failed_events:
-        success = WebhookService.process_stripe_webhook(event.data)
-        if success:
-            event.mark_as_processed()
+        if WebhookService.process_stripe_webhook(event.data):
             processed_count += 1
 
     return {'processed_events': processed_count}
+
+
+@shared_task
+def settle_pending_refunds():
+    """
+    Finish refunds left pending: those Stripe was still processing, and those whose request died
+    before Stripe answered. The latter are only retried while Stripe still remembers their
+    idempotency key (24 hours), so a retry can never refund twice.
+    """
+    from .services import PaymentService
+
+    now = timezone.now()
+    # leave refunds of requests that may still be waiting on Stripe alone
+    pending = Refund.objects.filter(status='pending', created_at__lt=now - timedelta(minutes=10)).filter(
+        Q(stripe_refund_id__isnull=False) | Q(created_at__gte=now - timedelta(hours=23)),
+    ).select_related('payment')[:50]
+
+    settled = 0
+    for refund in pending:
+        if PaymentService.process_refund(refund).status != 'pending':
+            settled += 1
+    return {'settled_refunds': settled}
@@ -1,3 +1,421 @@
-from django.test import TestCase
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import stripe
+from django.conf import settings
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.core import outbox
+from apps.core.testing import QueryBudgetTestCase, make_payments, make_plan, make_user, stripe_signature
+from apps.subscribe.models import Subscription
+
+from .models import Payment, Refund, WebhookEvent
+from .services import PaymentService
+from .tasks import retry_failed_webhook_events, settle_pending_refunds
+
+QUERY_BUDGETS = {
+    'payment:payment-list': {'get': 4},
+    'payment:payment-detail': {'get': 3},
+    'payment:create-checkout-session': {'post': 15},
+    'payment:payment-status': {'get': 3},
+    'payment:cancel-payment': {'post': 7},
+    'payment:create-refund': {'post': 9},
+    'payment:refund-list': {'get': 4},
+    'payment:refund-detail': {'get': 3},
+    'payment:stripe-webhook': {'post': 14},
+}
+
+WEBHOOK_SECRET = 'whsec_test'
+
+
+def stripe_object(prefix, **fields):
+    return mock.Mock(return_value=SimpleNamespace(id=f'{prefix}_test', **fields))
+
+
+class PaymentQueryBudgetTests(QueryBudgetTestCase):
+    budgets = QUERY_BUDGETS
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.admin = make_user(is_staff=True)
+
+    def pending_payment(self):
+        payment, _ = PaymentService.create_subscription_payment(make_user(), make_plan())
+        payment.stripe_session_id = f'cs_pending_{payment.pk}'
+        payment.save(update_fields=['stripe_session_id'])
+        return payment
+
+    def test_payment_list(self):
+        author = self.data.author
+        self.assertQueriesConstant(
+            'get', 'payment:payment-list', lambda: make_payments(author, 10, subscription=author.subscription), user=author,
+        )
+
+    @override_settings(API_VALUES_SERIALIZERS=False)
+    def test_payment_list_model_serializer(self):
+        author = self.data.author
+        self.assertQueriesConstant(
+            'get', 'payment:payment-list', lambda: make_payments(author, 10, subscription=author.subscription), user=author,
+        )
+
+    def test_values_and_model_serializers_agree(self):
+        author = self.data.author
+        make_payments(author, 3, subscription=author.subscription)
+        client = self.client_for(author)
+        for url in (reverse('payment:payment-list'), reverse('payment:payment-detail', args=[author.payments.first().pk])):
+            with self.subTest(url=url):
+                values = client.get(url).json()
+                with override_settings(API_VALUES_SERIALIZERS=False):
+                    model = client.get(url).json()
+                self.assertEqual(values, model)
+
+    def test_payment_detail(self):
+        payment = self.data.author.payments.first()
+        self.assertWithinBudget('get', 'payment:payment-detail', args=[payment.pk], user=self.data.author)
+
+    @mock.patch('stripe.checkout.Session.create', stripe_object('cs', url='https://checkout.stripe.com/c/pay/cs_test'))
+    @mock.patch('stripe.Customer.create', stripe_object('cus'))
+    def test_checkout(self):
+        data = {'subscription_plan_id': self.data.plan.pk}
+        self.assertWithinBudget('post', 'payment:create-checkout-session', user=make_user(), data=data, status=201)
+
+    @mock.patch('stripe.checkout.Session.create', stripe_object('cs', url='https://checkout.stripe.com/c/pay/cs_test'))
+    @mock.patch('stripe.Customer.create', stripe_object('cus'))
+    def test_checkout_is_idempotent(self):
+        user, data = make_user(), {'subscription_plan_id': self.data.plan.pk}
+        headers = {'Idempotency-Key': 'checkout-1'}
+        first = self.assertWithinBudget('post', 'payment:create-checkout-session', user=user, data=data, headers=headers, status=201)
+        again = self.assertWithinBudget('post', 'payment:create-checkout-session', user=user, data=data, headers=headers)
+        # a second click without the key still gets the session that can be paid
+        other = self.assertWithinBudget('post', 'payment:create-checkout-session', user=user, data=data)
+
+        self.assertEqual(again.data, first.data)
+        self.assertEqual(other.data, first.data)
+        self.assertEqual(stripe.checkout.Session.create.call_count, 1)
+        self.assertEqual(Payment.objects.get(user=user).idempotency_key, 'checkout-1')
+
+        Payment.objects.filter(user=user).update(status='failed')
+        self.assertWithinBudget('post', 'payment:create-checkout-session', user=user, data=data, headers=headers, status=409)
+
+    @mock.patch('stripe.checkout.Session.create', stripe_object('cs', url='https://checkout.stripe.com/c/pay/cs_test'))
+    @mock.patch('stripe.Customer.create', stripe_object('cus'))
+    def test_checkout_after_an_ended_subscription(self):
+        user = self.data.reader
+        user.subscription.expire_subscription()
+        data = {'subscription_plan_id': self.data.plan.pk}
+        self.assertWithinBudget('post', 'payment:create-checkout-session', user=user, data=data, status=201)
+        self.assertEqual(Subscription.objects.get(user=user).status, 'pending')
+
+    @mock.patch('stripe.checkout.Session.retrieve', stripe_object('cs', payment_status='unpaid', payment_intent=None, customer=None, metadata={}))
+    def test_payment_status(self):
+        payment = self.pending_payment()
+        self.assertWithinBudget('get', 'payment:payment-status', args=[payment.pk], user=payment.user)
+
+    def test_cancel_payment(self):
+        payment = self.pending_payment()
+        self.assertWithinBudget('post', 'payment:cancel-payment', args=[payment.pk], user=payment.user)
+
+    @mock.patch('stripe.Refund.create', stripe_object('re', status='succeeded'))
+    def test_refund(self):
+        payment = self.data.author.payments.first()
+        Payment.objects.filter(pk=payment.pk).update(stripe_payment_intent_id='pi_test')
+        data = {'amount': '1.00', 'reason': 'Duplicate'}
+        self.assertWithinBudget('post', 'payment:create-refund', args=[payment.pk], user=self.admin, data=data, status=201)
+        self.assertQueriesConstant(
+            'get', 'payment:refund-list', lambda: [payment.refunds.create(amount=Decimal('1.00')) for _ in range(10)], user=self.admin,
+        )
+        self.assertWithinBudget('get', 'payment:refund-detail', args=[payment.refunds.first().pk], user=self.admin)
+
+    @override_settings(STRIPE_WEBHOOK_SECRET=WEBHOOK_SECRET)
+    def test_stripe_webhook(self):
+        payment = self.pending_payment()
+        payload = json.dumps({
+            'id': 'evt_test', 'type': 'checkout.session.completed',
+            'data': {'object': {'id': payment.stripe_session_id, 'metadata': {'payment_id': str(payment.pk)}}},
+        })
+        headers = {'Stripe-Signature': stripe_signature(payload, WEBHOOK_SECRET)}
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertWithinBudget('post', 'payment:stripe-webhook', data=payload, headers=headers)
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, 'succeeded')
+        # the webhook activated the subscription itself, so relaying its events activates nothing again
+        outbox.relay()
+        self.assertEqual(payment.subscription.history.filter(action='activated').count(), 1)
+
+    def test_payment_settled_elsewhere_activates_subscription(self):
+        payment = self.pending_payment()
+        payment.status = 'succeeded'
+        payment.save()
+        outbox.relay()
+        payment.subscription.refresh_from_db()
+        self.assertEqual(payment.subscription.status, 'active')
+
+    @override_settings(STRIPE_WEBHOOK_SECRET=WEBHOOK_SECRET)
+    def test_stripe_webhook_bad_signature(self):
+        payload = json.dumps({'id': 'evt_forged', 'type': 'checkout.session.completed', 'data': {'object': {}}})
+        headers = {'Stripe-Signature': stripe_signature(payload, 'whsec_other')}
+        self.assertWithinBudget('post', 'payment:stripe-webhook', data=payload, headers=headers, status=400)
+
+    @override_settings(STRIPE_WEBHOOK_SECRET=WEBHOOK_SECRET)
+    def test_failed_payment_webhook_is_acknowledged(self):
+        payment = self.pending_payment()
+        payload = json.dumps({
+            'id': 'evt_failed', 'type': 'payment_intent.payment_failed',
+            'data': {'object': {'id': 'pi_failed', 'metadata': {'payment_id': str(payment.pk)}, 'last_payment_error': {'message': 'Declined'}}},
+        })
+        headers = {'Stripe-Signature': stripe_signature(payload, WEBHOOK_SECRET)}
+        self.assertWithinBudget('post', 'payment:stripe-webhook', data=payload, headers=headers)
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, 'failed')
+        self.assertEqual(WebhookEvent.objects.get(event_id='evt_failed').status, 'processed')
+
+    @override_settings(STRIPE_WEBHOOK_SECRET=WEBHOOK_SECRET)
+    def test_failed_webhook_events_are_processed_again(self):
+        payment = self.pending_payment()
+        event_data = {
+            'id': 'evt_retried', 'type': 'checkout.session.completed',
+            'data': {'object': {'id': payment.stripe_session_id, 'metadata': {'payment_id': str(payment.pk)}}},
+        }
+        WebhookEvent.objects.create(provider='stripe', event_id='evt_retried', event_type=event_data['type'], data=event_data, status='failed')
+
+        self.assertEqual(retry_failed_webhook_events(), {'processed_events': 1})
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, 'succeeded')
+        self.assertEqual(WebhookEvent.objects.get(event_id='evt_retried').status, 'processed')
+
+        # a redelivery of a processed event is acknowledged without handling it again
+        payload = json.dumps(event_data)
+        headers = {'Stripe-Signature': stripe_signature(payload, WEBHOOK_SECRET)}
+        with mock.patch.object(PaymentService, 'process_successful_payment') as process:
+            self.assertWithinBudget('post', 'payment:stripe-webhook', data=payload, headers=headers)
+        process.assert_not_called()
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class CheckoutConcurrencyTests(TransactionTestCase):
+    """Parallel checkouts, on connections of their own, as a double click sends them."""
+
+    @mock.patch('stripe.checkout.Session.create', stripe_object('cs', url='https://checkout.stripe.com/c/pay/cs_test'))
+    @mock.patch('stripe.Customer.create', stripe_object('cus'))
+    def test_parallel_checkouts_create_one_payment(self):
+        user, plan = make_user(), make_plan()
+        barrier = threading.Barrier(5)
+
+        def checkout():
+            client = APIClient()
+            client.force_authenticate(user)
+            barrier.wait()
+            try:
+                return client.post(reverse('payment:create-checkout-session'), {'subscription_plan_id': plan.pk}, format='json')
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=5) as pool:
+            responses = [future.result() for future in [pool.submit(checkout) for _ in range(5)]]
+
+        # the others either found the session or arrived while Stripe was still creating it
+        statuses = sorted(response.status_code for response in responses)
+        self.assertEqual(statuses.count(201), 1)
+        self.assertLessEqual(set(statuses), {200, 201, 409})
+        self.assertEqual({response.data['session_id'] for response in responses if response.status_code != 409}, {'cs_test'})
+        self.assertEqual(Payment.objects.filter(user=user).count(), 1)
+        self.assertEqual(Subscription.objects.filter(user=user).count(), 1)
+        self.assertEqual(stripe.checkout.Session.create.call_count, 1)
+
+
+class StripeOutsideTransactionTests(TransactionTestCase):
+    """Stripe is called with the intent committed and no transaction open."""
+
+    def outside_transaction(self, prefix, **fields):
+        def create(**kwargs):
+            self.assertFalse(connection.in_atomic_block)
+            return SimpleNamespace(id=f'{prefix}_test', **fields)
+        return mock.Mock(side_effect=create)
+
+    def test_checkout(self):
+        user, plan = make_user(), make_plan()
+        client = APIClient()
+        client.force_authenticate(user)
+        session = self.outside_transaction('cs', url='https://checkout.stripe.com/c/pay/cs_test')
+        with mock.patch('stripe.checkout.Session.create', session), mock.patch('stripe.Customer.create', self.outside_transaction('cus')):
+            response = client.post(reverse('payment:create-checkout-session'), {'subscription_plan_id': plan.pk}, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        payment = Payment.objects.get(user=user)
+        self.assertEqual((payment.status, payment.stripe_session_id, payment.stripe_customer_id), ('processing', 'cs_test', 'cus_test'))
+        self.assertEqual(session.call_args.kwargs['idempotency_key'], f'checkout-payment-{payment.pk}')
+
+    def test_refund(self):
+        admin = make_user(is_staff=True)
+        payment = make_payments(make_user(), 1)[0]
+        Payment.objects.filter(pk=payment.pk).update(stripe_payment_intent_id='pi_test', payment_method='stripe')
+        client = APIClient()
+        client.force_authenticate(admin)
+        create = self.outside_transaction('re', status='pending')
+        with mock.patch('stripe.Refund.create', create):
+            response = client.post(reverse('payment:create-refund', args=[payment.pk]), {'amount': '1.00'}, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        refund = payment.refunds.get()
+        self.assertEqual((refund.status, refund.stripe_refund_id), ('pending', 're_test'))
+        self.assertEqual(create.call_args.kwargs['idempotency_key'], f'refund-{refund.pk}')
+
+
+class TwoPhaseCheckoutTests(TestCase):
+    def setUp(self):
+        self.user, self.plan = make_user(), make_plan()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def checkout(self, headers=None):
+        return self.client.post(
+            reverse('payment:create-checkout-session'), {'subscription_plan_id': self.plan.pk}, format='json', headers=headers,
+        )
+
+    @mock.patch('stripe.checkout.Session.create', stripe_object('cs', url='https://checkout.stripe.com/c/pay/cs_test'))
+    @mock.patch('stripe.Customer.create', stripe_object('cus'))
+    def test_checkout_without_a_session_yet(self):
+        payment, _ = PaymentService.create_subscription_payment(self.user, self.plan)
+        self.assertEqual(self.checkout().status_code, 409)
+
+        # a checkout that died before Stripe answered stops blocking after a while
+        Payment.objects.filter(pk=payment.pk).update(created_at=timezone.now() - timedelta(seconds=settings.CHECKOUT_STALE_SECONDS + 1))
+        self.assertEqual(self.checkout().status_code, 201)
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, 'canceled')
+
+    @mock.patch('stripe.checkout.Session.create', stripe_object('cs', url='https://checkout.stripe.com/c/pay/cs_test'))
+    @mock.patch('stripe.Customer.create', stripe_object('cus'))
+    def test_stale_checkout_retried_with_its_key_is_resumed(self):
+        payment, _ = PaymentService.create_subscription_payment(self.user, self.plan, 'retried')
+        Payment.objects.filter(pk=payment.pk).update(created_at=timezone.now() - timedelta(seconds=settings.CHECKOUT_STALE_SECONDS + 1))
+
+        for _ in range(2):
+            response = self.checkout(headers={'Idempotency-Key': 'retried'})
+            self.assertEqual((response.status_code, response.data['payment_id']), (200, payment.pk))
+        self.assertEqual(stripe.checkout.Session.create.call_count, 1)
+        self.assertEqual(stripe.checkout.Session.create.call_args.kwargs['idempotency_key'], f'checkout-payment-{payment.pk}')
+        payment.refresh_from_db()
+        self.assertEqual((payment.status, payment.stripe_session_id), ('processing', 'cs_test'))
+        self.assertEqual(Payment.objects.filter(user=self.user).count(), 1)
+
+    @mock.patch('stripe.checkout.Session.create', stripe_object('cs', url='https://checkout.stripe.com/c/pay/cs_test'))
+    @mock.patch('stripe.Customer.create', stripe_object('cus'))
+    def test_repeated_checkouts(self):
+        # the branches CheckoutConcurrencyTests reaches through parallel requests, one after the other
+        first = self.checkout(headers={'Idempotency-Key': 'first'})
+        self.assertEqual(first.status_code, 201)
+        again = self.checkout(headers={'Idempotency-Key': 'first'})
+        self.assertEqual((again.status_code, again.data), (200, first.data))
+        self.assertEqual(stripe.checkout.Session.create.call_count, 1)
+
+        Payment.objects.get(pk=first.data['payment_id']).mark_as_succeeded()
+        self.assertEqual(self.checkout(headers={'Idempotency-Key': 'first'}).status_code, 409)
+
+        second = self.checkout(headers={'Idempotency-Key': 'second'})
+        self.assertEqual(second.status_code, 201)
+        payment = Payment.objects.get(pk=second.data['payment_id'])
+        payment.metadata['session_expires_at'] = time.time() - 1
+        payment.save()
+        self.assertEqual(self.checkout().status_code, 400)
+        self.assertEqual(Payment.objects.filter(user=self.user).count(), 2)
+
+    @mock.patch('stripe.checkout.Session.create', mock.Mock(side_effect=stripe.error.InvalidRequestError('No such price', 'price')))
+    @mock.patch('stripe.Customer.create', stripe_object('cus'))
+    def test_checkout_refused_by_stripe(self):
+        with self.assertLogs('apps.payment.services', 'ERROR'):
+            self.assertEqual(self.checkout().status_code, 400)
+        payment = Payment.objects.get(user=self.user)
+        self.assertEqual((payment.status, payment.metadata['failure_reason']), ('failed', 'No such price'))
+
+    @mock.patch('stripe.Customer.create', stripe_object('cus'))
+    def test_checkout_interrupted_is_resumed(self):
+        session = SimpleNamespace(id='cs_test', url='https://checkout.stripe.com/c/pay/cs_test')
+        create = mock.Mock(side_effect=[stripe.error.APIConnectionError('timeout'), session])
+        with mock.patch('stripe.checkout.Session.create', create):
+            with self.assertLogs('apps.payment.services', 'ERROR'):
+                self.assertEqual(self.checkout().status_code, 503)
+            payment = Payment.objects.get(user=self.user)
+            self.assertEqual(payment.status, 'pending')
+            self.assertIn('checkout_interrupted', payment.metadata)
+
+            response = self.checkout()
+
+        self.assertEqual((response.status_code, response.data['payment_id']), (200, payment.pk))
+        self.assertEqual(Payment.objects.filter(user=self.user).count(), 1)
+        # the same request twice, so Stripe answers the second from the first if it got through
+        first, second = create.call_args_list
+        self.assertEqual(first, second)
+        self.assertEqual(second.kwargs['idempotency_key'], f'checkout-payment-{payment.pk}')
+        payment.refresh_from_db()
+        self.assertEqual((payment.status, payment.stripe_session_id), ('processing', 'cs_test'))
+        self.assertNotIn('checkout_interrupted', payment.metadata)
+
+    def test_refund_without_an_answer_stays_pending(self):
+        admin = make_user(is_staff=True)
+        payment = make_payments(self.user, 1)[0]
+        Payment.objects.filter(pk=payment.pk).update(stripe_payment_intent_id='pi_test', payment_method='stripe')
+        client = APIClient()
+        client.force_authenticate(admin)
+        with mock.patch('stripe.Refund.create', mock.Mock(side_effect=stripe.error.APIConnectionError('timeout'))) as create:
+            with self.assertLogs('apps.payment.services', 'WARNING'):
+                response = client.post(reverse('payment:create-refund', args=[payment.pk]), {'amount': '1.00'}, format='json')
+        self.assertEqual((response.status_code, response.data['status']), (201, 'pending'))
+        refund = payment.refunds.get()
+
+        # the settle task repeats the request under the same idempotency key
+        Refund.objects.filter(pk=refund.pk).update(created_at=timezone.now() - timedelta(hours=1))
+        with mock.patch('stripe.Refund.create', stripe_object('re', status='succeeded')) as retried:
+            self.assertEqual(settle_pending_refunds(), {'settled_refunds': 1})
+        self.assertEqual(retried.call_args.kwargs['idempotency_key'], create.call_args.kwargs['idempotency_key'])
+        refund.refresh_from_db()
+        self.assertEqual((refund.status, refund.stripe_refund_id), ('succeeded', 're_test'))
+
+    @mock.patch('stripe.Refund.create', mock.Mock(side_effect=stripe.error.APIConnectionError('timeout')))
+    def test_refunds_cannot_exceed_the_payment(self):
+        admin = make_user(is_staff=True)
+        payment = make_payments(self.user, 1)[0]
+        Payment.objects.filter(pk=payment.pk).update(stripe_payment_intent_id='pi_test', payment_method='stripe')
+        client = APIClient()
+        client.force_authenticate(admin)
+
+        def refund(amount):
+            return client.post(reverse('payment:create-refund', args=[payment.pk]), {'amount': amount}, format='json').status_code
+
+        with self.assertLogs('apps.payment.services', 'WARNING'):
+            # the first refund stays pending, and may still go through at Stripe
+            self.assertEqual(refund('5.00'), 201)
+        self.assertEqual([refund(amount) for amount in ('9.99', '500', '5.00')], [400, 400, 400])
+        with self.assertLogs('apps.payment.services', 'WARNING'):
+            self.assertEqual(refund('4.99'), 201)
+        self.assertEqual(payment.refunds.count(), 2)
+
+    @mock.patch('stripe.Refund.create', mock.Mock(side_effect=stripe.error.InvalidRequestError('Charge already refunded', 'charge')))
+    def test_refund_refused_by_stripe(self):
+        payment = make_payments(self.user, 1)[0]
+        Payment.objects.filter(pk=payment.pk).update(stripe_payment_intent_id='pi_test')
+        payment.refresh_from_db()
+        refund = payment.refunds.create(amount=payment.amount)
+        with self.assertLogs('apps.payment.services', 'ERROR'):
+            self.assertEqual(PaymentService.process_refund(refund).status, 'failed')
+
+    def test_pending_refunds_are_settled(self):
+        payment = make_payments(self.user, 1, subscription=None)[0]
+        refund = payment.refunds.create(amount=payment.amount, stripe_refund_id='re_test')
+        Refund.objects.filter(pk=refund.pk).update(created_at=timezone.now() - timedelta(hours=1))
+        with mock.patch('stripe.Refund.retrieve', stripe_object('re', status='succeeded')) as retrieve:
+            self.assertEqual(settle_pending_refunds(), {'settled_refunds': 1})
+        retrieve.assert_called_once_with('re_test')
+        refund.refresh_from_db()
+        self.assertEqual(refund.status, 'succeeded')
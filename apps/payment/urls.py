@@ -0,0 +1,18 @@
+from django.urls import path
+from . import views
+
+app_name = 'payment'
+
+urlpatterns = [
+    path('', views.PaymentListView.as_view(), name='payment-list'),
+    path('<int:pk>/', views.PaymentDetailView.as_view(), name='payment-detail'),
+    path('checkout/', views.create_checkout_session, name='create-checkout-session'),
+    path('<int:payment_id>/status/', views.payment_status, name='payment-status'),
+    path('<int:payment_id>/cancel/', views.cancel_payment, name='cancel-payment'),
+    path('<int:payment_id>/refund/', views.create_refund, name='create-refund'),
+
+    path('refunds/', views.RefundListView.as_view(), name='refund-list'),
+    path('refunds/<int:pk>/', views.RefundDetailView.as_view(), name='refund-detail'),
+
+    path('webhook/stripe/', views.stripe_webhook, name='stripe-webhook'),
+]
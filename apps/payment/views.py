@@ -1,21 +1,29 @@
+import logging
 import stripe
 import json
+from datetime import timedelta
 
 from django.conf import settings
+from django.contrib.auth import get_user_model
 from django.http import HttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 from django.utils.decorators import method_decorator
 from django.shortcuts import get_object_or_404
-from django.db import transaction
+from django.utils import timezone
+from django.db import DatabaseError, transaction
+from django.db.models import Q
 
 from rest_framework import generics, permissions, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 
+from apps.core.serialization import ValuesListMixin
+
 from .models import Payment, PaymentAttempt, Refund, WebhookEvent
 from .serializers import (
     PaymentSerializer,
+    PaymentValuesSerializer,
     PaymentCreateSerializer,
     PaymentAttemptSerializer,
     RefundSerializer,
@@ -28,13 +36,18 @@ from .services import StripeService, PaymentService, WebhookService
 from apps.subscribe.models import Subscription, SubscriptionPlan
 from .. import payment
 
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_KEY_LENGTH = Payment._meta.get_field('idempotency_key').max_length
 
-class PaymentListView(generics.ListAPIView):
+
+class PaymentListView(ValuesListMixin, generics.ListAPIView):
     serializer_class = PaymentSerializer
+    values_serializer_class = PaymentValuesSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return Payment.objects.filter(user=self.request.user).select_related('subscription', 'subscription__plan').order_by('-created_at')
+        return Payment.objects.filter(user=self.request.user).select_related('user', 'subscription', 'subscription__plan').order_by('-created_at')
 
 
 class PaymentDetailView(generics.RetrieveAPIView):
@@ -42,46 +55,116 @@ class PaymentDetailView(generics.RetrieveAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return Payment.objects.filter(user=self.request.user).select_related('subscription', 'subscription__plan')
+        return Payment.objects.filter(user=self.request.user).select_related('user', 'subscription', 'subscription__plan')
 
 
+@transaction.non_atomic_requests
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def create_checkout_session(request):
+    """
+    Start paying for a plan. Checkouts of a user run one at a time, and a checkout repeated with
+    the same Idempotency-Key header, or made while an earlier one can still be paid, answers with
+    that earlier Stripe session (200) instead of creating another.
+
+    The payment is committed first and the Stripe session created after, outside any transaction,
+    so a slow Stripe call holds neither a connection nor the user's lock. When Stripe did not
+    answer (503), the next checkout resumes that payment.
+    """
     serializer = PaymentCreateSerializer(data=request.data, context={'request': request})
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-    if serializer.is_valid():
-        try:
-            with transaction.atomic():
-                plan_id = serializer.validated_data['subscription_plan_id']
-                plan = get_object_or_404(SubscriptionPlan, id=plan_id, is_active=True)
-
-                payment, subscription = PaymentService.create_subscription_payment(request.user, plan)
-
-                success_url = serializer.validated_data.get(
-                    'success_url',
-                    f'{settings.FRONTEND_URL}/payment/success?session_id={CHECKOUT_SESSEION_ID}'
-                )
-                cancel_url = serializer.validated_data.get('cancel_url', f'{settings.FRONTEND_URL}/payment/cancel')
-
-                session_data = StripeService.create_checkout_session(
-                    payment, success_url, cancel_url
-                )
+    idempotency_key = request.headers.get('Idempotency-Key') or None
+    if idempotency_key and len(idempotency_key) > IDEMPOTENCY_KEY_LENGTH:
+        return Response({
+            'error': f'Idempotency-Key must be at most {IDEMPOTENCY_KEY_LENGTH} characters',
+        }, status=status.HTTP_400_BAD_REQUEST)
 
+    try:
+        with transaction.atomic():
+            # concurrent checkouts of the user (double clicks, client retries) wait here for each other
+            user = get_user_model().objects.select_for_update().get(pk=request.user.pk)
+
+            open_payments = Q(status__in=['pending', 'processing'])
+            if idempotency_key:
+                open_payments |= Q(idempotency_key=idempotency_key)
+            previous = list(Payment.objects.filter(open_payments, user=user).order_by('-created_at'))
+            # the payment of this very key first, otherwise the latest open one
+            previous.sort(key=lambda payment: idempotency_key is None or payment.idempotency_key != idempotency_key)
+            previous = previous[0] if previous else None
+            resumed = interrupted = None
+            if previous is not None:
+                session_data = previous.open_checkout_session()
                 if session_data:
-                    response_serializer = StripeCheckoutSessionSerializer(session_data)
-                    return Response(response_serializer.data, status=status.HTTP_201_CREATED)
-                else:
+                    return Response(StripeCheckoutSessionSerializer(session_data).data, status=status.HTTP_200_OK)
+                if previous.is_pending and not previous.stripe_session_id:
+                    stale = timezone.now() - timedelta(seconds=settings.CHECKOUT_STALE_SECONDS)
+                    interrupted = previous.metadata.pop('checkout_interrupted', None)
+                    same_key = idempotency_key is not None and previous.idempotency_key == idempotency_key
+                    if previous.created_at <= stale and not same_key:
+                        # its checkout died between committing the payment and creating the session
+                        previous.status = 'canceled'
+                        previous.save()
+                    elif interrupted or previous.created_at <= stale:
+                        # Stripe never answered for it, or its checkout died and is retried with its
+                        # key, which stays bound to it; ask again under the same idempotency key
+                        previous.save()
+                        resumed = previous
+                    else:
+                        return Response({
+                            'error': 'A checkout is already in progress',
+                        }, status=status.HTTP_409_CONFLICT)
+                elif previous.idempotency_key and previous.idempotency_key == idempotency_key:
+                    return Response({
+                        'error': 'The checkout with this Idempotency-Key can no longer be paid',
+                    }, status=status.HTTP_409_CONFLICT)
+                elif previous.is_pending:
                     return Response({
-                        'error': 'Failed to create checkout session',
+                        'error': 'User has pending payments.',
                     }, status=status.HTTP_400_BAD_REQUEST)
 
-        except Exception as e:
+            if resumed is None:
+                plan_id = serializer.validated_data['subscription_plan_id']
+                plan = get_object_or_404(SubscriptionPlan, id=plan_id, is_active=True)
+
+                payment, subscription = PaymentService.create_subscription_payment(user, plan, idempotency_key)
+
+        success_url = serializer.validated_data.get(
+            'success_url',
+            # Stripe substitutes {CHECKOUT_SESSION_ID} itself when redirecting back
+            f'{settings.FRONTEND_URL}/payment/success?session_id={{CHECKOUT_SESSION_ID}}'
+        )
+        cancel_url = serializer.validated_data.get('cancel_url', f'{settings.FRONTEND_URL}/payment/cancel')
+        if resumed is not None:
+            payment = resumed
+            if interrupted:
+                # a repeated request must match the first one for Stripe to answer it from its idempotency key
+                success_url, cancel_url = interrupted['success_url'], interrupted['cancel_url']
+
+        session_data = PaymentService.start_checkout(payment, success_url, cancel_url)
+
+        if session_data:
+            response_serializer = StripeCheckoutSessionSerializer(session_data)
+            return Response(response_serializer.data, status=status.HTTP_200_OK if resumed else status.HTTP_201_CREATED)
+        elif Payment.objects.filter(pk=payment.pk, status='pending').exists():
+            return Response({
+                'error': 'Stripe could not be reached, retry the checkout',
+            }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        else:
             return Response({
-                'error': str(e)
+                'error': 'Failed to create checkout session',
             }, status=status.HTTP_400_BAD_REQUEST)
 
-    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    except DatabaseError:
+        logger.exception(f'Checkout of user {request.user.pk} failed')
+        return Response({
+            'error': 'Failed to create checkout session',
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    except Exception as e:
+        return Response({
+            'error': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
 
 
 @api_view(['GET'])
@@ -90,7 +173,7 @@ def payment_status(request, payment_id):
     try:
         payment = get_object_or_404(Payment, id=payment_id, user=request.user)
 
-        if payment.stripe_session_id and payment_status in ['pending', 'processing']:
+        if payment.stripe_session_id and payment.status in ['pending', 'processing']:
             session_info = StripeService.retrieve_session(payment.stripe_session_id)
 
             if session_info:
@@ -129,7 +212,7 @@ def cancel_payment(request, payment_id):
             return Response({
                 'error': 'Payment is not pending',
             }, status=status.HTTP_400_BAD_REQUEST)
-        payment.status = 'cancelled'
+        payment.status = 'canceled'
         payment.save()
 
         if payment.subscription:
@@ -159,51 +242,62 @@ class RefundDetailView(generics.RetrieveAPIView):
     queryset = Refund.objects.all().select_related('payment', 'payment__user', 'created_by')
 
 
+@transaction.non_atomic_requests
 @api_view(['POST'])
 @permission_classes([permissions.IsAdminUser])
 def create_refund(request, payment_id):
+    """
+    Refund a payment. The refund is committed as pending before Stripe is asked for it, outside any
+    transaction; a refund Stripe still processes stays pending and is settled by ``settle_pending_refunds``.
+    """
     try:
-        payment = get_object_or_404(Payment, id=payment_id)
-
-        if not payment.can_be_refunded:
+        with transaction.atomic():
+            # locked until the refund is saved, so concurrent refunds count each other against the remainder
+            payment = get_object_or_404(Payment.objects.select_for_update(), id=payment_id)
+
+            if not payment.can_be_refunded:
+                return Response({
+                    'error': 'Payment is non refundable',
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            serializer = RefundCreateSerializer(data=request.data, context={'payment': payment})
+            if not serializer.is_valid():
+                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+            refund = serializer.save(
+                payment=payment,
+                created_by=request.user,
+            )
+
+        refund = PaymentService.process_refund(refund)
+
+        if refund.status != 'failed':
+            response_serializer = RefundSerializer(refund)
+            return Response(response_serializer.data, status=status.HTTP_201_CREATED)
+        else:
             return Response({
-                'error': 'Payment is non refundable',
+                'error': 'Failed to create refund',
             }, status=status.HTTP_400_BAD_REQUEST)
 
-        serializer = RefundCreateSerializer(data=request.data, context={'payment_id': payment_id})
-
-        if serializer.is_valid():
-            with transaction.atomic():
-                refund = serializer.save(
-                    payment=payment,
-                    created_by=request.user,
-                )
-
-                success = StripeService.refund_payment(
-                    payment,
-                    refund.amount,
-                    refund.reason
-                )
-
-                if success:
-                    refund.process_refund()
-
-                    if refund.amount == payment.amount and payment.subscription:
-                        PaymentService.cancel_subscription(payment.subscription)
-
-                    response_serializer = RefundSerializer(refund)
-                    return Response(response_serializer.data, status=status.HTTP_201_CREATED)
-                else:
-                    refund.status = 'failed'
-                    refund.save()
-                    return Response({
-                        'error': 'Failed to create refund',
-                    }, status=status.HTTP_400_BAD_REQUEST)
-
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-
     except Payment.DoesNotExist:
         return Response({
             'error': 'Payment does not exist',
         }, status=status.HTTP_404_NOT_FOUND)
 
+
+@csrf_exempt
+@require_POST
+def stripe_webhook(request):
+    if not settings.STRIPE_WEBHOOK_SECRET:
+        return HttpResponse(status=400)
+    payload = request.body.decode('utf-8')
+    try:
+        stripe.WebhookSignature.verify_header(payload, request.META.get('HTTP_STRIPE_SIGNATURE'), settings.STRIPE_WEBHOOK_SECRET)
+        event_data = json.loads(payload)
+    except (ValueError, stripe.error.SignatureVerificationError):
+        return HttpResponse(status=400)
+
+    if WebhookService.process_stripe_webhook(event_data):
+        return HttpResponse(status=200)
+    # a non-2xx answer makes Stripe deliver the event again later
+    return HttpResponse(status=500)
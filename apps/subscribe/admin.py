@@ -2,6 +2,12 @@ from django.contrib import admin
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils import timezone
+
+from apps.core.admin import ExportAdminMixin, LargeTableAdmin
+from apps.core.bulk import bulk_action
+from apps.core.serialization import subquery_count
+
+from . import bulk
 from .models import SubscriptionPlan, Subscription, PinnedPost, SubscriptionHistory
 
 
@@ -32,12 +38,13 @@ class SubscriptionPlanAdmin(admin.ModelAdmin):
     )
 
     def subscriptions_count(self, obj):
-        return obj.subscriptions.count()
+        return obj.subscriptions_total
 
     subscriptions_count.short_description = 'Subscriptions'
+    subscriptions_count.admin_order_field = 'subscriptions_total'
 
     def get_queryset(self, request):
-        return super().get_queryset(request).prefetch_related('subscriptions')
+        return super().get_queryset(request).annotate(subscriptions_total=subquery_count(Subscription.objects.all(), 'plan'))
 
 
 class SubscriptionHistoryInline(admin.TabularInline):
@@ -51,7 +58,7 @@ class SubscriptionHistoryInline(admin.TabularInline):
 
 
 @admin.register(Subscription)
-class SubscriptionAdmin(admin.ModelAdmin):
+class SubscriptionAdmin(ExportAdminMixin, admin.ModelAdmin):
     list_display = (
         'user_link', 'plan', 'status', 'is_active_display', 'start_date', 'end_date'
     )
@@ -60,6 +67,10 @@ class SubscriptionAdmin(admin.ModelAdmin):
     readonly_fields = ('created_at', 'updated_at', 'is_active', 'days_remaining')
     raw_id_fields = ('user',)
     inlines = [SubscriptionHistoryInline]
+    export_fields = (
+        'id', 'user_id', 'user__email', 'plan_id', 'plan__name', 'status', 'start_date', 'end_date', 'auto_renew',
+        'stripe_subscription_id', 'created_at', 'updated_at',
+    )
 
     fieldsets = (
         (None, {
@@ -112,39 +123,11 @@ class SubscriptionAdmin(admin.ModelAdmin):
     def get_queryset(self, request):
         return super().get_queryset(request).select_related('user', 'plan')
 
-    actions = ['activate_subscriptions', 'cancel_subscriptions', 'expire_subscriptions']
-
-    def activate_subscriptions(self, request, queryset):
-        count = 0
-        for subscription in queryset:
-            if subscription.status != 'active':
-                subscription.activate()
-                count += 1
-
-        self.message_user(request, f'{count} subscriptions activated')
-
-    activate_subscriptions.short_description = 'Activate Subscriptions'
-
-    def cancel_subscriptions(self, request, queryset):
-        count = 0
-        for subscription in queryset:
-            if subscription.status == 'active':
-                subscription.cancel()
-                count += 1
-
-        self.message_user(request, f'{count} subscriptions cancelled')
-
-    cancel_subscriptions.short_description = 'Cancel Subscriptions'
-
-    def expire_subscriptions(self, request, queryset):
-        count = 0
-        for subscription in queryset:
-            if subscription.status == 'active':
-                subscription.expire()
-                count += 1
-        self.message_user(request, f'{count} subscriptions expired')
-
-    expire_subscriptions.short_description = 'Expire Subscriptions'
+    actions = [
+        bulk_action(bulk.activate_subscriptions, 'Activate Subscriptions'),
+        bulk_action(bulk.cancel_subscriptions, 'Cancel Subscriptions'),
+        bulk_action(bulk.expire_subscriptions, 'Expire Subscriptions'),
+    ]
 
 
 @admin.register(PinnedPost)
@@ -153,7 +136,7 @@ class PinnedPostAdmin(admin.ModelAdmin):
         'user_link', 'post_link', 'subscriptions_status', 'pinned_at'
     )
     list_filter = ('pinned_at', 'user__subscription__status')
-    search_fields = ('user__username', 'user__title')
+    search_fields = ('user__username', 'post__title')
     readonly_fields = ('pinned_at',)
     raw_id_fields = ('user', 'post')
 
@@ -170,7 +153,7 @@ class PinnedPostAdmin(admin.ModelAdmin):
     post_link.short_description = 'Post'
 
     def subscriptions_status(self, obj):
-        if hasattr(obj.user, 'subscriptions') and obj.user.subscriptions.is_active:
+        if hasattr(obj.user, 'subscription') and obj.user.subscription.is_active:
             return format_html('<span style="color: green;"> + Active</span>')
         else:
             return format_html('<span style="color: red;"> - Inactive</span>')
@@ -178,21 +161,26 @@ class PinnedPostAdmin(admin.ModelAdmin):
     subscriptions_status.short_description = 'Subscriptions Status'
 
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related('user', 'user__subscription', 'post')
+        return super().get_queryset(request).select_related('user', 'user__subscription', 'post').defer(
+            'post__content', 'post__excerpt', 'post__image_renditions',
+        )
 
     def has_add_permission(self, request):
         return False
 
 
 @admin.register(SubscriptionHistory)
-class SubscriptionHistoryAdmin(admin.ModelAdmin):
+class SubscriptionHistoryAdmin(ExportAdminMixin, LargeTableAdmin):
     list_display = ('subscription_link', 'action', 'created_at')
     list_filter = ('action', 'created_at')
+    date_hierarchy = 'created_at'
     search_fields = ('subscription__user__username', 'description')
     readonly_fields = ('subscription', 'action', 'description', 'created_at', 'metadata')
+    export_fields = ('id', 'subscription_id', 'subscription__user__email', 'action', 'description', 'metadata', 'created_at')
+    export_status_field = 'action'
 
     def subscription_link(self, obj):
-        url = reverse('admin:accounts_subscription_change', args=[obj.subscription.id])
+        url = reverse('admin:subscribe_subscription_change', args=[obj.subscription.id])
         return format_html('<a href="{}">{} - {}</a>', url, obj.subscription.user.username, obj.subscription.plan.name)
 
     subscription_link.short_description = 'Subscription'
@@ -209,7 +197,7 @@ class SubscriptionHistoryAdmin(admin.ModelAdmin):
         return False
 
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related('subscription', 'subscription__user')
+        return super().get_queryset(request).select_related('subscription__user', 'subscription__plan')
 
 
 admin.site.site_header = 'Lessoner Administration'
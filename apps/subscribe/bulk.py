@@ -0,0 +1,71 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import connections
+from django.utils import timezone
+
+from apps.core.bulk import bulk_operation
+
+from .history import history_entry, write_history
+from .models import PinnedPost, Subscription
+
+
+def unpin_posts(user_ids):
+    """Remove the pinned posts of ``user_ids``, recording the history rows the delete signals would."""
+    pins = PinnedPost.objects.filter(user_id__in=user_ids)
+    rows = list(pins.values_list('pk', 'user__subscription', 'post_id', 'post__title'))
+    write_history(
+        history_entry(
+            subscription_id, 'post_unpinned', f'Post "{title}"  unpinned', metadata={'post_id': post_id, 'post_title': title},
+        )
+        for _, subscription_id, post_id, title in rows if subscription_id is not None
+    )
+    if rows:
+        # a plain DELETE, without the per-row pre_delete signal whose work was done above
+        connection = connections[pins.db]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {connection.ops.quote_name(PinnedPost._meta.db_table)} WHERE id IN ({", ".join(["%s"] * len(rows))})',
+                [pk for pk, *_ in rows],
+            )
+    return len(rows)
+
+
+def end_subscriptions(queryset, status, action, description, **fields):
+    rows = list(queryset.filter(status='active').select_for_update(of=('self',)).values_list('pk', 'user_id'))
+    if not rows:
+        return 0
+
+    pks, user_ids = zip(*rows)
+    Subscription.objects.filter(pk__in=pks).update(status=status, updated_at=timezone.now(), **fields)
+    write_history(history_entry(pk, action, description) for pk in pks)
+    unpin_posts(user_ids)
+    return len(rows)
+
+
+@bulk_operation
+def activate_subscriptions(queryset):
+    rows = list(queryset.exclude(status='active').select_for_update(of=('self',)).values_list('pk', 'plan__duration_days'))
+    if not rows:
+        return 0
+
+    by_duration = defaultdict(list)
+    for pk, duration_days in rows:
+        by_duration[duration_days].append(pk)
+    now = timezone.now()
+    for duration_days, pks in by_duration.items():
+        Subscription.objects.filter(pk__in=pks).update(
+            status='active', start_date=now, end_date=now + timedelta(days=duration_days), updated_at=now,
+        )
+    write_history(history_entry(pk, 'activated', 'Subscription activated by an administrator') for pk, _ in rows)
+    return len(rows)
+
+
+@bulk_operation
+def cancel_subscriptions(queryset):
+    return end_subscriptions(queryset, 'canceled', 'canceled', 'Subscription canceled by an administrator', auto_renew=False)
+
+
+@bulk_operation
+def expire_subscriptions(queryset):
+    return end_subscriptions(queryset, 'expired', 'expired', 'Subscription expired by an administrator')
@@ -0,0 +1,50 @@
+from apps.core.outbox import outbox_handler
+from apps.main.models import Post
+
+from .bulk import unpin_posts
+from .history import history_entry, write_history
+from .models import Subscription
+
+
+# Handlers write their history rows right away rather than with record_history(), so the rows
+# commit together with the event being marked handled.
+
+
+def _post_metadata(post_id):
+    # the post may be gone by the time the event is handled, e.g. when deleting it removed the pin
+    title = Post.objects.filter(pk=post_id).values_list('title', flat=True).first() or ''
+    return title, {'post_id': post_id, 'post_title': title}
+
+
+@outbox_handler('subscription.created')
+def record_subscription_created(subscription_id, plan_id):
+    subscription = Subscription.objects.select_related('plan').filter(pk=subscription_id).first()
+    if subscription is not None:
+        write_history([history_entry(subscription, 'created', f'Subscription {subscription.plan.name} created')])
+
+
+@outbox_handler('subscription.status_changed')
+def unpin_when_ended(subscription_id, user_id, previous, status):
+    if status in ('canceled', 'expired'):
+        unpin_posts([user_id])
+
+
+@outbox_handler('subscription.deleted')
+def unpin_when_deleted(user_id):
+    unpin_posts([user_id])
+
+
+@outbox_handler('pinned_post.created')
+def record_pinned(user_id, post_id):
+    subscription_id = Subscription.objects.filter(user_id=user_id).values_list('pk', flat=True).first()
+    if subscription_id is not None:
+        title, metadata = _post_metadata(post_id)
+        write_history([history_entry(subscription_id, 'post_pinned', f'Post "{title}"  pinned', metadata)])
+
+
+@outbox_handler('pinned_post.deleted')
+def record_unpinned(user_id, post_id):
+    subscription_id = Subscription.objects.filter(user_id=user_id).values_list('pk', flat=True).first()
+    if subscription_id is not None:
+        title, metadata = _post_metadata(post_id)
+        write_history([history_entry(subscription_id, 'post_unpinned', f'Post "{title}"  unpinned', metadata)])
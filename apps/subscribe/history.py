@@ -0,0 +1,85 @@
+"""
+Writing SubscriptionHistory rows. ``record_history()`` queues a row until the transaction it is
+called in commits, then writes the queued rows of that transaction together, leaving out
+identical rows recorded more than once; rows recorded in a rolled back transaction or savepoint
+are dropped with it. Batch jobs that already have all their rows use ``write_history()``.
+"""
+import json
+import weakref
+from functools import partial
+from threading import local
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+from .models import SubscriptionHistory
+
+
+def history_entry(subscription, action, description='', metadata=None):
+    return SubscriptionHistory(
+        subscription_id=getattr(subscription, 'pk', subscription), action=action, description=description, metadata=metadata or {},
+    )
+
+
+def _key(entry):
+    return entry.subscription_id, entry.action, entry.description, json.dumps(entry.metadata, sort_keys=True, cls=DjangoJSONEncoder)
+
+
+def write_history(entries, using=None):
+    """Insert ``entries`` now, in batches, skipping duplicates among them."""
+    unique = {}
+    for entry in entries:
+        unique.setdefault(_key(entry), entry)
+    return SubscriptionHistory.objects.using(using).bulk_create(unique.values(), batch_size=1000)
+
+
+class _Buffer:
+    """
+    The rows recorded on a connection inside one outermost atomic block, grouped by the savepoints
+    they were recorded in. Each group registers one ``on_commit()`` callback; a callback only runs
+    if its savepoint and the ones around it were kept, so it writes the unwritten rows of all of
+    those groups with one INSERT, and the callbacks run after it usually find nothing left to write.
+    """
+
+    def __init__(self, block, using):
+        self.block = block
+        self.using = using
+        self.groups = {}
+        self.written = set()
+
+    def add(self, savepoint_ids, entry):
+        group = self.groups.get(savepoint_ids)
+        if group is None:
+            group = self.groups[savepoint_ids] = {}
+            transaction.on_commit(partial(self.write, savepoint_ids), using=self.using)
+        group.setdefault(_key(entry), entry)
+
+    def write(self, savepoint_ids):
+        entries = {}
+        for sids, group in self.groups.items():
+            if savepoint_ids[:len(sids)] == sids:
+                entries.update((key, entry) for key, entry in group.items() if key not in self.written)
+        self.written.update(entries)
+        if entries:
+            write_history(entries.values(), using=self.using)
+
+
+# the buffer of each connection of this thread; only its pending callbacks keep it alive, so it goes
+# away once its transaction has committed or rolled back
+_buffers = local()
+
+
+def record_history(subscription, action, description='', metadata=None, using=None):
+    """Write a history row for ``subscription`` (an instance or primary key) when the transaction commits."""
+    entry = history_entry(subscription, action, description, metadata)
+    connection = transaction.get_connection(using)
+    if not connection.in_atomic_block:
+        write_history([entry], using=using)
+        return
+
+    ref = getattr(_buffers, connection.alias, None)
+    buffer = ref and ref()
+    if buffer is None or buffer.block is not connection.atomic_blocks[0]:
+        buffer = _Buffer(connection.atomic_blocks[0], using)
+        setattr(_buffers, connection.alias, weakref.ref(buffer))
+    buffer.add(tuple(connection.savepoint_ids), entry)
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-19 00:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subscribe', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='subscriptionhistory',
+            index=models.Index(fields=['-created_at'], name='subscriptio_created_afb6ac_idx'),
+        ),
+    ]
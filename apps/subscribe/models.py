@@ -3,6 +3,8 @@ from django.conf import settings
 from django.utils import timezone
 from datetime import timedelta
 
+from apps.core.models import TracksStatusMixin
+
 
 class SubscriptionPlan(models.Model):
     name = models.CharField(max_length=100)
@@ -24,7 +26,7 @@ class SubscriptionPlan(models.Model):
         return f'{self.name} - {self.price}'
 
 
-class Subscription(models.Model):
+class Subscription(TracksStatusMixin, models.Model):
     STATUS_CHOICES = [
         ('active', 'Active'),
         ('expired', 'Expired'),
@@ -152,6 +154,9 @@ class SubscriptionHistory(models.Model):
         verbose_name = 'Subscription History'
         verbose_name_plural = 'Subscription History'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at']),
+        ]
 
     def __str__(self):
         return f'{self.subscription.user.username} - {self.action}'
\ No newline at end of file
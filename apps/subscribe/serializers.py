@@ -1,9 +1,10 @@
 from rest_framework import serializers
 from django.utils import timezone
+from apps.core.serialization import ModelSerializer, Serializer
 from .models import SubscriptionPlan, Subscription, PinnedPost, SubscriptionHistory
 
 
-class SubscriptionPlanSerializer(serializers.ModelSerializer):
+class SubscriptionPlanSerializer(ModelSerializer):
     class Meta:
         model = SubscriptionPlan
         fields = [
@@ -21,7 +22,7 @@ class SubscriptionPlanSerializer(serializers.ModelSerializer):
         return data
 
 
-class SubscriptionSerializer(serializers.ModelSerializer):
+class SubscriptionSerializer(ModelSerializer):
     plan_info = SubscriptionPlanSerializer(source='plan', read_only=True)
     user_info = serializers.SerializerMethodField()
     is_active = serializers.ReadOnlyField()
@@ -48,7 +49,7 @@ class SubscriptionSerializer(serializers.ModelSerializer):
         }
 
 
-class SubscriptionCreateSerializer(serializers.ModelSerializer):
+class SubscriptionCreateSerializer(ModelSerializer):
     class Meta:
         model = Subscription
         fields = ['plan']
@@ -79,7 +80,7 @@ class SubscriptionCreateSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
-class PinnedPostSerializer(serializers.ModelSerializer):
+class PinnedPostSerializer(ModelSerializer):
     post_info = serializers.SerializerMethodField()
 
     class Meta:
@@ -93,7 +94,7 @@ class PinnedPostSerializer(serializers.ModelSerializer):
             'title': obj.post.title,
             'slug': obj.post.slug,
             'content': obj.post.content,
-            'image': obj.post.image,
+            'image': obj.post.image.url if obj.post.image else None,
             'views_count': obj.post.views_count,
             'created_at': obj.post.created_at,
         }
@@ -126,7 +127,7 @@ class PinnedPostSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
-class SubscriptionHistorySerializer(serializers.ModelSerializer):
+class SubscriptionHistorySerializer(ModelSerializer):
     class Meta:
         model = SubscriptionHistory
         fields = [
@@ -135,7 +136,7 @@ class SubscriptionHistorySerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
 
 
-class UserSubscriptionStatusSerializer(serializers.Serializer):
+class UserSubscriptionStatusSerializer(Serializer):
     has_subscription = serializers.BooleanField()
     is_active = serializers.BooleanField()
     subscription = SubscriptionSerializer(allow_null=True)
@@ -144,10 +145,19 @@ class UserSubscriptionStatusSerializer(serializers.Serializer):
 
     def to_representation(self, instance):
         user = instance
-        has_subscription = hasattr(user, 'subscription')
-        subscription = user.subscription if has_subscription else None
+        # The view may load the subscription and pinned post up front (concurrently) and pass them in.
+        if 'subscription' in self.context:
+            subscription = self.context['subscription']
+        else:
+            subscription = getattr(user, 'subscription', None)
+        if subscription is not None:
+            subscription.user = user
+        has_subscription = subscription is not None
         is_active = subscription.is_active if subscription else False
-        pinned_post = getattr(user, 'pinned_post', None) if is_active else None
+        if 'pinned_post' in self.context:
+            pinned_post = self.context['pinned_post'] if is_active else None
+        else:
+            pinned_post = getattr(user, 'pinned_post', None) if is_active else None
 
         return {
             'has_subscription': has_subscription,
@@ -158,7 +168,7 @@ class UserSubscriptionStatusSerializer(serializers.Serializer):
         }
 
 
-class PinPostSerializer(serializers.Serializer):
+class PinPostSerializer(Serializer):
     post_id = serializers.IntegerField()
 
     def validate_post_id(self, value):
@@ -186,7 +196,7 @@ class PinPostSerializer(serializers.Serializer):
         return attrs
 
 
-class UnpinPostSerializer(serializers.Serializer):
+class UnpinPostSerializer(Serializer):
 
     def validate(self, attrs):
         user = self.context['request'].user
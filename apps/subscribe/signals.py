@@ -1,62 +1,38 @@
 from django.db.models.signals import post_save, pre_delete
 from django.dispatch import receiver
-from django.utils import timezone
-from .models import Subscription, PinnedPost, SubscriptionHistory
+
+from apps.core.outbox import publish
+
+from .models import Subscription, PinnedPost
+
+# The receivers only record what happened; the history rows and clean-ups run from the outbox
+# relay, see handlers.py.
 
 
 @receiver(post_save, sender=Subscription)
-def subsscription_post_save(sender, instance, created, **kwargs):
+def subscription_post_save(sender, instance, created, **kwargs):
     if created:
-        SubscriptionHistory.objects.create(
-            subscription=instance,
-            action='created',
-            description=f'Subscription {instance.plan.name} created'
+        publish('subscription.created', subscription_id=instance.pk, plan_id=instance.plan_id)
+    elif instance.loaded_status is not None and instance.loaded_status != instance.status:
+        publish(
+            'subscription.status_changed', subscription_id=instance.pk, user_id=instance.user_id,
+            previous=instance.loaded_status, status=instance.status,
         )
-    else:
-        if hasattr(instance, '_previous_status'):
-            if instance.__previous_status != instance.status:
-                SubscriptionHistory.objects.create(
-                    subscription=instance,
-                    action=instance.status,
-                    description=f'Subscription status changed from {instance.__previous_status} to {instance.status}'
-                )
+    instance.loaded_status = instance.status
 
 
 @receiver(pre_delete, sender=Subscription)
 def subscription_pre_delete(sender, instance, **kwargs):
-    try:
-        instance.user.pinned_post.delete()
-    except PinnedPost.DoesNotExist:
-        pass
+    publish('subscription.deleted', user_id=instance.user_id)
 
 
 @receiver(post_save, sender=PinnedPost)
 def pinned_post_post_save(sender, instance, created, **kwargs):
+    # PinnedPost.save() already refused users without an active subscription
     if created:
-        if not hasattr(instance.user, 'subscription') or not instance.user.subscription.is_active:
-            instance.delete()
-            return
-
-        SubscriptionHistory.objects.create(
-            subscription=instance.user.subscription,
-            action='post_pinned',
-            description=f'Post "{instance.post.title}"  pinned',
-            metadata={
-                'post_id': instance.post.id,
-                'post_title': instance.post.title,
-            }
-        )
+        publish('pinned_post.created', user_id=instance.user_id, post_id=instance.post_id)
 
 
 @receiver(pre_delete, sender=PinnedPost)
 def pinned_post_pre_delete(sender, instance, **kwargs):
-    if hasattr(instance.user, 'subscription'):
-        SubscriptionHistory.objects.create(
-            subscription=instance.user.subscription,
-            action='post_unpinned',
-            description=f'Post "{instance.post.title}"  unpinned',
-            metadata={
-                'post_id': instance.post.id,
-                'post_title': instance.post.title,
-            }
-        )
\ No newline at end of file
+    publish('pinned_post.deleted', user_id=instance.user_id, post_id=instance.post_id)
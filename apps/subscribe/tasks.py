@@ -1,53 +1,40 @@
 from celery import shared_task
+from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
-from .models import Subscription, PinnedPost, SubscriptionHistory
+
+from apps.core.routers import replica_reads
+from .bulk import end_subscriptions
+from .models import Subscription
 
 
 @shared_task
 def check_expired_subscriptions():
+    """Expire active subscriptions past their end date and unpin their posts, a chunk per transaction."""
     now = timezone.now()
-    expired_subscriptions = SubscriptionHistory.objects.filter(
-        status='active',
-        end_date__lt=now,
-    )
-
-    expired_count = 0
-    pinned_posts_removed = 0
+    due = Subscription.objects.filter(status='active', end_date__lt=now)
+    expired = 0
+    while True:
+        with transaction.atomic():
+            ids = list(due.order_by('pk').values_list('pk', flat=True)[:settings.BULK_ACTION_CHUNK_SIZE])
+            if not ids:
+                return {'expired_subscriptions': expired}
+            expired += end_subscriptions(Subscription.objects.filter(pk__in=ids), 'expired', 'expired', 'Subscription expired')
 
-    for subscription in expired_subscriptions:
-        subscription.delete()
-        expired_count += 1
-
-        try:
-            pinned_post = subscription.user.pinned_posts
-            pinned_post.delete()
-            pinned_posts_removed += 1
-        except PinnedPost.DoesNotExist:
-            pass
-
-        SubscriptionHistory.objects.create(
-            subscription=subscription,
-            action='expired',
-            description='Subscription expired',
-        )
-
-    return {
-        'expired_subscriptions': expired_count,
-        'pinned_posts_removed': pinned_posts_removed,
-    }
 
 @shared_task
+@replica_reads
 def send_subscription_expiry_reminder():
     from datetime import timedelta
     from django.core.mail import send_mail
     from django.conf import settings
 
     reminder_date = timezone.now() + timedelta(days=3)
-    expired_soon_subscriptions = SubscriptionHistory.objects.filter(
+    expired_soon_subscriptions = Subscription.objects.filter(
         status='active',
-        end_date__date=reminder_date,
+        end_date__date=reminder_date.date(),
         auto_renew=False
-    )
+    ).select_related('user', 'plan')
 
     sent_count = 0
     for subscription in expired_soon_subscriptions:
@@ -1,3 +1,236 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.db import connection, transaction
+from django.http import QueryDict
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.core import outbox
+from apps.core.models import BulkJob
+from apps.core.tasks import run_bulk_job
+from apps.core.testing import QueryBudgetTestCase, admin_action, make_plan, make_posts, make_subscriber, make_user
+
+from .history import record_history
+from .models import PinnedPost, Subscription, SubscriptionHistory
+from .tasks import check_expired_subscriptions
+
+QUERY_BUDGETS = {
+    'subscription-plans': {'get': 3},
+    'subscription-plan-detail': {'get': 1},
+    'my-subscriptions': {'get': 2},
+    'subscription-status': {'get': 2},
+    'subscription-history': {'get': 3},
+    'cancel-subscription': {'post': 11},
+    'pinned-post': {'get': 4, 'delete': 5},
+    'pin-post': {'post': 12},
+    'unpin-post': {'post': 5},
+    'pinned-posts-list': {'get': 1},
+    'can-pin-post': {'get': 3},
+}
+
+
+class SubscriptionQueryBudgetTests(QueryBudgetTestCase):
+    budgets = QUERY_BUDGETS
+
+    def test_plans(self):
+        def grow():
+            for _ in range(10):
+                make_plan()
+
+        self.assertQueriesConstant('get', 'subscription-plans', grow)
+        self.assertWithinBudget('get', 'subscription-plan-detail', args=[self.data.plan.pk])
+
+    def test_my_subscription(self):
+        self.assertWithinBudget('get', 'my-subscriptions', user=self.data.author)
+
+    def test_subscription_status(self):
+        self.assertWithinBudget('get', 'subscription-status', user=self.data.author)
+        self.assertWithinBudget('get', 'subscription-status', user=self.data.reader)
+
+    def test_subscription_history(self):
+        subscription = self.data.author.subscription
+
+        def grow():
+            SubscriptionHistory.objects.bulk_create(
+                SubscriptionHistory(subscription=subscription, action='renewed') for _ in range(25)
+            )
+
+        self.assertQueriesConstant('get', 'subscription-history', grow, user=self.data.author)
+
+    def test_cancel_subscription(self):
+        self.assertWithinBudget('post', 'cancel-subscription', user=self.data.author)
+
+    def test_pinned_post(self):
+        self.assertWithinBudget('get', 'pinned-post', user=self.data.author)
+        self.assertWithinBudget('delete', 'pinned-post', user=self.data.author, status=204)
+
+    def test_pin_and_unpin(self):
+        post = make_posts(self.data.reader, 1)[0]
+        self.assertWithinBudget('post', 'pin-post', user=self.data.reader, data={'post_id': post.pk}, status=201)
+        self.assertWithinBudget('post', 'unpin-post', user=self.data.reader, status=204)
+
+    def test_pinned_posts_list(self):
+        def grow():
+            for _ in range(10):
+                user = make_subscriber(self.data.plan)
+                PinnedPost.objects.create(user=user, post=make_posts(user, 1)[0])
+
+        self.assertQueriesConstant('get', 'pinned-posts-list', grow)
+
+    def test_can_pin_post(self):
+        self.assertWithinBudget('get', 'can-pin-post', args=[self.data.post.pk], user=self.data.author)
+
+
+@override_settings(BULK_ACTION_CHUNK_SIZE=2)
+class SubscriptionBulkActionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.plan = make_plan(duration_days=30)
+        cls.admin = make_user(is_staff=True, is_superuser=True)
+        cls.users = [make_subscriber(cls.plan, history=0) for _ in range(5)]
+        for user in cls.users[:2]:
+            PinnedPost.objects.create(user=user, post=make_posts(user, 1)[0])
+
+    def test_cancel_all_matching(self):
+        response = admin_action(self, self.admin, Subscription, 'cancel_subscriptions', select_across=True)
+
+        self.assertEqual(response.status_code, 302)
+        job = BulkJob.objects.get()
+        self.assertEqual((job.status, job.processed, job.changed), ('succeeded', 5, 5))
+        self.assertFalse(Subscription.objects.exclude(status='canceled', auto_renew=False).exists())
+        self.assertEqual(SubscriptionHistory.objects.filter(action='canceled').count(), 5)
+        self.assertFalse(PinnedPost.objects.exists())
+        self.assertEqual(SubscriptionHistory.objects.filter(action='post_unpinned').count(), 2)
+
+    def test_activate_selected(self):
+        subscription = self.users[0].subscription
+        Subscription.objects.filter(pk=subscription.pk).update(status='expired')
+
+        admin_action(self, self.admin, Subscription, 'activate_subscriptions', selected=[subscription.pk, self.users[1].subscription.pk])
+
+        subscription.refresh_from_db()
+        self.assertEqual(subscription.status, 'active')
+        self.assertEqual(subscription.end_date - subscription.start_date, timedelta(days=30))
+        self.assertEqual(BulkJob.objects.get().changed, 1)
+        self.assertEqual(SubscriptionHistory.objects.filter(subscription=subscription, action='activated').count(), 1)
+
+    def test_resumed_job_walks_the_filtered_changelist_after_its_last_row(self):
+        pks = sorted(Subscription.objects.values_list('pk', flat=True))
+        Subscription.objects.filter(pk=pks[4]).update(status='expired')
+        job = BulkJob.objects.create(
+            operation='apps.subscribe.bulk.cancel_subscriptions', description='Cancel', model='subscribe.Subscription',
+            filters='status__exact=active', total=4, last_pk=pks[1], created_by=self.admin,
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            run_bulk_job(job.pk)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.processed, job.changed, job.last_pk), ('succeeded', 2, 2, pks[3]))
+        self.assertEqual(list(Subscription.objects.filter(status='canceled').order_by('pk').values_list('pk', flat=True)), pks[2:4])
+        # the selection is read a chunk of primary keys at a time, after the last one done
+        walks = [query['sql'] for query in queries if '"subscriptions"."id" >' in query['sql']]
+        self.assertEqual(len(walks), 2)
+        self.assertTrue(all('LIMIT 2' in sql for sql in walks))
+
+    def test_selected_rows_keep_the_changelist_filters(self):
+        url = reverse('admin:subscribe_subscription_changelist') + '?status__exact=expired'
+        expired = self.users[0].subscription
+        Subscription.objects.filter(pk=expired.pk).update(status='expired')
+        client = Client()
+        client.force_login(self.admin)
+        selected = [expired.pk, self.users[1].subscription.pk]
+        with mock.patch.object(run_bulk_job, 'delay', side_effect=run_bulk_job), self.captureOnCommitCallbacks(execute=True):
+            client.post(url, {'action': 'activate_subscriptions', 'index': 0, '_selected_action': selected})
+
+        job = BulkJob.objects.get()
+        self.assertEqual(QueryDict(job.filters).dict(), {'status__exact': 'expired', 'pk__in': f'{selected[0]},{selected[1]}'})
+        self.assertEqual((job.processed, job.changed), (1, 1))
+
+
+class SubscriptionOutboxTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_subscriber(make_plan(), history=0)
+        cls.post = make_posts(cls.user, 1)[0]
+
+    def test_history_and_unpinning_run_from_the_relay(self):
+        PinnedPost.objects.create(user=self.user, post=self.post)
+        subscription = Subscription.objects.get(user=self.user)
+        subscription.expire_subscription()
+        self.assertTrue(PinnedPost.objects.exists())
+        self.assertFalse(SubscriptionHistory.objects.exists())
+
+        outbox.relay()
+        self.assertFalse(PinnedPost.objects.exists())
+        self.assertEqual(
+            sorted(SubscriptionHistory.objects.values_list('action', flat=True)), ['created', 'post_pinned', 'post_unpinned'],
+        )
+        self.assertEqual(SubscriptionHistory.objects.get(action='post_pinned').metadata['post_title'], self.post.title)
+
+
+class SubscriptionHistoryWriterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.plan = make_plan()
+        cls.users = [make_subscriber(cls.plan, history=0) for _ in range(3)]
+        cls.subscription = cls.users[0].subscription
+
+    def test_rows_of_a_transaction_are_written_once_at_commit(self):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            with transaction.atomic():
+                record_history(self.subscription, 'renewed', 'Renewed', {'days': 30})
+                record_history(self.subscription.pk, 'renewed', 'Renewed', {'days': 30})
+                record_history(self.subscription, 'canceled', 'Canceled')
+                try:
+                    with transaction.atomic():
+                        record_history(self.subscription, 'expired', 'Rolled back')
+                        raise ValueError
+                except ValueError:
+                    pass
+        self.assertFalse(SubscriptionHistory.objects.exists())
+
+        with CaptureQueriesContext(connection) as queries:
+            for callback in callbacks:
+                callback()
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(sorted(SubscriptionHistory.objects.values_list('action', flat=True)), ['canceled', 'renewed'])
+
+    def test_expiry_is_set_based(self):
+        for user in self.users[:2]:
+            PinnedPost.objects.create(user=user, post=make_posts(user, 1)[0])
+        Subscription.objects.filter(user__in=self.users[:2]).update(end_date=timezone.now() - timedelta(days=1))
+
+        with override_settings(BULK_ACTION_CHUNK_SIZE=1):
+            self.assertEqual(check_expired_subscriptions(), {'expired_subscriptions': 2})
+        self.assertEqual(Subscription.objects.filter(status='expired').count(), 2)
+        self.assertEqual(SubscriptionHistory.objects.filter(action='expired').count(), 2)
+        self.assertFalse(PinnedPost.objects.exists())
+
+
+class NestedHistoryTests(TransactionTestCase):
+    def setUp(self):
+        self.subscription = make_subscriber(make_plan(), history=0).subscription
+
+    def test_rows_of_nested_blocks_are_written_when_the_outermost_one_commits(self):
+        with transaction.atomic():
+            with transaction.atomic():
+                record_history(self.subscription, 'renewed', 'Renewed')
+                with transaction.atomic():
+                    record_history(self.subscription, 'canceled', 'Canceled')
+            try:
+                with transaction.atomic():
+                    record_history(self.subscription, 'expired', 'Rolled back')
+                    raise ValueError
+            except ValueError:
+                pass
+            record_history(self.subscription, 'renewed', 'Renewed')
+            self.assertFalse(SubscriptionHistory.objects.exists())
+        self.assertEqual(sorted(SubscriptionHistory.objects.values_list('action', flat=True)), ['canceled', 'renewed'])
+
+        with transaction.atomic():
+            record_history(self.subscription, 'renewed', 'Renewed')
+        self.assertEqual(SubscriptionHistory.objects.filter(action='renewed').count(), 2)
@@ -4,7 +4,14 @@ from rest_framework.decorators import api_view, permission_classes
 from django.shortcuts import get_object_or_404
 from django.db import transaction
 from django.utils import timezone
+from django.db.models import Count, Max
 
+from apps.core.concurrency import run_concurrently
+from apps.core.conditional import ConditionalGetMixin, make_etag
+from apps.core.db import NonAtomicReadsMixin, non_atomic_reads
+from apps.core.serialization import subquery_count
+
+from .history import record_history
 from .models import SubscriptionPlan, Subscription, PinnedPost, SubscriptionHistory
 from .serializers import (
     SubscriptionPlanSerializer,
@@ -17,21 +24,27 @@ from .serializers import (
     UnpinPostSerializer
 )
 from apps.main.models import Post
+from apps.comments.models import Comment
 
 
-class SubscriptionPlanListView(generics.ListAPIView):
+class SubscriptionPlanListView(NonAtomicReadsMixin, ConditionalGetMixin, generics.ListAPIView):
     queryset = SubscriptionPlan.objects.filter(is_active=True)
     serializer_class = SubscriptionPlanSerializer
     permission_classes = [permissions.AllowAny]
+    cache_policy = 'subscription_plans'
+
+    def get_conditional_validators(self):
+        stats = SubscriptionPlan.objects.filter(is_active=True).aggregate(last_modified=Max('updated_at'), plans=Count('id'))
+        return make_etag(self.request.get_full_path(), *stats.values()), stats['last_modified']
 
 
-class SubscriptionPlanDetailView(generics.RetrieveAPIView):
+class SubscriptionPlanDetailView(NonAtomicReadsMixin, generics.RetrieveAPIView):
     queryset = SubscriptionPlan.objects.filter(is_active=True)
     serializer_class = SubscriptionPlanSerializer
     permission_classes = [permissions.AllowAny]
 
 
-class UserSubscriptionView(generics.RetrieveAPIView):
+class UserSubscriptionView(NonAtomicReadsMixin, generics.RetrieveAPIView):
     serializer_class = SubscriptionSerializer
     permission_classes = [permissions.IsAuthenticated]
 
@@ -52,7 +65,7 @@ class UserSubscriptionView(generics.RetrieveAPIView):
             }, status=status.HTTP_404_NOT_FOUND)
 
 
-class SubscriptionHistoryView(generics.ListAPIView):
+class SubscriptionHistoryView(NonAtomicReadsMixin, generics.ListAPIView):
     serializer_class = SubscriptionHistorySerializer
     permission_classes = [permissions.IsAuthenticated]
 
@@ -102,10 +115,18 @@ class PinnedPostView(generics.RetrieveUpdateDestroyAPIView):
             }, status=status.HTTP_404_NOT_FOUND)
 
 
+@non_atomic_reads
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def subscription_status(request):
-    serializer = UserSubscriptionStatusSerializer(request.user)
+    subscription, pinned_post = run_concurrently(
+        lambda: Subscription.objects.select_related('plan').filter(user=request.user).first(),
+        lambda: PinnedPost.objects.select_related('post').filter(user=request.user).first(),
+    )
+    serializer = UserSubscriptionStatusSerializer(request.user, context={
+        'subscription': subscription,
+        'pinned_post': pinned_post,
+    })
     return Response(serializer.data)
 
 
@@ -115,7 +136,7 @@ def pin_post(request):
     serializer = PinPostSerializer(data=request.data, context={'request': request})
 
     if serializer.is_valid():
-        post_id = serializer.validated_data.get['post_id']
+        post_id = serializer.validated_data['post_id']
 
         try:
             with transaction.atomic():
@@ -184,11 +205,7 @@ def cancel_subscription(request):
             if hasattr(request.user, 'pinned_post'):
                 request.user.pinned_post.delete()
 
-            SubscriptionHistory.objects.create(
-                subscription=subscription,
-                action='canceled',
-                description='Subscription canceled',
-            )
+            record_history(subscription, 'canceled', 'Subscription canceled')
         return Response({
             'message': 'Subscription canceled',
         }, status=status.HTTP_200_OK)
@@ -198,6 +215,7 @@ def cancel_subscription(request):
         }, status=status.HTTP_404_NOT_FOUND)
 
 
+@non_atomic_reads
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
 def pinned_posts_list(request):
@@ -207,6 +225,8 @@ def pinned_posts_list(request):
         user__subscription__status='active',
         user__subscription__end_date__gt=timezone.now(),
         post__status='published',
+    ).defer('post__content').annotate(
+        post_comments_count=subquery_count(Comment.objects.filter(is_active=True), 'post', 'post'),
     ).order_by('pinned_at')
 
     posts_data = []
@@ -216,7 +236,7 @@ def pinned_posts_list(request):
             'id': post.id,
             'title': post.title,
             'slug': post.slug,
-            'content': post.content[:200] + '...' if len(post.content) > 200 else post.content,
+            'content': post.excerpt,
             'image': post.image.url if post.image else None,
             'category': post.category.name if post.category else None,
             'author': {
@@ -224,18 +244,19 @@ def pinned_posts_list(request):
                 'username': post.author.username,
                 'full_name': post.author.full_name,
             },
-            'views_count': post.viewe_count,
-            'comments_count': post.comments_count,
+            'views_count': post.views_count,
+            'comments_count': pinned_post.post_comments_count,
             'created_at': post.created_at,
             'pinned_at': pinned_post.pinned_at,
             'is_pinned': True
         })
     return Response({
-        'count': int(pinned_posts.count()),
+        'count': len(posts_data),
         'results': posts_data,
     })
 
 
+@non_atomic_reads
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def can_pin_post(request, post_id):
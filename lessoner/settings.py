@@ -12,7 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
-from decouple import config
+from decouple import Csv, config
 from datetime import timedelta
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -46,17 +46,23 @@ THIRD_APPS = [
     'rest_framework_simplejwt'
 ]
 LOCAL_APPS = [
+    'apps.core',
     'apps.accounts',
     'apps.main',
     'apps.comments',
     'apps.subscribe',
     'apps.payment',
+    'apps.media',
+    'apps.analytics',
 ]
 
 INSTALLED_APPS = DJANGO_APPS + THIRD_APPS + LOCAL_APPS
 
 MIDDLEWARE = [
+    'apps.analytics.middleware.event_flush_middleware',
+    'apps.core.middleware.ProfilingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
+    'apps.core.middleware.replica_routing_middleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -98,10 +104,48 @@ DATABASES = {
         'PASSWORD': config('POSTGRES_PASSWORD'),
         'HOST': config('DB_HOST', default='localhost'),
         'PORT': config('DB_PORT', default='5432', cast=int),
-        'ATOMIC_REQUESTS': True,
+        'ATOMIC_REQUESTS': config('DB_ATOMIC_REQUESTS', default=True, cast=bool),
+        # Persistent connections, re-validated before reuse at the start of each request.
+        'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=60, cast=int),
+        'CONN_HEALTH_CHECKS': config('DB_CONN_HEALTH_CHECKS', default=True, cast=bool),
+        'OPTIONS': {},
     }
 }
 
+# Alternatively, a per-process connection pool. Needs psycopg 3 with psycopg-pool installed
+# (psycopg[binary,pool]) instead of psycopg2, and replaces persistent connections.
+if config('DB_POOL', default=False, cast=bool):
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': config('DB_POOL_MIN_SIZE', default=2, cast=int),
+        'max_size': config('DB_POOL_MAX_SIZE', default=10, cast=int),
+        'timeout': config('DB_POOL_TIMEOUT', default=10, cast=int),
+    }
+
+# Read replicas as host[:port][/dbname] entries, e.g. DB_REPLICA_HOSTS=replica1,replica2:6432/lessoner.
+# Safe-method requests (outside DB_PRIMARY_PATH_PREFIXES) and @replica_reads tasks read from them.
+DB_REPLICAS = []
+for index, replica in enumerate(config('DB_REPLICA_HOSTS', default='', cast=Csv()), start=1):
+    address, _, replica_name = replica.partition('/')
+    replica_host, _, replica_port = address.partition(':')
+    DATABASES[f'replica_{index}'] = {
+        **DATABASES['default'],
+        'HOST': replica_host,
+        'PORT': int(replica_port) if replica_port else DATABASES['default']['PORT'],
+        'NAME': replica_name or DATABASES['default']['NAME'],
+        'OPTIONS': dict(DATABASES['default']['OPTIONS']),
+        # Requests only read from replicas, and an atomic request would hold a connection to each of
+        # them besides making async views fail.
+        'ATOMIC_REQUESTS': False,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DB_REPLICAS.append(f'replica_{index}')
+
+DATABASE_ROUTERS = ['apps.core.routers.ReplicaRouter']
+DB_PRIMARY_PATH_PREFIXES = ['/api/v1/payments/', '/api/v1/auth/', '/admin/']
+# After a write, the client keeps reading from the primary for this long (read-your-writes).
+DB_READ_YOUR_WRITES_SECONDS = config('DB_READ_YOUR_WRITES_SECONDS', default=10, cast=int)
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -140,6 +184,26 @@ STATIC_ROOT = BASE_DIR / config('STATIC_ROOT', default='staticfiles')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / config('MEDIA_ROOT', default='media')
 
+STORAGES = {
+    'default': {
+        'BACKEND': 'apps.media.storage.ContentAddressedStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
+# Uploads are hashed while streaming; anything above FILE_UPLOAD_MAX_MEMORY_SIZE spools to disk
+FILE_UPLOAD_HANDLERS = ['apps.media.uploadhandlers.HashingUploadHandler']
+FILE_UPLOAD_MAX_MEMORY_SIZE = config('FILE_UPLOAD_MAX_MEMORY_SIZE', default=1024 * 1024, cast=int)
+MEDIA_UPLOAD_DEFAULT_MAX_SIZE = config('MEDIA_UPLOAD_DEFAULT_MAX_SIZE', default=5 * 1024 * 1024, cast=int)
+MEDIA_IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+SERVE_MEDIA = config('SERVE_MEDIA', default=DEBUG, cast=bool)
+MEDIA_UPLOAD_MAX_SIZES = {
+    'image': config('MEDIA_UPLOAD_MAX_IMAGE_SIZE', default=10 * 1024 * 1024, cast=int),
+    'avatar': config('MEDIA_UPLOAD_MAX_AVATAR_SIZE', default=2 * 1024 * 1024, cast=int),
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -161,15 +225,43 @@ REST_FRAMEWORK = {
         'rest_framework.filters.OrderingFilter',
     ],
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'apps.core.renderers.ORJSONRenderer',
     ],
     'DEFAULT_PARSER_CLASSES': [
-        'rest_framework.parsers.JSONParser',
+        'apps.core.parsers.ORJSONParser',
         'rest_framework.parsers.MultiPartParser',
         'rest_framework.parsers.FormParser',
     ],
 }
 
+# 'orjson' uses the orjson extension when it is installed, 'stdlib' forces DRF's json-based path
+API_JSON_BACKEND = config('API_JSON_BACKEND', default='orjson')
+
+# Serve GET list endpoints through the values()-based serializers instead of the ModelSerializers
+API_VALUES_SERIALIZERS = config('API_VALUES_SERIALIZERS', default=True, cast=bool)
+
+# Route the public read endpoints (recent/popular/featured/by-category posts, post comments) to
+# their async views; enable when serving lessoner.asgi.
+ASYNC_READ_VIEWS = config('ASYNC_READ_VIEWS', default=False, cast=bool)
+
+# Independent queries of composite endpoints run on a thread pool; every pool thread holds its
+# own database connection, so a worker process may open up to this many extra connections.
+# Off by default without persistent or pooled connections: every pool call would then connect
+# and disconnect again, which costs more than running the queries side by side saves.
+CONCURRENT_QUERIES = config(
+    'CONCURRENT_QUERIES', default=DATABASES['default']['CONN_MAX_AGE'] != 0 or 'pool' in DATABASES['default']['OPTIONS'], cast=bool,
+)
+CONCURRENT_QUERIES_MAX_WORKERS = config('CONCURRENT_QUERIES_MAX_WORKERS', default=8, cast=int)
+
+# Cache-Control for conditional GET endpoints: anonymous responses may be cached by a CDN for
+# s_maxage seconds, authenticated ones are private and always revalidated.
+API_CACHE_POLICIES = {
+    'post_detail': {'max_age': 0, 's_maxage': 30},
+    'posts_by_category': {'max_age': 30, 's_maxage': 60},
+    'comments': {'max_age': 0, 's_maxage': 15},
+    'subscription_plans': {'max_age': 300, 's_maxage': 3600},
+}
+
 # CORS Configuration
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:5173",  # Укажите порт, на котором работает ваш Vue.js
@@ -183,6 +275,39 @@ SECURE_BROWSER_XSS_FILTER = True
 SECURE_CONTENT_TYPE_NOSNIFF = True
 X_FRAME_OPTIONS = 'DENY'
 
+# Share of requests profiled (queries, SQL/serialization/render time, size) into the per-process
+# histograms served at admin/metrics/ and the apps.core.profiling log. Server-Timing exposes the
+# numbers to clients.
+PROFILING_SAMPLE_RATE = config('PROFILING_SAMPLE_RATE', default=1.0 if DEBUG else 0.05, cast=float)
+PROFILING_SERVER_TIMING = config('PROFILING_SERVER_TIMING', default=DEBUG, cast=bool)
+
+# Admin changelists of large tables count exactly up to this many rows and show the PostgreSQL
+# planner's estimate beyond it.
+ADMIN_EXACT_COUNT_LIMIT = config('ADMIN_EXACT_COUNT_LIMIT', default=10000, cast=int)
+
+# Bulk admin actions update this many rows per transaction; bigger selections run on the Celery worker.
+BULK_ACTION_CHUNK_SIZE = config('BULK_ACTION_CHUNK_SIZE', default=1000, cast=int)
+
+# Admin exports fetch this many rows per round trip through a server-side cursor while streaming.
+EXPORT_CHUNK_SIZE = config('EXPORT_CHUNK_SIZE', default=2000, cast=int)
+
+# The outbox relay handles this many events per transaction; a failing event is retried with
+# exponential backoff up to OUTBOX_MAX_ATTEMPTS times. Handled events are kept for a few days.
+OUTBOX_RELAY_BATCH_SIZE = config('OUTBOX_RELAY_BATCH_SIZE', default=100, cast=int)
+OUTBOX_MAX_ATTEMPTS = config('OUTBOX_MAX_ATTEMPTS', default=10, cast=int)
+OUTBOX_RETENTION_DAYS = config('OUTBOX_RETENTION_DAYS', default=7, cast=int)
+
+# Analytics rollups only read rows older than this, so a transaction still committing when the
+# refresh task runs is picked up by the next run.
+ANALYTICS_ROLLUP_LAG_SECONDS = config('ANALYTICS_ROLLUP_LAG_SECONDS', default=120, cast=int)
+
+# Post events (views, comments, pin impressions) are buffered per process and written in one batch
+# once this many are waiting or the oldest has waited this long; raw events are kept for
+# ANALYTICS_EVENT_RETENTION_DAYS, the hourly and daily rollups for good.
+ANALYTICS_EVENT_BUFFER_SIZE = config('ANALYTICS_EVENT_BUFFER_SIZE', default=500, cast=int)
+ANALYTICS_EVENT_FLUSH_SECONDS = config('ANALYTICS_EVENT_FLUSH_SECONDS', default=5.0, cast=float)
+ANALYTICS_EVENT_RETENTION_DAYS = config('ANALYTICS_EVENT_RETENTION_DAYS', default=90, cast=int)
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -225,6 +350,11 @@ LOGGING = {
             'level': 'INFO',
             'propagate': False,
         },
+        'apps.core.profiling': {
+            'handlers': ['file'],
+            'level': 'INFO',
+            'propagate': False,
+        },
     },
 }
 
@@ -270,7 +400,7 @@ CELERY_BEAT_SCHEDULE = {
         'schedule': 3600.0,
     },
     'send-subscription-expiry-reminders': {
-        'task': 'apps.subscribe.tasks.send_subscription_expiry_reminders',
+        'task': 'apps.subscribe.tasks.send_subscription_expiry_reminder',
         'schedule': 86400.0,  # day
     },
     'cleanup-old-payments': {
@@ -284,8 +414,37 @@ CELERY_BEAT_SCHEDULE = {
     'retry-failed-webhook-events': {
         'task': 'apps.payment.tasks.retry_failed_webhook_events',
         'schedule': 3600.0,
-    }
+    },
+    'settle-pending-refunds': {
+        'task': 'apps.payment.tasks.settle_pending_refunds',
+        'schedule': 3600.0,
+    },
+    'collect-unreferenced-media': {
+        'task': 'apps.media.tasks.collect_unreferenced_media',
+        'schedule': 86400.0,
+    },
+    'refresh-analytics-rollups': {
+        'task': 'apps.analytics.tasks.refresh_rollups',
+        'schedule': 900.0,
+    },
+    'prune-post-events': {
+        'task': 'apps.analytics.tasks.prune_post_events',
+        'schedule': 86400.0,
+    },
+    'relay-outbox': {
+        'task': 'apps.core.tasks.relay_outbox',
+        'schedule': 5.0,
+    },
+    'prune-outbox': {
+        'task': 'apps.core.tasks.prune_outbox',
+        'schedule': 86400.0,
+    },
 
 }
 
 STRIPE_SECRET_KEY = config('STRIPE_SECRET_KEY')
+STRIPE_WEBHOOK_SECRET = config('STRIPE_WEBHOOK_SECRET', default='')
+
+# A checkout commits its payment before calling Stripe. A payment still without a Stripe session
+# after this long belongs to a checkout that died in between and no longer blocks a new one.
+CHECKOUT_STALE_SECONDS = config('CHECKOUT_STALE_SECONDS', default=300, cast=int)
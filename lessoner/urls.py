@@ -15,18 +15,28 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from apps.core.views import metrics
+from apps.media.views import serve_media
+
 urlpatterns = [
+    path('admin/metrics/', metrics, name='metrics'),
     path('admin/', admin.site.urls),
     path('api/v1/posts/', include('apps.main.urls')),
     path('api/v1/comments/', include('apps.comments.urls')),
     path('api/v1/auth/', include('apps.accounts.urls')),
     path('api/v1/subscribe/', include('apps.subscribe.urls')),
+    path('api/v1/payments/', include('apps.payment.urls')),
+    path('api/v1/analytics/', include('apps.analytics.urls')),
 ]
 
+if settings.SERVE_MEDIA:
+    urlpatterns += [
+        re_path(r'^{}(?P<path>.*)$'.format(settings.MEDIA_URL.lstrip('/')), serve_media),
+    ]
+
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)